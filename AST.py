@@ -2,94 +2,1573 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from array import array
+from typing import Any, Callable, ClassVar, Iterator, Optional, Sequence, Union
+
+from symbols import SYMBOLS, Symbol
 
 
 class AST(ABC):
+    __slots__ = ()
+    tag: ClassVar[int] = 0
+
+    def children(self) -> Sequence[AST]:
+        return ()
+
     @abstractmethod
     def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
         return visitor.visit_AST(self, *args, **kwargs)
 
 
+class Expr(AST):
+    __slots__ = ()
+
+    def children(self) -> Sequence[AST]:
+        return ()
+
+
 class Module(AST):
+    __slots__ = ("body",)
     body: list[AST]
+    tag: ClassVar[int] = 1
 
     def __init__(self, body: list[AST]):
         self.body = body
 
+    def children(self) -> Sequence[AST]:
+        return self.body
+
     def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
         return visitor.visit_Module(self, *args, **kwargs)
 
 
 class Block(AST):
-    label: Optional[str]
+    __slots__ = ("label", "body")
+    label: Optional[Symbol]
     body: list[AST]
+    tag: ClassVar[int] = 2
 
-    def __init__(self, label: Optional[str], body: list[AST]):
+    def __init__(self, label: Optional[Symbol], body: list[AST]):
         self.label = label
         self.body = body
 
+    def children(self) -> Sequence[AST]:
+        return self.body
+
     def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
         return visitor.visit_Block(self, *args, **kwargs)
 
 
 class If(AST):
-    label: Optional[str]
+    __slots__ = ("label", "condition", "body", "orelse")
+    label: Optional[Symbol]
+    condition: Expr
     body: list[AST]
+    orelse: list[AST]
+    tag: ClassVar[int] = 3
 
-    def __init__(self, label: Optional[str], body: list[AST]):
+    def __init__(
+        self,
+        label: Optional[Symbol],
+        condition: Expr,
+        body: list[AST],
+        orelse: list[AST],
+    ):
         self.label = label
+        self.condition = condition
         self.body = body
+        self.orelse = orelse
+
+    def children(self) -> Sequence[AST]:
+        return (self.condition, *self.body, *self.orelse)
 
     def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
         return visitor.visit_If(self, *args, **kwargs)
 
 
 class While(AST):
-    label: Optional[str]
+    __slots__ = ("label", "condition", "body")
+    label: Optional[Symbol]
+    condition: Expr
     body: list[AST]
+    tag: ClassVar[int] = 4
 
-    def __init__(self, label: Optional[str], body: list[AST]):
+    def __init__(self, label: Optional[Symbol], condition: Expr, body: list[AST]):
         self.label = label
+        self.condition = condition
         self.body = body
 
+    def children(self) -> Sequence[AST]:
+        return (self.condition, *self.body)
+
     def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
         return visitor.visit_While(self, *args, **kwargs)
 
 
 class Do(AST):
-    label: Optional[str]
+    __slots__ = ("label", "body")
+    label: Optional[Symbol]
     body: list[AST]
+    tag: ClassVar[int] = 5
 
-    def __init__(self, label: Optional[str], body: list[AST]):
+    def __init__(self, label: Optional[Symbol], body: list[AST]):
         self.label = label
         self.body = body
 
+    def children(self) -> Sequence[AST]:
+        return self.body
+
     def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
         return visitor.visit_Do(self, *args, **kwargs)
 
 
+class Break(AST):
+    __slots__ = ("label",)
+    label: Optional[Symbol]
+    tag: ClassVar[int] = 6
+
+    def __init__(self, label: Optional[Symbol]):
+        self.label = label
+
+    def children(self) -> Sequence[AST]:
+        return ()
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_Break(self, *args, **kwargs)
+
+
+class Continue(AST):
+    __slots__ = ("label",)
+    label: Optional[Symbol]
+    tag: ClassVar[int] = 7
+
+    def __init__(self, label: Optional[Symbol]):
+        self.label = label
+
+    def children(self) -> Sequence[AST]:
+        return ()
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_Continue(self, *args, **kwargs)
+
+
+class Assign(AST):
+    __slots__ = ("target", "value")
+    target: str
+    value: Expr
+    tag: ClassVar[int] = 8
+
+    def __init__(self, target: str, value: Expr):
+        self.target = target
+        self.value = value
+
+    def children(self) -> Sequence[AST]:
+        return (self.value,)
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_Assign(self, *args, **kwargs)
+
+
+class Print(AST):
+    __slots__ = ("value",)
+    value: Expr
+    tag: ClassVar[int] = 9
+
+    def __init__(self, value: Expr):
+        self.value = value
+
+    def children(self) -> Sequence[AST]:
+        return (self.value,)
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_Print(self, *args, **kwargs)
+
+
+class Name(Expr):
+    __slots__ = ("id",)
+    id: str
+    tag: ClassVar[int] = 10
+
+    def __init__(self, id: str):
+        self.id = id
+
+    def children(self) -> Sequence[AST]:
+        return ()
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_Name(self, *args, **kwargs)
+
+
+class Constant(Expr):
+    __slots__ = ("value",)
+    value: int
+    tag: ClassVar[int] = 11
+
+    def __init__(self, value: int):
+        self.value = value
+
+    def children(self) -> Sequence[AST]:
+        return ()
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_Constant(self, *args, **kwargs)
+
+
+class BinOp(Expr):
+    __slots__ = ("left", "op", "right")
+    left: Expr
+    op: str
+    right: Expr
+    tag: ClassVar[int] = 12
+
+    def __init__(self, left: Expr, op: str, right: Expr):
+        self.left = left
+        self.op = op
+        self.right = right
+
+    def children(self) -> Sequence[AST]:
+        return (self.left, self.right)
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_BinOp(self, *args, **kwargs)
+
+
+class UnaryOp(Expr):
+    __slots__ = ("op", "operand")
+    op: str
+    operand: Expr
+    tag: ClassVar[int] = 13
+
+    def __init__(self, op: str, operand: Expr):
+        self.op = op
+        self.operand = operand
+
+    def children(self) -> Sequence[AST]:
+        return (self.operand,)
+
+    def accept(self, visitor: ASTVisitor, *args: Any, **kwargs: Any) -> Any:
+        return visitor.visit_UnaryOp(self, *args, **kwargs)
+
+
 class ASTVisitor(ABC):
+    dispatch_table: ClassVar[tuple[Callable[..., Any], ...]] = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.dispatch_table = (
+            cls.visit_AST,
+            cls.visit_Module,
+            cls.visit_Block,
+            cls.visit_If,
+            cls.visit_While,
+            cls.visit_Do,
+            cls.visit_Break,
+            cls.visit_Continue,
+            cls.visit_Assign,
+            cls.visit_Print,
+            cls.visit_Name,
+            cls.visit_Constant,
+            cls.visit_BinOp,
+            cls.visit_UnaryOp,
+        )
+
+    def walk(self, node: AST) -> Any:
+        return self.dispatch_table[node.tag](self, node)
+
     @abstractmethod
-    def visit_Do(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
         pass
 
     @abstractmethod
-    def visit_Module(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
         pass
 
     @abstractmethod
-    def visit_While(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
         pass
 
     @abstractmethod
-    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
         pass
 
     @abstractmethod
-    def visit_If(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
         pass
 
     @abstractmethod
-    def visit_Block(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
         pass
+
+    @abstractmethod
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        pass
+
+
+class ASTTransformer(ASTVisitor):
+    skipped_tags: ClassVar[frozenset[int]] = frozenset()
+    transformed: dict[int, Any]
+
+    def transform(self, node: AST) -> Any:
+        self.transformed = transformed = {}
+        dispatch_table = self.dispatch_table
+        skipped_tags = self.skipped_tags
+        seen: set[int] = set()
+        stack: list[tuple[AST, bool]] = [(node, False)]
+        pop = stack.pop
+        while stack:
+            current, children_done = pop()
+            if not children_done:
+                if id(current) in seen:
+                    continue
+                seen.add(id(current))
+                children = [
+                    (child, False)
+                    for child in reversed(current.children())
+                    if child.tag not in skipped_tags
+                ]
+                if children:
+                    stack.append((current, True))
+                    stack.extend(children)
+                    continue
+            result = dispatch_table[current.tag](self, current)
+            if result is not current:
+                transformed[id(current)] = result
+        return transformed.get(id(node), node)
+
+    def result(self, node: AST) -> Any:
+        result = self.transformed.get(id(node), node)
+        if isinstance(result, (list, tuple)):
+            raise TypeError(
+                f"only nodes in child lists can be replaced by lists, not {type(node).__name__}"
+            )
+        return result
+
+    def results(self, nodes: list[AST]) -> list[AST]:
+        transformed = self.transformed
+        for node in nodes:
+            if id(node) in transformed:
+                break
+        else:
+            return nodes
+        new: list[AST] = []
+        for node in nodes:
+            result = transformed.get(id(node), node)
+            if isinstance(result, (list, tuple)):
+                new.extend(result)
+            else:
+                new.append(result)
+        return new
+
+    def rebuild(self, node: AST) -> AST:
+        return self.rebuild_table[node.tag](self, node)
+
+    def rebuild_AST(self, node: AST) -> AST:
+        return node
+
+    def rebuild_Module(self, node: Module) -> Module:
+        body = self.results(node.body)
+        if body is node.body:
+            return node
+        return Module(body)
+
+    def rebuild_Block(self, node: Block) -> Block:
+        body = self.results(node.body)
+        if body is node.body:
+            return node
+        return Block(node.label, body)
+
+    def rebuild_If(self, node: If) -> If:
+        condition = self.result(node.condition)
+        body = self.results(node.body)
+        orelse = self.results(node.orelse)
+        if (
+            condition is node.condition
+            and body is node.body
+            and (orelse is node.orelse)
+        ):
+            return node
+        return If(node.label, condition, body, orelse)
+
+    def rebuild_While(self, node: While) -> While:
+        condition = self.result(node.condition)
+        body = self.results(node.body)
+        if condition is node.condition and body is node.body:
+            return node
+        return While(node.label, condition, body)
+
+    def rebuild_Do(self, node: Do) -> Do:
+        body = self.results(node.body)
+        if body is node.body:
+            return node
+        return Do(node.label, body)
+
+    def rebuild_Break(self, node: Break) -> Break:
+        return node
+
+    def rebuild_Continue(self, node: Continue) -> Continue:
+        return node
+
+    def rebuild_Assign(self, node: Assign) -> Assign:
+        value = self.result(node.value)
+        if value is node.value:
+            return node
+        return Assign(node.target, value)
+
+    def rebuild_Print(self, node: Print) -> Print:
+        value = self.result(node.value)
+        if value is node.value:
+            return node
+        return Print(value)
+
+    def rebuild_Name(self, node: Name) -> Name:
+        return node
+
+    def rebuild_Constant(self, node: Constant) -> Constant:
+        return node
+
+    def rebuild_BinOp(self, node: BinOp) -> BinOp:
+        left = self.result(node.left)
+        right = self.result(node.right)
+        if left is node.left and right is node.right:
+            return node
+        return BinOp(left, node.op, right)
+
+    def rebuild_UnaryOp(self, node: UnaryOp) -> UnaryOp:
+        operand = self.result(node.operand)
+        if operand is node.operand:
+            return node
+        return UnaryOp(node.op, operand)
+
+    rebuild_table: ClassVar[tuple[Callable[..., AST], ...]] = (
+        rebuild_AST,
+        rebuild_Module,
+        rebuild_Block,
+        rebuild_If,
+        rebuild_While,
+        rebuild_Do,
+        rebuild_Break,
+        rebuild_Continue,
+        rebuild_Assign,
+        rebuild_Print,
+        rebuild_Name,
+        rebuild_Constant,
+        rebuild_BinOp,
+        rebuild_UnaryOp,
+    )
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_AST(node)
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Module(node)
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Block(node)
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_If(node)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_While(node)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Do(node)
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Break(node)
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Continue(node)
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Assign(node)
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Print(node)
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Name(node)
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_Constant(node)
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_BinOp(node)
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_UnaryOp(node)
+
+
+ENTER = 0
+EXIT = 1
+
+
+def iter_preorder(node: AST) -> Iterator[AST]:
+    stack = [node]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        node = pop()
+        yield node
+        extend(reversed(node.children()))
+
+
+def iter_postorder(node: AST) -> Iterator[AST]:
+    for event, node in iter_events(node):
+        if event == EXIT:
+            yield node
+
+
+def iter_events(node: AST) -> Iterator[tuple[int, AST]]:
+    yield (ENTER, node)
+    stack = [(node, iter(node.children()))]
+    while stack:
+        parent, children = stack[-1]
+        for child in children:
+            yield (ENTER, child)
+            stack.append((child, iter(child.children())))
+            break
+        else:
+            stack.pop()
+            yield (EXIT, parent)
+
+
+class Arena:
+    __slots__ = ("kinds", "starts", "records", "data", "children", "values", "interned")
+    classes: ClassVar[tuple[Callable[..., AST], ...]] = (
+        AST,
+        Module,
+        Block,
+        If,
+        While,
+        Do,
+        Break,
+        Continue,
+        Assign,
+        Print,
+        Name,
+        Constant,
+        BinOp,
+        UnaryOp,
+    )
+    layouts: ClassVar[tuple[tuple[tuple[str, Optional[str]], ...], ...]] = (
+        (),
+        (("body", "list"),),
+        (("label", None), ("body", "list")),
+        (("label", None), ("condition", "node"), ("body", "list"), ("orelse", "list")),
+        (("label", None), ("condition", "node"), ("body", "list")),
+        (("label", None), ("body", "list")),
+        (("label", None),),
+        (("label", None),),
+        (("target", None), ("value", "node")),
+        (("value", "node"),),
+        (("id", None),),
+        (("value", None),),
+        (("left", "node"), ("op", None), ("right", "node")),
+        (("op", None), ("operand", "node")),
+    )
+
+    def __init__(self) -> None:
+        self.kinds = array("I")
+        self.starts = array("I")
+        self.records = array("I")
+        self.data = array("I")
+        self.children = array("I")
+        self.values: list[Any] = []
+        self.interned: dict[tuple[type, Any], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def intern(self, value: Any) -> int:
+        key = (type(value), value)
+        index = self.interned.get(key)
+        if index is None:
+            index = self.interned[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def add(self, node: AST) -> int:
+        kinds, starts, records, data, children = (
+            self.kinds,
+            self.starts,
+            self.records,
+            self.data,
+            self.children,
+        )
+        indices: dict[int, int] = {}
+        index = -1
+        for current in iter_postorder(node):
+            index = len(kinds)
+            records.append(len(data))
+            for f_name, shape in self.layouts[current.tag]:
+                value = getattr(current, f_name)
+                if shape is None:
+                    data.append(self.intern(value))
+                elif shape == "list":
+                    data.append(len(children))
+                    children.extend([indices[id(child)] for child in value])
+                    data.append(len(children))
+                elif shape == "optional":
+                    data.append(0 if value is None else indices[id(value)] + 1)
+                else:
+                    data.append(indices[id(value)])
+            first = current.children()
+            starts.append(starts[indices[id(first[0])]] if first else index)
+            kinds.append(current.tag)
+            indices[id(current)] = index
+        return index
+
+    def tag(self, index: int) -> int:
+        return self.kinds[index]
+
+    def field(self, index: int, name: str) -> Any:
+        data = self.data
+        offset = self.records[index]
+        for f_name, shape in self.layouts[self.kinds[index]]:
+            if f_name == name:
+                value = data[offset]
+                if shape is None:
+                    return self.values[value]
+                if shape == "list":
+                    end = data[offset + 1]
+                    return self.children[value:end]
+                if shape == "optional":
+                    return None if value == 0 else value - 1
+                return value
+            offset += 2 if shape == "list" else 1
+        raise AttributeError(name)
+
+    def materialize(self, index: int) -> AST:
+        kinds, records, data, children, values = (
+            self.kinds,
+            self.records,
+            self.data,
+            self.children,
+            self.values,
+        )
+        start = self.starts[index]
+        built: list[AST] = []
+        for current in range(start, index + 1):
+            offset = records[current]
+            args: list[Any] = []
+            for _, shape in self.layouts[kinds[current]]:
+                value = data[offset]
+                if shape is None:
+                    args.append(values[value])
+                elif shape == "list":
+                    offset += 1
+                    end = data[offset]
+                    args.append([built[child - start] for child in children[value:end]])
+                elif shape == "optional":
+                    args.append(None if value == 0 else built[value - 1 - start])
+                else:
+                    args.append(built[value - start])
+                offset += 1
+            built.append(self.classes[kinds[current]](*args))
+        return built[-1]
+
+
+SERIAL_MAGIC = b"DAST"
+SERIAL_VERSION = 1
+(
+    FIELD_STR,
+    FIELD_OPTIONAL_STR,
+    FIELD_OPTIONAL_SYMBOL,
+    FIELD_INT,
+    FIELD_NODE,
+    FIELD_OPTIONAL_NODE,
+    FIELD_LIST,
+    FIELD_END,
+) = range(8)
+SERIAL_LAYOUTS: tuple[tuple[tuple[str, int], ...], ...] = (
+    (),
+    (("body", FIELD_LIST),),
+    (("label", FIELD_OPTIONAL_SYMBOL), ("body", FIELD_LIST)),
+    (
+        ("label", FIELD_OPTIONAL_SYMBOL),
+        ("condition", FIELD_NODE),
+        ("body", FIELD_LIST),
+        ("orelse", FIELD_LIST),
+    ),
+    (("label", FIELD_OPTIONAL_SYMBOL), ("condition", FIELD_NODE), ("body", FIELD_LIST)),
+    (("label", FIELD_OPTIONAL_SYMBOL), ("body", FIELD_LIST)),
+    (("label", FIELD_OPTIONAL_SYMBOL),),
+    (("label", FIELD_OPTIONAL_SYMBOL),),
+    (("target", FIELD_STR), ("value", FIELD_NODE)),
+    (("value", FIELD_NODE),),
+    (("id", FIELD_STR),),
+    (("value", FIELD_INT),),
+    (("left", FIELD_NODE), ("op", FIELD_STR), ("right", FIELD_NODE)),
+    (("op", FIELD_STR), ("operand", FIELD_NODE)),
+)
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value > 127:
+        out.append(value & 127 | 128)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(view: memoryview, pos: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        value |= (byte & 127) << shift
+        if byte < 128:
+            return (value, pos)
+        shift += 7
+
+
+def serialize(node: AST) -> bytes:
+    body = bytearray()
+    strings: dict[str, int] = {}
+    stack: list[tuple[int, Any]] = [(FIELD_NODE, node)]
+    pop = stack.pop
+    while stack:
+        code, value = pop()
+        if code == FIELD_NODE or code == FIELD_OPTIONAL_NODE:
+            if value is None:
+                body.append(0)
+                continue
+            write_varint(body, value.tag)
+            stack.extend(
+                [
+                    (f_code, getattr(value, f_name))
+                    for f_name, f_code in reversed(SERIAL_LAYOUTS[value.tag])
+                ]
+            )
+        elif code == FIELD_LIST:
+            write_varint(body, len(value))
+            stack.append((FIELD_END, len(body)))
+            body += bytes(4)
+            stack.extend([(FIELD_NODE, child) for child in reversed(value)])
+        elif code == FIELD_END:
+            end = value + 4
+            body[value:end] = (len(body) - end).to_bytes(4, "little")
+        elif code == FIELD_INT:
+            write_varint(body, value << 1 if value >= 0 else ~value << 1 | 1)
+        elif value is None:
+            body.append(0)
+        else:
+            if code == FIELD_OPTIONAL_SYMBOL:
+                value = SYMBOLS.names[value]
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(strings)
+            write_varint(body, index if code == FIELD_STR else index + 1)
+    out = bytearray(SERIAL_MAGIC)
+    write_varint(out, SERIAL_VERSION)
+    write_varint(out, len(strings))
+    for string in strings:
+        encoded = string.encode()
+        write_varint(out, len(encoded))
+        out += encoded
+    out += body
+    return bytes(out)
+
+
+def read_strings(view: memoryview) -> tuple[list[str], int]:
+    magic = len(SERIAL_MAGIC)
+    if view[:magic] != SERIAL_MAGIC:
+        raise ValueError("not a serialized AST")
+    version, pos = read_varint(view, magic)
+    if version != SERIAL_VERSION:
+        raise ValueError(f"unsupported AST serialization version {version}")
+    count, pos = read_varint(view, pos)
+    strings = []
+    for _ in range(count):
+        size, pos = read_varint(view, pos)
+        end = pos + size
+        strings.append(str(view[pos:end], "utf-8"))
+        pos = end
+    return (strings, pos)
+
+
+def decode_node(view: memoryview, pos: int, strings: list[str]) -> tuple[AST, int]:
+    classes = Arena.classes
+    tag, pos = read_varint(view, pos)
+    stack: list[list[Any]] = [[tag, [], 0, None, 0]]
+    while True:
+        frame = stack[-1]
+        tag, args, index, items, remaining = frame
+        if items is not None:
+            if remaining:
+                frame[4] = remaining - 1
+                tag = view[pos]
+                if tag < 128:
+                    pos += 1
+                else:
+                    tag, pos = read_varint(view, pos)
+                stack.append([tag, [], 0, None, 0])
+                continue
+            args.append(items)
+            frame[3] = None
+            index += 1
+        layout = SERIAL_LAYOUTS[tag]
+        while index < len(layout):
+            code = layout[index][1]
+            value = view[pos]
+            if value < 128:
+                pos += 1
+            else:
+                value, pos = read_varint(view, pos)
+            if code == FIELD_STR:
+                args.append(strings[value])
+            elif code == FIELD_OPTIONAL_STR:
+                args.append(strings[value - 1] if value else None)
+            elif code == FIELD_OPTIONAL_SYMBOL:
+                args.append(SYMBOLS.intern(strings[value - 1]) if value else None)
+            elif code == FIELD_INT:
+                args.append(~(value >> 1) if value & 1 else value >> 1)
+            elif code == FIELD_LIST:
+                pos += 4
+                if value:
+                    frame[2:] = (index, [], value)
+                    break
+                args.append([])
+            elif value:
+                frame[2] = index
+                stack.append([value, [], 0, None, 0])
+                break
+            else:
+                args.append(None)
+            index += 1
+        else:
+            node = classes[tag](*args)
+            stack.pop()
+            if not stack:
+                return (node, pos)
+            parent = stack[-1]
+            if parent[3] is not None:
+                parent[3].append(node)
+            else:
+                parent[1].append(node)
+                parent[2] += 1
+
+
+def deserialize(data: Union[bytes, bytearray, memoryview]) -> AST:
+    view = memoryview(data)
+    try:
+        strings, pos = read_strings(view)
+        node, pos = decode_node(view, pos, strings)
+    except (IndexError, UnicodeDecodeError, TypeError) as e:
+        raise ValueError("corrupt serialized AST") from e
+    if pos != len(view):
+        raise ValueError("serialized AST has the wrong length")
+    return node
+
+
+class LazyModule(Module):
+    __slots__ = ("decoder", "lazy_body")
+
+    def __init__(self, decoder: LazyDecoder, body: int) -> None:
+        self.decoder = decoder
+        self.lazy_body: Union[int, list[AST]] = body
+
+    @property
+    def body(self) -> list[AST]:
+        body = self.lazy_body
+        if isinstance(body, int):
+            body = self.lazy_body = self.decoder.decode_list(body)
+        return body
+
+    @body.setter
+    def body(self, value: list[AST]) -> None:
+        self.lazy_body = value
+
+
+class LazyBlock(Block):
+    __slots__ = ("decoder", "lazy_body")
+
+    def __init__(
+        self, decoder: LazyDecoder, label: Optional[Symbol], body: int
+    ) -> None:
+        self.decoder = decoder
+        self.label = label
+        self.lazy_body: Union[int, list[AST]] = body
+
+    @property
+    def body(self) -> list[AST]:
+        body = self.lazy_body
+        if isinstance(body, int):
+            body = self.lazy_body = self.decoder.decode_list(body)
+        return body
+
+    @body.setter
+    def body(self, value: list[AST]) -> None:
+        self.lazy_body = value
+
+
+class LazyIf(If):
+    __slots__ = ("decoder", "lazy_body", "lazy_orelse")
+
+    def __init__(
+        self,
+        decoder: LazyDecoder,
+        label: Optional[Symbol],
+        condition: Expr,
+        body: int,
+        orelse: int,
+    ) -> None:
+        self.decoder = decoder
+        self.label = label
+        self.condition = condition
+        self.lazy_body: Union[int, list[AST]] = body
+        self.lazy_orelse: Union[int, list[AST]] = orelse
+
+    @property
+    def body(self) -> list[AST]:
+        body = self.lazy_body
+        if isinstance(body, int):
+            body = self.lazy_body = self.decoder.decode_list(body)
+        return body
+
+    @body.setter
+    def body(self, value: list[AST]) -> None:
+        self.lazy_body = value
+
+    @property
+    def orelse(self) -> list[AST]:
+        orelse = self.lazy_orelse
+        if isinstance(orelse, int):
+            orelse = self.lazy_orelse = self.decoder.decode_list(orelse)
+        return orelse
+
+    @orelse.setter
+    def orelse(self, value: list[AST]) -> None:
+        self.lazy_orelse = value
+
+
+class LazyWhile(While):
+    __slots__ = ("decoder", "lazy_body")
+
+    def __init__(
+        self, decoder: LazyDecoder, label: Optional[Symbol], condition: Expr, body: int
+    ) -> None:
+        self.decoder = decoder
+        self.label = label
+        self.condition = condition
+        self.lazy_body: Union[int, list[AST]] = body
+
+    @property
+    def body(self) -> list[AST]:
+        body = self.lazy_body
+        if isinstance(body, int):
+            body = self.lazy_body = self.decoder.decode_list(body)
+        return body
+
+    @body.setter
+    def body(self, value: list[AST]) -> None:
+        self.lazy_body = value
+
+
+class LazyDo(Do):
+    __slots__ = ("decoder", "lazy_body")
+
+    def __init__(
+        self, decoder: LazyDecoder, label: Optional[Symbol], body: int
+    ) -> None:
+        self.decoder = decoder
+        self.label = label
+        self.lazy_body: Union[int, list[AST]] = body
+
+    @property
+    def body(self) -> list[AST]:
+        body = self.lazy_body
+        if isinstance(body, int):
+            body = self.lazy_body = self.decoder.decode_list(body)
+        return body
+
+    @body.setter
+    def body(self, value: list[AST]) -> None:
+        self.lazy_body = value
+
+
+LAZY_CLASSES: tuple[Optional[Callable[..., AST]], ...] = (
+    None,
+    LazyModule,
+    LazyBlock,
+    LazyIf,
+    LazyWhile,
+    LazyDo,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+    None,
+)
+
+
+class LazyDecoder:
+    __slots__ = ("view", "strings", "root")
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self.view = memoryview(data)
+        try:
+            self.strings, self.root = read_strings(self.view)
+        except (IndexError, UnicodeDecodeError, TypeError) as e:
+            raise ValueError("corrupt serialized AST") from e
+
+    def decode(self, pos: int) -> tuple[AST, int]:
+        view = self.view
+        tag, start = read_varint(view, pos)
+        lazy = LAZY_CLASSES[tag]
+        if lazy is None:
+            return decode_node(view, pos, self.strings)
+        strings = self.strings
+        args: list[Any] = [self]
+        pos = start
+        for _, code in SERIAL_LAYOUTS[tag]:
+            if code == FIELD_LIST:
+                args.append(pos)
+                _, pos = read_varint(view, pos)
+                end = pos + 4
+                pos = end + int.from_bytes(view[pos:end], "little")
+            elif code == FIELD_OPTIONAL_NODE and view[pos] == 0:
+                args.append(None)
+                pos += 1
+            elif code == FIELD_NODE or code == FIELD_OPTIONAL_NODE:
+                node, pos = decode_node(view, pos, strings)
+                args.append(node)
+            else:
+                value, pos = read_varint(view, pos)
+                if code == FIELD_STR:
+                    args.append(strings[value])
+                elif code == FIELD_OPTIONAL_STR:
+                    args.append(strings[value - 1] if value else None)
+                elif code == FIELD_OPTIONAL_SYMBOL:
+                    args.append(SYMBOLS.intern(strings[value - 1]) if value else None)
+                else:
+                    args.append(~(value >> 1) if value & 1 else value >> 1)
+        return (lazy(*args), pos)
+
+    def decode_list(self, pos: int) -> list[AST]:
+        count, pos = read_varint(self.view, pos)
+        pos += 4
+        items = []
+        for _ in range(count):
+            item, pos = self.decode(pos)
+            items.append(item)
+        return items
+
+    def root_node(self) -> AST:
+        try:
+            node, pos = self.decode(self.root)
+        except (IndexError, UnicodeDecodeError, TypeError) as e:
+            raise ValueError("corrupt serialized AST") from e
+        if pos != len(self.view):
+            raise ValueError("serialized AST has the wrong length")
+        return node
+
+
+class SharedModule(Module):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, body: Sequence[AST]) -> None:
+        object.__setattr__(self, "body", tuple(body))
+        object.__setattr__(self, "hash", hash((Module.tag, self.body)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedModule
+            and self.hash == other.hash
+            and ((self.body,) == (other.body,))
+        )
+
+
+class SharedBlock(Block):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, label: Optional[Symbol], body: Sequence[AST]) -> None:
+        object.__setattr__(self, "label", label)
+        object.__setattr__(self, "body", tuple(body))
+        object.__setattr__(self, "hash", hash((Block.tag, label, self.body)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedBlock
+            and self.hash == other.hash
+            and ((self.label, self.body) == (other.label, other.body))
+        )
+
+
+class SharedIf(If):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(
+        self,
+        label: Optional[Symbol],
+        condition: Expr,
+        body: Sequence[AST],
+        orelse: Sequence[AST],
+    ) -> None:
+        object.__setattr__(self, "label", label)
+        object.__setattr__(self, "condition", condition)
+        object.__setattr__(self, "body", tuple(body))
+        object.__setattr__(self, "orelse", tuple(orelse))
+        object.__setattr__(
+            self, "hash", hash((If.tag, label, condition, self.body, self.orelse))
+        )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedIf
+            and self.hash == other.hash
+            and (
+                (self.label, self.condition, self.body, self.orelse)
+                == (other.label, other.condition, other.body, other.orelse)
+            )
+        )
+
+
+class SharedWhile(While):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(
+        self, label: Optional[Symbol], condition: Expr, body: Sequence[AST]
+    ) -> None:
+        object.__setattr__(self, "label", label)
+        object.__setattr__(self, "condition", condition)
+        object.__setattr__(self, "body", tuple(body))
+        object.__setattr__(self, "hash", hash((While.tag, label, condition, self.body)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedWhile
+            and self.hash == other.hash
+            and (
+                (self.label, self.condition, self.body)
+                == (other.label, other.condition, other.body)
+            )
+        )
+
+
+class SharedDo(Do):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, label: Optional[Symbol], body: Sequence[AST]) -> None:
+        object.__setattr__(self, "label", label)
+        object.__setattr__(self, "body", tuple(body))
+        object.__setattr__(self, "hash", hash((Do.tag, label, self.body)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedDo
+            and self.hash == other.hash
+            and ((self.label, self.body) == (other.label, other.body))
+        )
+
+
+class SharedBreak(Break):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, label: Optional[Symbol]) -> None:
+        object.__setattr__(self, "label", label)
+        object.__setattr__(self, "hash", hash((Break.tag, label)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedBreak
+            and self.hash == other.hash
+            and ((self.label,) == (other.label,))
+        )
+
+
+class SharedContinue(Continue):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, label: Optional[Symbol]) -> None:
+        object.__setattr__(self, "label", label)
+        object.__setattr__(self, "hash", hash((Continue.tag, label)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedContinue
+            and self.hash == other.hash
+            and ((self.label,) == (other.label,))
+        )
+
+
+class SharedAssign(Assign):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, target: str, value: Expr) -> None:
+        object.__setattr__(self, "target", target)
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "hash", hash((Assign.tag, target, value)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedAssign
+            and self.hash == other.hash
+            and ((self.target, self.value) == (other.target, other.value))
+        )
+
+
+class SharedPrint(Print):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, value: Expr) -> None:
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "hash", hash((Print.tag, value)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedPrint
+            and self.hash == other.hash
+            and ((self.value,) == (other.value,))
+        )
+
+
+class SharedName(Name):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, id: str) -> None:
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "hash", hash((Name.tag, id)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedName
+            and self.hash == other.hash
+            and ((self.id,) == (other.id,))
+        )
+
+
+class SharedConstant(Constant):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, value: int) -> None:
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "hash", hash((Constant.tag, value)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedConstant
+            and self.hash == other.hash
+            and ((self.value,) == (other.value,))
+        )
+
+
+class SharedBinOp(BinOp):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, left: Expr, op: str, right: Expr) -> None:
+        object.__setattr__(self, "left", left)
+        object.__setattr__(self, "op", op)
+        object.__setattr__(self, "right", right)
+        object.__setattr__(self, "hash", hash((BinOp.tag, left, op, right)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedBinOp
+            and self.hash == other.hash
+            and (
+                (self.left, self.op, self.right) == (other.left, other.op, other.right)
+            )
+        )
+
+
+class SharedUnaryOp(UnaryOp):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, op: str, operand: Expr) -> None:
+        object.__setattr__(self, "op", op)
+        object.__setattr__(self, "operand", operand)
+        object.__setattr__(self, "hash", hash((UnaryOp.tag, op, operand)))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {name}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is SharedUnaryOp
+            and self.hash == other.hash
+            and ((self.op, self.operand) == (other.op, other.operand))
+        )
+
+
+SHARED_CLASSES: tuple[Optional[Callable[..., AST]], ...] = (
+    None,
+    SharedModule,
+    SharedBlock,
+    SharedIf,
+    SharedWhile,
+    SharedDo,
+    SharedBreak,
+    SharedContinue,
+    SharedAssign,
+    SharedPrint,
+    SharedName,
+    SharedConstant,
+    SharedBinOp,
+    SharedUnaryOp,
+)
+
+
+class HashConsing:
+    __slots__ = ("table", "requests", "unique")
+
+    def __init__(self) -> None:
+        self.table: dict[AST, AST] = {}
+        self.requests = [0] * len(SHARED_CLASSES)
+        self.unique = [0] * len(SHARED_CLASSES)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def intern(self, node: AST) -> Any:
+        shared = self.table.setdefault(node, node)
+        self.requests[node.tag] += 1
+        if shared is node:
+            self.unique[node.tag] += 1
+        return shared
+
+    def make_Module(self, body: Sequence[AST]) -> Module:
+        node: Module = self.intern(SharedModule(body))
+        return node
+
+    def make_Block(self, label: Optional[Symbol], body: Sequence[AST]) -> Block:
+        node: Block = self.intern(SharedBlock(label, body))
+        return node
+
+    def make_If(
+        self,
+        label: Optional[Symbol],
+        condition: Expr,
+        body: Sequence[AST],
+        orelse: Sequence[AST],
+    ) -> If:
+        node: If = self.intern(SharedIf(label, condition, body, orelse))
+        return node
+
+    def make_While(
+        self, label: Optional[Symbol], condition: Expr, body: Sequence[AST]
+    ) -> While:
+        node: While = self.intern(SharedWhile(label, condition, body))
+        return node
+
+    def make_Do(self, label: Optional[Symbol], body: Sequence[AST]) -> Do:
+        node: Do = self.intern(SharedDo(label, body))
+        return node
+
+    def make_Break(self, label: Optional[Symbol]) -> Break:
+        node: Break = self.intern(SharedBreak(label))
+        return node
+
+    def make_Continue(self, label: Optional[Symbol]) -> Continue:
+        node: Continue = self.intern(SharedContinue(label))
+        return node
+
+    def make_Assign(self, target: str, value: Expr) -> Assign:
+        node: Assign = self.intern(SharedAssign(target, value))
+        return node
+
+    def make_Print(self, value: Expr) -> Print:
+        node: Print = self.intern(SharedPrint(value))
+        return node
+
+    def make_Name(self, id: str) -> Name:
+        node: Name = self.intern(SharedName(id))
+        return node
+
+    def make_Constant(self, value: int) -> Constant:
+        node: Constant = self.intern(SharedConstant(value))
+        return node
+
+    def make_BinOp(self, left: Expr, op: str, right: Expr) -> BinOp:
+        node: BinOp = self.intern(SharedBinOp(left, op, right))
+        return node
+
+    def make_UnaryOp(self, op: str, operand: Expr) -> UnaryOp:
+        node: UnaryOp = self.intern(SharedUnaryOp(op, operand))
+        return node
+
+    def share(self, node: AST) -> AST:
+        layouts = Arena.layouts
+        shared: dict[int, AST] = {}
+        for current in iter_postorder(node):
+            args: list[Any] = []
+            for f_name, shape in layouts[current.tag]:
+                value = getattr(current, f_name)
+                if shape is None:
+                    args.append(value)
+                elif shape == "list":
+                    args.append([shared[id(child)] for child in value])
+                elif shape == "optional" and value is None:
+                    args.append(None)
+                else:
+                    args.append(shared[id(value)])
+            cls = SHARED_CLASSES[current.tag]
+            assert cls is not None
+            shared[id(current)] = self.intern(cls(*args))
+        return shared[id(node)]
+
+    def statistics(self) -> dict[str, tuple[int, int]]:
+        return {
+            cls.__name__.removeprefix("Shared"): (self.requests[tag], self.unique[tag])
+            for tag, cls in enumerate(SHARED_CLASSES)
+            if cls is not None
+        }
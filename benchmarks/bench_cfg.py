@@ -0,0 +1,71 @@
+"""Build the CFGs of deeply nested While and Do loops of growing depth, to check that building them is linear."""
+from __future__ import annotations
+
+import argparse
+import time
+from parser import parse
+
+from AST import iter_preorder
+from cfg import build_cfg
+
+# every level opens a while and a do loop and leaves them through labelled and unlabelled jumps
+LEVEL = (
+    "w{0}: while i{0} < 2 {{ i{0} = i{0} + 1; d{0}: do {{ "
+    "if i{0} % 2 == 0 {{ continue w{0}; }} "
+)
+CLOSE = "break d{0}; }} if i{0} > 5 {{ break w{0}; }} }}\n"
+
+
+def generate(depth: int, repeat: int) -> str:
+    """
+    Generate a Dust source of nested loops.
+
+    :param depth: how deep the loops are nested
+    :param repeat: how many nests follow each other
+    :return: the source
+    """
+    nest = (
+        "".join(f"i{level} = 0; " + LEVEL.format(level) for level in range(depth))
+        + "print 1; "
+        + "".join(CLOSE.format(level) for level in reversed(range(depth)))
+    )
+    return nest * repeat
+
+
+def main() -> None:
+    """
+    Time building CFGs for nests of growing depth and report the time per node.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--depths", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args.add_argument(
+        "--nodes",
+        type=int,
+        default=200_000,
+        help="about how many nodes every source has",
+    )
+    args.add_argument("--runs", type=int, default=3)
+    arguments = args.parse_args()
+
+    for depth in arguments.depths:
+        module = parse(generate(depth, 1))
+        nodes = sum(1 for _ in iter_preorder(module))
+        repeat = max(1, arguments.nodes // nodes)
+        module = parse(generate(depth, repeat))
+        nodes *= repeat
+        times = []
+        for _ in range(arguments.runs):
+            start = time.perf_counter()
+            graph = build_cfg(module)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        print(
+            f"depth {depth:6}: {nodes:8} nodes, {len(graph):7} blocks, {len(graph.targets):7} edges "
+            f"in {best * 1000:8.1f} ms, {best / nodes * 1e9:6.0f} ns per node"
+        )
+
+
+if __name__ == "__main__":
+    main()
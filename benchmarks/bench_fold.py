@@ -0,0 +1,104 @@
+"""
+Fold generated Dust code full of configuration constants, and measure what folding saves the passes after it.
+
+Every generated unit checks a few flags, which are literal constants like the configuration of generated code, so
+most of its branches can never run.
+The benchmark reports the size of the tree, the time to build its SSA form and the size of its bytecode before and
+after folding.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections.abc import Callable
+from parser import parse
+
+import bytecode
+from AST import iter_preorder
+from fold import fold_constants
+from ssa import build_ssa
+
+UNIT = """
+{n}: if {debug} {{
+    trace = trace + {n};
+    if trace % 7 == 0 {{ print trace; }}
+}}
+if {level} >= 2 && {debug} {{
+    i = 0;
+    while i < {n} % 5 {{ print i * {n}; i = i + 1; }}
+}} else {{
+    total = total + {n} * ({level} + 1);
+}}
+while {legacy} {{ total = total - 1; if total < 0 {{ break; }} }}
+"""
+
+
+def generate(units: int, seed: int) -> str:
+    """
+    Generate a Dust source of units with random flags.
+
+    :param units: how many units follow each other
+    :param seed: the seed of the flags
+    :return: the source
+    """
+    flags = random.Random(seed)
+    return (
+        "trace = 0; total = 0;\n"
+        + "".join(
+            UNIT.format(
+                n=f"u{unit}",
+                debug=int(flags.random() < 0.2),
+                level=flags.randrange(4),
+                legacy=int(flags.random() < 0.1),
+            )
+            for unit in range(units)
+        )
+        + "print total;\n"
+    )
+
+
+def best(function: Callable[[], object], runs: int) -> float:
+    """
+    Time calling a function.
+
+    :param function: the function, taking no arguments
+    :param runs: how often to call it
+    :return: the fastest of the calls in seconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    """
+    Fold sources of growing size and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--units", type=int, nargs="+", default=[100, 1000, 5000])
+    args.add_argument("--runs", type=int, default=3)
+    args.add_argument("--seed", type=int, default=0)
+    arguments = args.parse_args()
+
+    for units in arguments.units:
+        module = parse(generate(units, arguments.seed))
+        folded = fold_constants(module)
+        fold_time = best(lambda: fold_constants(module), arguments.runs)
+        print(f"{units} units, folded in {fold_time * 1000:.1f} ms")
+        for label, tree in (("before", module), ("after", folded)):
+            nodes = sum(1 for _ in iter_preorder(tree))
+            ssa_time = best(lambda: build_ssa(tree), arguments.runs)
+            instructions = len(bytecode.compile_module(tree).code) // 2
+            print(
+                f"  {label:6} {nodes:8} nodes   ssa {ssa_time * 1000:8.1f} ms   {instructions:8} instructions"
+            )
+
+
+if __name__ == "__main__":
+    main()
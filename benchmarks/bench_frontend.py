@@ -0,0 +1,60 @@
+"""Measure the wall-clock speedup of the parallel front end against the number of worker processes."""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from AST import deserialize
+from benchmarks.bench_lexer import write_source
+from frontend import parse_files
+
+
+def run(paths: list[str], jobs: int) -> float:
+    """
+    Parse files in parallel and decode the returned Modules in this process.
+
+    :param paths: the source files
+    :param jobs: the number of worker processes
+    :return: the elapsed seconds
+    """
+    start = time.perf_counter()
+    for _, result in parse_files(paths, jobs):
+        assert isinstance(result, bytes)
+        deserialize(result)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """
+    Parse a generated tree of sources with 1, 2, 4, ... workers up to the number of cpus and print the speedups.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--files", type=int, default=200)
+    args.add_argument(
+        "--size", type=float, default=0.05, help="size of every file in MB"
+    )
+    args.add_argument("--runs", type=int, default=3)
+    arguments = args.parse_args()
+
+    cpus = os.cpu_count() or 1
+    counts = [1 << i for i in range(cpus.bit_length()) if 1 << i < cpus] + [cpus]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"{i}.dust") for i in range(arguments.files)]
+        for path in paths:
+            write_source(path, arguments.size)
+        baseline = 0.0
+        for jobs in counts:
+            best = min(run(paths, jobs) for _ in range(arguments.runs))
+            baseline = baseline or best
+            print(
+                f"{jobs:3} jobs {best * 1000:9.2f} ms, speedup {baseline / best:5.2f}x "
+                f"({arguments.files} files of {arguments.size} MB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
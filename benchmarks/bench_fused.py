@@ -0,0 +1,290 @@
+"""
+Run several analyses over a large Module one after the other and fused into a single traversal, and compare.
+
+The analyses are the label resolution of labels.py and some metrics a linter would collect: the number of nodes of
+every class, the variables that are read and assigned, and how deeply loops are nested.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from collections import Counter
+from collections.abc import Callable
+from parser import parse
+from typing import Any
+
+from AST import (
+    AST,
+    Assign,
+    ASTVisitor,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+)
+from benchmarks.bench_fold import generate
+from fused import FusableVisitor, FusedRunner
+from labels import LabelResolver
+
+
+class NodeCounter(ASTVisitor):
+    """Count the nodes of every class, visiting all nodes."""
+
+    def __init__(self) -> None:
+        """Create a counter."""
+        self.counts: Counter[str] = Counter()
+
+    def count(self, node: AST) -> None:
+        """
+        Count a node.
+
+        :param node: the node
+        :return: None
+        """
+        self.counts[type(node).__name__] += 1
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Count a node."""
+        self.count(node)
+
+
+class Skipping(FusableVisitor):
+    """A FusableVisitor whose visit methods do nothing unless they are overridden."""
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Skip a node."""
+
+
+class VariableCollector(Skipping):
+    """Collect the variables that are assigned and read."""
+
+    visits = (Assign, Name)
+
+    def __init__(self) -> None:
+        """Create a collector."""
+        self.assigned: set[str] = set()
+        self.read: set[str] = set()
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Collect an assigned variable."""
+        self.assigned.add(node.target)
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Collect a read variable."""
+        self.read.add(node.id)
+
+
+class LoopDepth(Skipping):
+    """Find how deeply loops are nested."""
+
+    visits = leaves = (While, Do)
+
+    def __init__(self) -> None:
+        """Create a depth counter."""
+        self.depth = 0
+        self.deepest = 0
+
+    def enter(self) -> None:
+        """
+        Enter a loop.
+
+        :return: None
+        """
+        self.depth += 1
+        self.deepest = max(self.deepest, self.depth)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Enter a loop."""
+        self.enter()
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Enter a loop."""
+        self.enter()
+
+    def leave(self, node: AST) -> None:
+        """
+        Leave a loop.
+
+        :param node: the loop
+        :return: None
+        """
+        self.depth -= 1
+
+
+ANALYSES: list[Callable[[], ASTVisitor]] = [
+    LabelResolver,
+    NodeCounter,
+    VariableCollector,
+    LoopDepth,
+]
+
+
+def results(visitor: ASTVisitor) -> object:
+    """
+    Get what an analysis found, to check that fusing doesn't change it.
+
+    :param visitor: the visitor after it ran
+    :return: its results
+    """
+    if isinstance(visitor, LabelResolver):
+        return sorted(map(id, visitor.table.exits)), len(visitor.table.targets)
+    if isinstance(visitor, NodeCounter):
+        return visitor.counts
+    if isinstance(visitor, VariableCollector):
+        return visitor.assigned, visitor.read
+    assert isinstance(visitor, LoopDepth)
+    return visitor.deepest
+
+
+def best(function: Callable[[], object], runs: int) -> float:
+    """
+    Time calling a function.
+
+    :param function: the function, taking no arguments
+    :param runs: how often to call it
+    :return: the fastest of the calls in seconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    """
+    Run the analyses over modules of growing size, one after the other and fused, and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--units", type=int, nargs="+", default=[100, 1000, 5000])
+    args.add_argument("--runs", type=int, default=5)
+    arguments = args.parse_args()
+
+    for units in arguments.units:
+        module = parse(generate(units, 0))
+        separate = [analysis() for analysis in ANALYSES]
+        for visitor in separate:
+            FusedRunner([visitor]).run(module)
+        fused = [analysis() for analysis in ANALYSES]
+        FusedRunner(fused).run(module)
+        assert [results(v) for v in separate] == [results(v) for v in fused]
+
+        def one_by_one() -> None:
+            for analysis in ANALYSES:
+                FusedRunner([analysis()]).run(module)
+
+        alone = best(one_by_one, arguments.runs)
+        together = best(
+            lambda: FusedRunner([analysis() for analysis in ANALYSES]).run(module),
+            arguments.runs,
+        )
+        print(
+            f"{units:6} units: {len(ANALYSES)} walks {alone * 1000:8.1f} ms   "
+            f"1 fused walk {together * 1000:8.1f} ms   {alone / together:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Apply random single-character edits to a large Dust source, reparsing it incrementally and from scratch."""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import statistics
+import time
+from parser import parse
+
+from AST import serialize
+from incremental import IncrementalParser
+
+SNIPPET = """block{0}: while i < 100 {{
+    inner{0}: if i % 7 == 3 {{
+        total = total + i * 2;
+    }} else {{
+        i = i + 1;
+    }}
+    i = i + 1;
+}}
+"""
+SNIPPET_LINES = SNIPPET.count("\n")
+# edits that keep the source valid: change a digit, or add or remove a space after a semicolon
+DIGIT = re.compile(rb"[0-9]")
+SEMICOLON = re.compile(rb";")
+DOUBLE_SPACE = re.compile(rb";  ")
+
+
+def random_edit(source: bytes, rng: random.Random) -> tuple[int, int, bytes]:
+    """
+    Pick a single-character edit that keeps the source valid.
+
+    :param source: the current source
+    :param rng: the random number generator
+    :return: the start and end of the replaced range and the new text
+    """
+    kind = rng.randrange(3)
+    if kind == 0:
+        position = rng.choice([m.start() for m in DIGIT.finditer(source)])
+        return position, position + 1, str(rng.randrange(10)).encode()
+    spaces = [m.start() + 1 for m in DOUBLE_SPACE.finditer(source)]
+    if kind == 1 and spaces:
+        position = rng.choice(spaces)
+        return position, position + 1, b""
+    position = rng.choice([m.start() for m in SEMICOLON.finditer(source)]) + 1
+    return position, position, b" "
+
+
+def main() -> None:
+    """
+    Time full parses and incremental reparses and check that both end up with the same tree.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--lines", type=int, default=50_000)
+    args.add_argument("--edits", type=int, default=200)
+    args.add_argument("--full-parses", type=int, default=3)
+    args.add_argument("--seed", type=int, default=0)
+    arguments = args.parse_args()
+
+    rng = random.Random(arguments.seed)
+    source = "".join(
+        SNIPPET.format(i) for i in range(arguments.lines // SNIPPET_LINES)
+    ).encode()
+
+    full = []
+    for _ in range(arguments.full_parses):
+        start = time.perf_counter()
+        parse(source)
+        full.append(time.perf_counter() - start)
+
+    incremental = IncrementalParser(source)
+    edits = []
+    for _ in range(arguments.edits):
+        edit = random_edit(incremental.source, rng)
+        start = time.perf_counter()
+        incremental.edit(*edit)
+        edits.append(time.perf_counter() - start)
+
+    assert incremental.module is not None
+    assert serialize(incremental.module) == serialize(parse(incremental.source))
+    lines = source.count(b"\n")
+    print(f"source:      {lines} lines, {len(source) / 1024:.0f} KiB")
+    print(f"full parse:  {statistics.mean(full) * 1000:9.3f} ms")
+    print(
+        f"incremental: {statistics.mean(edits) * 1000:9.3f} ms mean, "
+        f"{max(edits) * 1000:.3f} ms max over {arguments.edits} edits "
+        f"({incremental.partial_parses} partial, {incremental.full_parses - 1} full reparses)"
+    )
+
+
+if __name__ == "__main__":
+    main()
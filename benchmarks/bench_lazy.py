@@ -0,0 +1,68 @@
+"""Compare eagerly decoding a cached Module with the lazy, memory-mapped loader."""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from AST import Module, iter_preorder
+from benchmarks.bench_lexer import write_source
+from cache import Cache, load_lazy_module, load_module
+
+
+def measure(function: Callable[[], int]) -> tuple[float, int, int]:
+    """
+    Run a function twice, once timing it and once tracing its peak memory, which slows it down too much to time it.
+
+    :param function: the function to measure
+    :return: the elapsed seconds, the peak traced bytes and the result of the function
+    """
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main() -> None:
+    """
+    Load a cached source eagerly and lazily, touching only the top level or the whole tree.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--size", type=float, default=4.0, help="source size in MB")
+    arguments = args.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.dust")
+        write_source(path, arguments.size)
+        cache = Cache.for_source(path)
+        load_module(path, cache)
+
+        def top_level(load: Callable[[str, Cache], Module]) -> int:
+            return len(load(path, cache).body)
+
+        def whole_tree(load: Callable[[str, Cache], Module]) -> int:
+            return sum(1 for _ in iter_preorder(load(path, cache)))
+
+        for name, load in (("eager", load_module), ("lazy", load_lazy_module)):
+            for touched, function in (
+                ("top level", top_level),
+                ("whole tree", whole_tree),
+            ):
+                elapsed, peak, count = measure(lambda: function(load))
+                print(
+                    f"{name:5} {touched:10} {count:8} nodes in {elapsed * 1000:9.2f} ms, "
+                    f"peak mem {peak / 1024:10.1f} KiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Measure the throughput of the lexer on a generated multi-megabyte Dust source."""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from lexer import tokenize_file
+
+SNIPPET = b"""outer: while i < 100 {
+    // some filler to make the file look less uniform
+    do {
+        inner: if i % 7 == 3 { total = total + i * 2; break; }
+        i = i + 1;
+    }
+}
+"""
+
+
+def write_source(path: str, megabytes: float) -> int:
+    """
+    Write a synthetic Dust source of roughly the requested size.
+
+    :param path: where to write the source to
+    :param megabytes: the approximate size of the file
+    :return: the actual size in bytes
+    """
+    repeat = int(megabytes * 1024 * 1024) // len(SNIPPET) + 1
+    with open(path, "wb") as f:
+        f.write(SNIPPET * repeat)
+    return len(SNIPPET) * repeat
+
+
+def main() -> None:
+    """
+    Tokenize the generated source a few times and report MB/s and peak traced memory.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--size", type=float, default=16.0, help="source size in MB")
+    args.add_argument("--runs", type=int, default=3)
+    arguments = args.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.dust")
+        size = write_source(path, arguments.size)
+        best = float("inf")
+        tokens = 0
+        for _ in range(arguments.runs):
+            start = time.perf_counter()
+            tokens = sum(1 for _ in tokenize_file(path))
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        for _ in tokenize_file(path):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    mb = size / (1024 * 1024)
+    print(f"source:     {mb:.1f} MB, {tokens} tokens")
+    print(f"throughput: {mb / best:.2f} MB/s ({tokens / best:,.0f} tokens/s)")
+    print(f"peak mem:   {peak / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
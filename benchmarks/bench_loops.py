@@ -0,0 +1,127 @@
+"""Run nested-loop kernels on the vm, optimised with and without the loop passes, and report the speedup."""
+from __future__ import annotations
+
+import argparse
+import io
+import statistics
+from parser import parse
+
+from AST import Module
+from benchmarks.bench_vm import timings, vm_runner
+from optimize import PIPELINE, SCALAR_PIPELINE, optimize
+
+# n is computed by a loop so that constant propagation can't fold the kernels away
+PRELUDE = "n = 0; while n < {size} {{ n = n + 1; }}\n"
+
+KERNELS = {
+    # an invariant computation in the innermost loop
+    "invariant": """
+        scale = n % 7 + 2; total = 0; i = 0;
+        while i < n {
+            j = 0;
+            while j < n {
+                k = scale * scale + n * 3;
+                total = total + (i * j + k) % 1000;
+                j = j + 1;
+            }
+            i = i + 1;
+        }
+        print total;
+    """,
+    # a branch on a flag set before the loops
+    "unswitch": """
+        mode = n % 2; total = 0; i = 0;
+        while i < n {
+            j = 0;
+            while j < n {
+                if mode == 0 { total = total + i * j % 7; } else { total = total - j; }
+                j = j + 1;
+            }
+            i = i + 1;
+        }
+        print total;
+    """,
+    # a triangle whose bound and weight only depend on the outer loop
+    "triangle": """
+        total = 0; i = 0;
+        while i < n {
+            j = 0;
+            do {
+                limit = n * 2 - n;
+                if j >= limit { break; }
+                weight = n / 10 + 1;
+                total = total + j * weight % 13;
+                j = j + 1;
+            }
+            i = i + 1;
+        }
+        print total;
+    """,
+    # three levels, with invariants and a branch at every level
+    "nest": """
+        verbose = n % 3 == 1; total = 0; i = 0;
+        while i < n / 3 {
+            j = 0;
+            base = n * n;
+            while j < n / 3 {
+                k = 0;
+                offset = base + n;
+                while k < 10 {
+                    if verbose { total = total + offset % 17; } else { total = total + k; }
+                    step = base % 5 + 1;
+                    k = k + step;
+                }
+                j = j + 1;
+            }
+            i = i + 1;
+        }
+        print total;
+    """,
+}
+
+
+def run(module: Module, runs: int) -> tuple[str, list[float]]:
+    """
+    Compile a module for the vm and time it.
+
+    :param module: the module
+    :param runs: how often to run it
+    :return: its output and the elapsed seconds of every run
+    """
+    runner = vm_runner(module)
+    out = io.StringIO()
+    runner(out)
+    return out.getvalue(), timings(runner, runs)
+
+
+def main() -> None:
+    """
+    Benchmark every kernel with the loop passes off and on and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--runs", type=int, default=5)
+    args.add_argument("--size", type=int, default=150)
+    args.add_argument(
+        "kernels", nargs="*", help="names of the kernels to run, all by default"
+    )
+    arguments = args.parse_args()
+
+    for name, kernel in KERNELS.items():
+        if arguments.kernels and name not in arguments.kernels:
+            continue
+        module = parse((PRELUDE.format(size=arguments.size) + kernel).encode())
+        results = {}
+        for label, pipeline in (("off", SCALAR_PIPELINE), ("on", PIPELINE)):
+            output, times = run(optimize(module, pipeline), arguments.runs)
+            results[label] = output, statistics.mean(times)
+        assert results["off"][0] == results["on"][0], f"{name} prints differently"
+        off, on = results["off"][1], results["on"][1]
+        print(
+            f"{name:10} off {off * 1000:9.2f} ms   on {on * 1000:9.2f} ms   {off / on:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
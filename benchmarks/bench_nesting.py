@@ -0,0 +1,112 @@
+"""
+Compile and run deeply nested sources with every backend, and fail unless each either runs them or reports them.
+
+A backend may refuse a nest it can't handle, like CPython refusing deep python code, but only with a
+DustSyntaxError, never with a RecursionError or another crash.
+Every run must also finish within a time limit, which catches passes that are quadratic in the nesting depth, like
+flattening nested Blocks level by level once did when folding constants.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import sys
+import time
+from parser import parse
+
+import bytecode
+import codegen
+import vm
+from AST import Module
+from lexer import DustSyntaxError
+from optimize import optimize
+
+SHAPES = {
+    "blocks": ("{{ ", "print 1; ", "}} "),
+    "statements": ("{{ print i; ", "print 1; ", "}} "),
+    "ifs": ("if i < 2 {{ ", "print i; ", "}} "),
+    "loops": ("l{0}: do {{ ", "print 1; ", "break l{0}; }} "),
+    "whiles": ("j{0} = 0; while j{0} < 1 {{ j{0} = j{0} + 1; ", "print 1; ", "}} "),
+}
+
+BACKENDS = ("vm", "python")
+
+
+def run(backend: str, module: Module) -> str:
+    """
+    Compile a module with a backend and run it.
+
+    :param backend: the name of the backend in BACKENDS
+    :param module: the module
+    :return: what the module printed
+    """
+    out = io.StringIO()
+    if backend == "vm":
+        vm.run(bytecode.compile_module(module), out)
+    else:
+        codegen.run(codegen.compile_module(module), out)
+    return out.getvalue()
+
+
+def generate(shape: str, depth: int) -> str:
+    """
+    Generate a Dust source nesting a statement.
+
+    :param shape: the name of the nested statement in SHAPES
+    :param depth: how deep it is nested
+    :return: the source
+    """
+    opening, innermost, closing = SHAPES[shape]
+    return (
+        "i = 1; "
+        + "".join(opening.format(level) for level in range(depth))
+        + innermost
+        + "".join(closing.format(level) for level in reversed(range(depth)))
+    )
+
+
+def main() -> None:
+    """
+    Try every shape, depth and backend, with and without optimising, and print what happened.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--depths", type=int, nargs="+", default=[100, 1000, 5000])
+    args.add_argument("--shapes", choices=SHAPES, nargs="+", default=list(SHAPES))
+    args.add_argument(
+        "--limit", type=float, default=5.0, help="the seconds a single run may take"
+    )
+    arguments = args.parse_args()
+
+    failed = False
+    for shape in arguments.shapes:
+        for depth in arguments.depths:
+            module = parse(generate(shape, depth))
+            for optimised in (False, True):
+                for backend in BACKENDS:
+                    start = time.perf_counter()
+                    try:
+                        printed = run(
+                            backend, optimize(module) if optimised else module
+                        )
+                        outcome = f"printed {len(printed.split())} values"
+                    except DustSyntaxError as e:
+                        outcome = f"refused: {e.msg}"
+                    except Exception as e:
+                        outcome = f"CRASHED: {type(e).__name__}"
+                        failed = True
+                    elapsed = time.perf_counter() - start
+                    if elapsed > arguments.limit:
+                        outcome += ", TOO SLOW"
+                        failed = True
+                    print(
+                        f"{shape:10} {depth:6} {'-O' if optimised else '  '} {backend:6} "
+                        f"{elapsed * 1000:8.1f} ms   {outcome}"
+                    )
+    if failed:
+        sys.exit("some backend crashed on a deep nest or was too slow")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare the binary AST encoding with pickling the nodes or a pickled Arena."""
+from __future__ import annotations
+
+import argparse
+import pickle
+import time
+from collections.abc import Callable
+from parser import parse
+from typing import Any
+
+from AST import AST, Arena, deserialize, serialize
+
+
+def pickle_arena(tree: AST) -> bytes:
+    """
+    Store a tree in an Arena and pickle that.
+
+    :param tree: the tree to pickle
+    :return: the pickled arena
+    """
+    arena = Arena()
+    arena.add(tree)
+    return pickle.dumps(arena, pickle.HIGHEST_PROTOCOL)
+
+
+def unpickle_arena(data: bytes) -> AST:
+    """
+    Rebuild a tree from a pickled Arena.
+
+    :param data: the pickled arena
+    :return: the tree
+    """
+    arena: Arena = pickle.loads(data)
+    return arena.materialize(len(arena) - 1)
+
+
+FORMATS: dict[str, tuple[Callable[[AST], bytes], Callable[[bytes], Any]]] = {
+    "pickle": (lambda tree: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL), pickle.loads),
+    "pickled Arena": (pickle_arena, unpickle_arena),
+    "serialize": (serialize, deserialize),
+}
+
+
+def main() -> None:
+    """
+    Encode and decode a wide and a deep tree in each format and print sizes and timings.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--statements", type=int, default=20_000)
+    args.add_argument("--depth", type=int, default=100_000)
+    arguments = args.parse_args()
+
+    wide = parse(
+        "outer: while i < 10 { if i % 3 == 0 { total = total + i * 2; } else { break outer; } }\n"
+        * (arguments.statements // 4)
+    )
+    deep = parse("a: do {" * arguments.depth + "}" * arguments.depth)
+    for shape, tree in (("wide", wide), ("deep", deep)):
+        for name, (dump, load) in FORMATS.items():
+            try:
+                start = time.perf_counter()
+                data = dump(tree)
+                dumped = time.perf_counter()
+                load(data)
+                loaded = time.perf_counter()
+            except RecursionError:
+                print(f"{shape:5} {name:14} RecursionError")
+                continue
+            print(
+                f"{shape:5} {name:14} {len(data):10} bytes, "
+                f"dump {(dumped - start) * 1000:8.2f} ms, load {(loaded - dumped) * 1000:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
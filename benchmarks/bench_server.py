@@ -0,0 +1,124 @@
+"""
+Run a program through client.py and a compile server, and as a fresh main.py process, and compare the latencies.
+
+Before that, check what the client does when it can't get an answer: without a server it must fail with a single
+line naming the socket, and with a FILE argument that doesn't exist it must report a usage error like main.py,
+neither with a traceback.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAM = os.path.join("benchmarks", "programs", "primes.dust")
+
+
+def run(arguments: list[str], socket: str) -> subprocess.CompletedProcess[str]:
+    """
+    Run a script of the repository.
+
+    :param arguments: the script and its arguments
+    :param socket: the socket the client talks to
+    :return: the finished process
+    """
+    return subprocess.run(
+        [sys.executable, *arguments],
+        cwd=ROOT,
+        env={**os.environ, "DUST_SOCKET": socket},
+        capture_output=True,
+        text=True,
+    )
+
+
+def check_errors(socket: str) -> bool:
+    """
+    Check the errors of the client when there is no server and when a FILE doesn't exist.
+
+    :param socket: a socket no server listens on
+    :return: if the client behaved
+    """
+    ok = True
+    no_server = run(["client.py", "--interpret", PROGRAM], socket)
+    lines = no_server.stderr.splitlines()
+    if no_server.returncode == 0 or lines != [f"no compile server on {socket}"]:
+        print(
+            f"without a server: exit {no_server.returncode}, stderr {no_server.stderr!r}"
+        )
+        ok = False
+    missing = run(["client.py", "--interpret", "missing.dust"], socket)
+    if missing.returncode != 2 or "can't open 'missing.dust'" not in missing.stderr:
+        print(
+            f"with a missing FILE: exit {missing.returncode}, stderr {missing.stderr!r}"
+        )
+        ok = False
+    return ok
+
+
+def best(arguments: list[str], socket: str, runs: int) -> tuple[float, str]:
+    """
+    Time a command.
+
+    :param arguments: the script and its arguments
+    :param socket: the socket the client talks to
+    :param runs: how often to run it
+    :return: the fastest run in seconds and what it printed
+    """
+    times = []
+    stdout = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        stdout = run(arguments, socket).stdout
+        times.append(time.perf_counter() - start)
+    return min(times), stdout
+
+
+def main() -> None:
+    """
+    Check the errors of the client, then time both ways of running the program and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--runs", type=int, default=10)
+    arguments = args.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket = os.path.join(directory, "dust.sock")
+        if not check_errors(socket):
+            sys.exit("the client doesn't report errors properly")
+        server = subprocess.Popen(
+            [sys.executable, "main.py", "--serve", socket],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(socket):
+                time.sleep(0.01)
+            for options in (["--interpret"], ["--compile"], ["-O", "--interpret"]):
+                cold, expected = best(
+                    ["main.py", *options, PROGRAM], socket, arguments.runs
+                )
+                warm, printed = best(
+                    ["client.py", *options, PROGRAM], socket, arguments.runs
+                )
+                if printed != expected:
+                    sys.exit(
+                        f"the server printed something else for {' '.join(options)}"
+                    )
+                print(
+                    f"{' '.join(options):15} main.py {cold * 1000:7.1f} ms   "
+                    f"client.py {warm * 1000:7.1f} ms   {cold / warm:5.2f}x"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
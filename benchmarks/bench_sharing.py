@@ -0,0 +1,101 @@
+"""Compare the memory held by a parsed tree with its hash-consed DAG, on a source full of repeated statements."""
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from collections.abc import Callable
+from parser import parse
+
+from AST import AST, HashConsing, iter_preorder, serialize
+
+# generated programs mostly repeat the same few shapes with little variation
+TEMPLATES = [
+    "if x % {0} == 0 {{ total = total + {0}; }} else {{ x = x + 1; }}\n",
+    "guard: if x > {0} {{ print x; break guard; }}\n",
+    "i = 0; while i < {0} {{ total = total + i; i = i + 1; }}\n",
+    "block: {{ x = x * 2 % 1000; if x == {0} {{ break block; }} }}\n",
+]
+
+
+def generate(statements: int, variants: int, seed: int) -> bytes:
+    """
+    Generate a machine-like Dust source.
+
+    :param statements: the number of statements
+    :param variants: the number of different constants per template
+    :param seed: the seed of the random choices
+    :return: the source
+    """
+    rng = random.Random(seed)
+    return "".join(
+        rng.choice(TEMPLATES).format(rng.randrange(1, variants + 1))
+        for _ in range(statements)
+    ).encode()
+
+
+def retained(build: Callable[[], AST]) -> tuple[AST, int]:
+    """
+    Build a tree and measure the memory it keeps alive.
+
+    :param build: builds the tree
+    :return: the tree and the traced bytes still allocated after building it
+    """
+    gc.collect()
+    tracemalloc.start()
+    tree = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tree, current
+
+
+def main() -> None:
+    """
+    Parse a generated source, share it, and report the memory of both trees and the sharing statistics.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--statements", type=int, default=50_000)
+    args.add_argument("--variants", type=int, default=10)
+    args.add_argument("--seed", type=int, default=0)
+    arguments = args.parse_args()
+
+    source = generate(arguments.statements, arguments.variants, arguments.seed)
+    tree, plain = retained(lambda: parse(source))
+    factory = HashConsing()
+    start = time.perf_counter()
+    dag = factory.share(tree)
+    elapsed = time.perf_counter() - start
+    assert serialize(dag) == serialize(tree)
+    nodes = sum(1 for _ in iter_preorder(tree))
+    del tree, dag, factory
+    factories: list[HashConsing] = []
+
+    def build() -> AST:
+        factory = HashConsing()
+        shared = factory.share(parse(source))
+        # the table is part of the cost of sharing
+        factories.append(factory)
+        return shared
+
+    _, shared = retained(build)
+    factory = factories[0]
+
+    print(
+        f"source:  {len(source) / 1024:.0f} KiB, {nodes} nodes, shared in {elapsed * 1000:.1f} ms"
+    )
+    print(f"tree:    {plain / 1024:10.1f} KiB")
+    print(
+        f"shared:  {shared / 1024:10.1f} KiB, {len(factory)} distinct nodes, {plain / shared:.1f}x smaller"
+    )
+    for name, (requests, unique) in factory.statistics().items():
+        if requests:
+            print(f"    {name:8} {requests:8} nodes, {unique:6} distinct")
+
+
+if __name__ == "__main__":
+    main()
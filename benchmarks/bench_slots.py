@@ -0,0 +1,85 @@
+"""Compare the memory footprint and attribute access speed of AST nodes with and without __slots__."""
+from __future__ import annotations
+
+import argparse
+import ast
+import time
+import tracemalloc
+from typing import Any
+
+import generate_ast_classes
+
+
+def build_classes(generate_slots: bool) -> dict[str, Any]:
+    """
+    Generate the AST classes the same way AST.py is generated and execute them.
+
+    :param generate_slots: if the classes should use __slots__
+    :return: the namespace holding the generated classes
+    """
+    generate_ast_classes.visitor_names.clear()
+    generate_ast_classes.node_names.clear()
+    module = ast.Module(
+        body=list(generate_ast_classes.file_module.body), type_ignores=[]
+    )
+    generate_ast_classes.generate_nodes(module, generate_slots=generate_slots)
+    generate_ast_classes.generate_visitor(module)
+    namespace: dict[str, Any] = {}
+    exec(ast.unparse(module), namespace)
+    return namespace
+
+
+def bytes_per_node(namespace: dict[str, Any], count: int) -> float:
+    """
+    Measure how many bytes a labelled Block costs, including its (empty) body list.
+
+    :param namespace: the generated classes
+    :param count: how many nodes to allocate
+    :return: the average size of a node in bytes
+    """
+    block = namespace["Block"]
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    nodes = [block("label", []) for _ in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # the list holding the nodes is not part of the nodes themselves
+    return (after - before - nodes.__sizeof__()) / count
+
+
+def access_time(namespace: dict[str, Any], count: int) -> float:
+    """
+    Measure the time it takes to read label and body of a node.
+
+    :param namespace: the generated classes
+    :param count: how many reads to do
+    :return: nanoseconds per read of both attributes
+    """
+    node = namespace["Block"]("label", [])
+    start = time.perf_counter()
+    for _ in range(count):
+        node.label
+        node.body
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def main() -> None:
+    """
+    Run the comparison and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--nodes", type=int, default=200_000)
+    arguments = args.parse_args()
+
+    for generate_slots in (False, True):
+        namespace = build_classes(generate_slots)
+        size = bytes_per_node(namespace, arguments.nodes)
+        speed = access_time(namespace, arguments.nodes * 10)
+        title = "with __slots__" if generate_slots else "without __slots__"
+        print(f"{title:18} {size:7.1f} bytes/node {speed:7.1f} ns/access")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Measure the imports of main.py with python -X importtime, for every phase, and fail if they exceed the budget.
+
+Each phase has a list of modules it must not import, which catches an eager import of another phase whatever the
+machine, and a budget for the import time on top of what the bare interpreter needs, taking the best of some runs.
+The budget is a multiple of the import time of the bare interpreter measured in the same run, so it scales with the
+speed of the machine instead of failing on slower ones.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROGRAM = os.path.join("benchmarks", "programs", "primes.dust")
+
+# only watch mode, the server and parallel parsing need these
+NEVER = {
+    "concurrent.futures",
+    "incremental",
+    "multiprocessing",
+    "server",
+    "socket",
+    "watch",
+}
+PHASES = {
+    "parse": ([], NEVER | {"ast", "bytecode", "codegen", "vm"}),
+    "interpret": (["--interpret"], NEVER | {"ast", "codegen"}),
+    "compile": (["--compile"], NEVER),
+}
+
+
+def import_time(arguments: list[str]) -> tuple[int, set[str]]:
+    """
+    Run python with -X importtime.
+
+    :param arguments: the arguments after the interpreter options
+    :return: the total import time in microseconds and the names of all imported modules
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    total = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if not line.startswith("import time:") or not fields[1].strip().isdigit():
+            continue
+        name = fields[2]
+        modules.add(name.strip())
+        # nested imports are part of the cumulative time of the top level import
+        if not name[1:].startswith(" "):
+            total += int(fields[1])
+    return total, modules
+
+
+def best(arguments: list[str], runs: int) -> tuple[int, set[str]]:
+    """
+    Measure the import time of a command a number of times.
+
+    :param arguments: the arguments after the interpreter options
+    :param runs: the number of runs
+    :return: the lowest total import time in microseconds and the names of all imported modules
+    """
+    times, modules = zip(*(import_time(arguments) for _ in range(runs)))
+    return min(times), set.union(*modules)
+
+
+def main() -> None:
+    """
+    Measure every phase, print the results and exit with 1 if any phase exceeds the budget.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--runs", type=int, default=10)
+    args.add_argument(
+        "--budget",
+        type=float,
+        default=20.0,
+        help="the import time allowed on top of the bare interpreter, as a multiple of the interpreter's own",
+    )
+    arguments = args.parse_args()
+
+    baseline, builtin = best(["-c", "pass"], arguments.runs)
+    budget = baseline * arguments.budget / 1000
+    print(
+        f"{'interpreter':<11} {baseline / 1000:7.2f} ms {len(builtin):4} modules   "
+        f"budget {budget:.2f} ms per phase"
+    )
+    failed = False
+    for phase, (options, forbidden) in PHASES.items():
+        total, modules = best(["main.py", *options, PROGRAM], arguments.runs)
+        extra = (total - baseline) / 1000
+        imported = sorted(modules & forbidden)
+        print(f"{phase:<11} {extra:+7.2f} ms {len(modules - builtin):+4} modules")
+        if imported:
+            print(f"    imports {', '.join(imported)}")
+        if extra > budget:
+            print(f"    exceeds the budget of {budget:.2f} ms")
+        failed = failed or bool(imported) or extra > budget
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
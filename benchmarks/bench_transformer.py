@@ -0,0 +1,100 @@
+"""
+Replace a single statement of a large Module with the ASTTransformer, copying only the spine above it or every list.
+
+The copy-on-write transformer shares every subtree that doesn't change with the original Module, while a pass that
+rebuilds every statement list on the way copies all compound statements, whatever it changes.
+The benchmark reports the time, the peak of the memory allocated and the nodes that are not shared, for both.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from parser import parse
+from typing import Any
+
+from AST import AST, ASTTransformer, Module, Name, Print, iter_preorder
+from benchmarks.bench_fold import generate
+
+
+class Replacer(ASTTransformer):
+    """Replace a single print statement."""
+
+    def __init__(self, target: Print):
+        """
+        Create a replacer.
+
+        :param target: the statement to replace
+        """
+        self.target = target
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Replace the target."""
+        return Print(Name("replaced")) if node is self.target else node
+
+
+class ListRebuilder(Replacer):
+    """Replace a single print statement, but rebuild every statement list on the way."""
+
+    def results(self, nodes: list[AST]) -> list[AST]:
+        """
+        Rebuild a list of nodes from their replacements.
+
+        :param nodes: the nodes
+        :return: a new list, even if no node changed
+        """
+        return [self.transformed.get(id(node), node) for node in nodes]
+
+
+def measure(transformer: Replacer, module: Module, runs: int) -> tuple[float, int, int]:
+    """
+    Transform a module repeatedly to measure the time, and once more to measure the memory it takes.
+
+    :param transformer: the transformer
+    :param module: the module
+    :param runs: how often to time it
+    :return: the fastest run in seconds, the peak of bytes allocated and the number of nodes not shared with module
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        transformer.transform(module)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    new = transformer.transform(module)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    old = {id(node) for node in iter_preorder(module)}
+    copied = sum(1 for node in iter_preorder(new) if id(node) not in old)
+    return min(times), peak, copied
+
+
+def main() -> None:
+    """
+    Replace the last statement of modules of growing size and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--units", type=int, nargs="+", default=[100, 1000, 5000])
+    args.add_argument("--runs", type=int, default=5)
+    arguments = args.parse_args()
+
+    for units in arguments.units:
+        module = parse(generate(units, 0))
+        target = module.body[-1]
+        assert isinstance(target, Print)
+        nodes = sum(1 for _ in iter_preorder(module))
+        print(f"{units} units, {nodes} nodes")
+        for label, transformer in (
+            ("copy-on-write", Replacer(target)),
+            ("rebuild lists", ListRebuilder(target)),
+        ):
+            elapsed, peak, copied = measure(transformer, module, arguments.runs)
+            print(
+                f"  {label:14} {elapsed * 1000:8.1f} ms   peak {peak / 1024:8.0f} KiB   {copied:7} nodes copied"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare the explicit-stack traversals in AST.py with a recursive ASTVisitor."""
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable
+from parser import parse
+from typing import Any
+
+from AST import AST, ASTVisitor, iter_events, iter_postorder, iter_preorder
+
+
+class RecursiveCounter(ASTVisitor):
+    """Count nodes by recursing through accept()."""
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> int:
+        """
+        Count a node and all of its descendants.
+
+        :param node: the node to count
+        :return: the number of nodes
+        """
+        count: int = 1 + sum(child.accept(self) for child in node.children())
+        return count
+
+    visit_Module = visit_Block = visit_If = visit_While = visit_Do = visit_AST
+    visit_Break = visit_Continue = visit_Assign = visit_Print = visit_AST
+    visit_Name = visit_Constant = visit_BinOp = visit_UnaryOp = visit_AST
+
+
+def timed(function: Callable[[], int]) -> tuple[float, int]:
+    """
+    Run a function once and time it.
+
+    :param function: the function to time
+    :return: the elapsed seconds and the result of the function
+    """
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    """
+    Traverse a wide and a deep tree with each strategy and print the timings.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--nodes", type=int, default=100_000)
+    args.add_argument("--depth", type=int, default=100_000)
+    arguments = args.parse_args()
+
+    wide = parse("a: while x { if y { } do { {} } }" * (arguments.nodes // 7))
+    deep = parse("a: do {" * arguments.depth + "}" * arguments.depth)
+    strategies: dict[str, Callable[[AST], int]] = {
+        "recursive accept()": lambda tree: tree.accept(RecursiveCounter()),
+        "iter_preorder": lambda tree: sum(1 for _ in iter_preorder(tree)),
+        "iter_postorder": lambda tree: sum(1 for _ in iter_postorder(tree)),
+        "iter_events": lambda tree: sum(1 for _ in iter_events(tree)) // 2,
+    }
+    for shape, tree in (("wide", wide), ("deep", deep)):
+        for name, strategy in strategies.items():
+            try:
+                elapsed, count = timed(lambda: strategy(tree))
+            except RecursionError:
+                print(f"{shape:5} {name:20} RecursionError")
+                continue
+            print(f"{shape:5} {name:20} {count} nodes in {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Run the loop heavy Dust programs in benchmarks/programs, in the style of pyperformance.
+
+Every program is compiled once for each backend, then run a number of times, and mean and standard deviation are
+reported.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import io
+import os
+import statistics
+import time
+from collections.abc import Callable
+from parser import parse_file
+
+import bytecode
+import codegen
+import vm
+from AST import Module
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), "programs")
+
+
+def vm_runner(module: Module) -> Callable[[io.StringIO], object]:
+    """
+    Compile a module for the vm.
+
+    :param module: the module
+    :return: a function running the compiled module
+    """
+    code = bytecode.compile_module(module)
+    return lambda out: vm.run(code, out)
+
+
+def python_runner(module: Module) -> Callable[[io.StringIO], object]:
+    """
+    Compile a module to a python code object.
+
+    :param module: the module
+    :return: a function running the compiled module
+    """
+    code = codegen.compile_module(module)
+    return lambda out: codegen.run(code, out)
+
+
+BACKENDS = {"vm": vm_runner, "python": python_runner}
+
+
+def timings(runner: Callable[[io.StringIO], object], runs: int) -> list[float]:
+    """
+    Run compiled code repeatedly.
+
+    :param runner: runs the code
+    :param runs: how often to run it
+    :return: the elapsed seconds of every run
+    """
+    result = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        runner(io.StringIO())
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def main() -> None:
+    """
+    Benchmark every program and print the results.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser(description=__doc__)
+    args.add_argument("--runs", type=int, default=5)
+    args.add_argument("--backend", choices=BACKENDS, action="append")
+    args.add_argument(
+        "programs", nargs="*", help="names of the programs to run, all by default"
+    )
+    arguments = args.parse_args()
+
+    for path in sorted(glob.glob(os.path.join(PROGRAMS, "*.dust"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if arguments.programs and name not in arguments.programs:
+            continue
+        module = parse_file(path)
+        for backend in arguments.backend or BACKENDS:
+            times = timings(BACKENDS[backend](module), arguments.runs)
+            print(
+                f"{name:16} {backend:6} {statistics.mean(times) * 1000:9.2f} ms "
+                f"+- {statistics.stdev(times) * 1000 if len(times) > 1 else 0:6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Lowering of Dust ASTs to bytecode for the vm.
+
+Code is a flat array of (opcode, argument) pairs, instructions without an argument carry a 0.
+Jump arguments are absolute positions in that array, all labels are resolved before compiling, see labels.py, so a
+labelled break or continue is a single jump at runtime.
+"""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Callable
+from typing import Any, Optional, Union
+
+from AST import (
+    AST,
+    Assign,
+    ASTVisitor,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+)
+from labels import JumpTable, resolve_labels
+from lexer import DustSyntaxError
+from symbols import SYMBOLS, Symbol
+
+__all__ = ["OPNAMES", "Code", "Compiler", "compile_module", "disassemble"]
+
+OPNAMES = [
+    "LOAD_CONST",
+    "LOAD_VAR",
+    "STORE_VAR",
+    "ADD",
+    "SUB",
+    "MUL",
+    "DIV",
+    "MOD",
+    "EQ",
+    "NE",
+    "LT",
+    "LE",
+    "GT",
+    "GE",
+    "NEG",
+    "NOT",
+    "BOOL",
+    "JUMP",
+    "JUMP_IF_FALSE",
+    "JUMP_IF_TRUE",
+    "PRINT",
+]
+(
+    LOAD_CONST,
+    LOAD_VAR,
+    STORE_VAR,
+    ADD,
+    SUB,
+    MUL,
+    DIV,
+    MOD,
+    EQ,
+    NE,
+    LT,
+    LE,
+    GT,
+    GE,
+    NEG,
+    NOT,
+    BOOL,
+    JUMP,
+    JUMP_IF_FALSE,
+    JUMP_IF_TRUE,
+    PRINT,
+) = range(len(OPNAMES))
+
+BINARY_OPCODES = {
+    "+": ADD,
+    "-": SUB,
+    "*": MUL,
+    "/": DIV,
+    "%": MOD,
+    "==": EQ,
+    "!=": NE,
+    "<": LT,
+    "<=": LE,
+    ">": GT,
+    ">=": GE,
+}
+UNARY_OPCODES = {"-": NEG, "!": NOT}
+
+
+class Code:
+    """A compiled Module."""
+
+    __slots__ = ("code", "constants", "names")
+
+    def __init__(self, code: array[int], constants: list[int], names: list[str]):
+        """
+        Bundle up compiled code.
+
+        :param code: the (opcode, argument) pairs
+        :param constants: the constants referenced by LOAD_CONST
+        :param names: the variable names, LOAD_VAR and STORE_VAR refer to them by index
+        """
+        self.code = code
+        self.constants = constants
+        self.names = names
+
+
+class Scope:
+    """A statement break or continue can jump out of."""
+
+    __slots__ = ("label", "loop", "start", "breaks")
+
+    def __init__(self, label: Optional[Symbol], loop: bool, start: int):
+        """
+        Open a scope.
+
+        :param label: the symbol of the label of the statement
+        :param loop: if unlabelled break and any continue can target it
+        :param start: where continue jumps to
+        """
+        self.label = label
+        self.loop = loop
+        self.start = start
+        # positions of the jumps that have to be patched to the end of the statement
+        self.breaks: list[int] = []
+
+
+class Compiler(ASTVisitor):
+    """
+    Lower a Module to Code.
+
+    Statements are not compiled by recursion but through a stack of pending nodes and continuations, so arbitrarily
+    deeply nested programs compile fine.
+    Expressions are compiled recursively.
+    """
+
+    def __init__(self) -> None:
+        """Create a compiler for a single Module."""
+        self.code: array[int] = array("q")
+        self.constants: list[int] = []
+        self.constant_indices: dict[int, int] = {}
+        self.names: list[str] = []
+        self.name_indices: dict[str, int] = {}
+        self.scopes: list[Scope] = []
+        # the scope of every open statement, by id of the statement
+        self.open: dict[int, Scope] = {}
+        self.jumps = JumpTable()
+        self.tasks: list[Union[AST, Callable[[], None]]] = []
+
+    def compile(self, module: Module) -> Code:
+        """
+        Compile a whole Module.
+
+        :param module: the module
+        :return: the compiled code
+        """
+        self.jumps = resolve_labels(module)
+        self.jumps.check()
+        tasks = self.tasks
+        tasks.append(module)
+        while tasks:
+            task = tasks.pop()
+            if isinstance(task, AST):
+                self.walk(task)
+            else:
+                task()
+        return Code(self.code, self.constants, self.names)
+
+    def emit(self, opcode: int, argument: int = 0) -> int:
+        """
+        Append an instruction.
+
+        :param opcode: the opcode
+        :param argument: its argument
+        :return: the position of the instruction, for patching jumps
+        """
+        position = len(self.code)
+        self.code.append(opcode)
+        self.code.append(argument)
+        return position
+
+    def patch(self, positions: list[int]) -> None:
+        """
+        Point jumps at the current end of the code.
+
+        :param positions: the positions of the jump instructions
+        :return: None
+        """
+        target = len(self.code)
+        for position in positions:
+            self.code[position + 1] = target
+
+    def name(self, name: str) -> int:
+        """
+        Get the variable slot of a name.
+
+        :param name: the name of the variable
+        :return: its index
+        """
+        index = self.name_indices.get(name)
+        if index is None:
+            index = self.name_indices[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def target(self, node: Union[Break, Continue]) -> Scope:
+        """
+        Get the scope a break or continue jumps out of.
+
+        :param node: the jump
+        :return: the scope
+        """
+        target = self.jumps.target(node)
+        if target is None:
+            return self.scope(node.label, isinstance(node, Continue))
+        return self.open[id(target)]
+
+    def scope(self, label: Optional[Symbol], loop: bool) -> Scope:
+        """
+        Search the scope a break or continue jumps out of, for jumps the JumpTable can't resolve on its own.
+
+        :param label: the symbol of the label of the jump
+        :param loop: if the scope has to be a loop
+        :return: the scope
+        """
+        if label is None:
+            for scope in reversed(self.scopes):
+                if scope.loop:
+                    return scope
+            raise DustSyntaxError("break or continue outside of a loop")
+        name = SYMBOLS.name(label)
+        for scope in reversed(self.scopes):
+            if scope.label == label:
+                if loop and not scope.loop:
+                    raise DustSyntaxError(f"can't continue {name!r}, it is not a loop")
+                return scope
+        raise DustSyntaxError(f"no enclosing statement is labelled {name!r}")
+
+    def body(self, body: list[AST], then: Callable[[], None]) -> None:
+        """
+        Schedule a list of statements followed by a continuation.
+
+        :param body: the statements
+        :param then: what to do once they are compiled
+        :return: None
+        """
+        self.tasks.append(then)
+        self.tasks.extend(reversed(body))
+
+    def push(self, node: AST, scope: Scope) -> None:
+        """
+        Open the scope of a statement.
+
+        :param node: the statement
+        :param scope: its scope
+        :return: None
+        """
+        self.scopes.append(scope)
+        self.open[id(node)] = scope
+
+    def end_scope(self) -> None:
+        """
+        Close the innermost scope and patch its breaks to the current position.
+
+        :return: None
+        """
+        self.patch(self.scopes.pop().breaks)
+
+    def end_loop(self) -> None:
+        """
+        Jump back to the start of the innermost loop and close it.
+
+        :return: None
+        """
+        self.emit(JUMP, self.scopes[-1].start)
+        self.end_scope()
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Refuse to compile nodes without a lowering."""
+        raise TypeError(f"can't compile {type(node).__name__}")
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Compile the statements of a module."""
+        self.tasks.extend(reversed(node.body))
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Compile a block, which only matters as a target for break."""
+        self.push(node, Scope(node.label, False, len(self.code)))
+        self.body(node.body, self.end_scope)
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Compile an if statement, jumping over the body when the condition is false."""
+        self.walk(node.condition)
+        skip = self.emit(JUMP_IF_FALSE)
+        scope = Scope(node.label, False, len(self.code))
+        self.push(node, scope)
+        if not node.orelse:
+            scope.breaks.append(skip)
+            self.body(node.body, self.end_scope)
+            return
+
+        def orelse() -> None:
+            scope.breaks.append(self.emit(JUMP))
+            self.patch([skip])
+            self.body(node.orelse, self.end_scope)
+
+        self.body(node.body, orelse)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Compile a while loop, continue jumps back to the condition."""
+        scope = Scope(node.label, True, len(self.code))
+        self.walk(node.condition)
+        scope.breaks.append(self.emit(JUMP_IF_FALSE))
+        self.push(node, scope)
+        self.body(node.body, self.end_loop)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Compile a do loop, which only ends through break."""
+        self.push(node, Scope(node.label, True, len(self.code)))
+        self.body(node.body, self.end_loop)
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """Compile a jump to the end of the targeted statement, patched once that end is known."""
+        self.target(node).breaks.append(self.emit(JUMP))
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """Compile a jump to the start of the targeted loop."""
+        self.emit(JUMP, self.target(node).start)
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Compile an assignment."""
+        self.walk(node.value)
+        self.emit(STORE_VAR, self.name(node.target))
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Compile a print statement."""
+        self.walk(node.value)
+        self.emit(PRINT)
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Compile reading a variable."""
+        self.emit(LOAD_VAR, self.name(node.id))
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        """Compile a constant, reusing the slot of equal constants."""
+        index = self.constant_indices.get(node.value)
+        if index is None:
+            index = self.constant_indices[node.value] = len(self.constants)
+            self.constants.append(node.value)
+        self.emit(LOAD_CONST, index)
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Compile a binary operation."""
+        self.walk(node.left)
+        if node.op in ("&&", "||"):
+            # short-circuit: the result is the left operand if it decides, the right one normalised to 0 or 1 otherwise
+            decided = self.emit(JUMP_IF_FALSE if node.op == "&&" else JUMP_IF_TRUE)
+            self.walk(node.right)
+            self.emit(BOOL)
+            to_end = self.emit(JUMP)
+            self.patch([decided])
+            self.visit_Constant(Constant(0 if node.op == "&&" else 1))
+            self.patch([to_end])
+            return
+        self.walk(node.right)
+        self.emit(BINARY_OPCODES[node.op])
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Compile a unary operation."""
+        self.walk(node.operand)
+        self.emit(UNARY_OPCODES[node.op])
+
+
+def compile_module(module: Module) -> Code:
+    """
+    Compile a Module to bytecode.
+
+    :param module: the module
+    :return: the compiled code
+    """
+    return Compiler().compile(module)
+
+
+def disassemble(code: Code) -> str:
+    """
+    Render compiled code in a human readable form.
+
+    :param code: the code
+    :return: one line per instruction
+    """
+    lines = []
+    for position in range(0, len(code.code), 2):
+        opcode, argument = code.code[position], code.code[position + 1]
+        detail = ""
+        if opcode == LOAD_CONST:
+            detail = f" ({code.constants[argument]})"
+        elif opcode in (LOAD_VAR, STORE_VAR):
+            detail = f" ({code.names[argument]})"
+        lines.append(f"{position:6} {OPNAMES[opcode]:14} {argument}{detail}")
+    return "\n".join(lines)
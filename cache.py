@@ -0,0 +1,432 @@
+"""
+The on-disk compilation cache.
+
+Like __pycache__, every directory holding Dust sources gets a __dustcache__ directory.
+Entries are content addressed: they are named after the sha256 of the source and tagged with the compiler and
+python version, so editing a file back and forth or copying it around still hits the cache.
+To avoid hashing unchanged files on every run, the cache keeps an index of the mtime and size each source had when
+it was last hashed.
+Least recently used entries are evicted once the directory grows beyond a size cap.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import sys
+from array import array
+from parser import parse_file
+from types import CodeType
+from typing import TYPE_CHECKING, Any, Optional
+
+from AST import LazyDecoder, Module, deserialize, serialize
+from sources import CACHE_DIRECTORY
+
+if TYPE_CHECKING:
+    import bytecode
+
+__all__ = [
+    "CACHE_DIRECTORY",
+    "COMPILER_VERSION",
+    "Cache",
+    "load_bytecode",
+    "load_lazy_module",
+    "load_module",
+    "load_optimized",
+    "load_python",
+]
+
+# bump whenever the parser, the AST, the middle end or a backend changes their output, so stale entries are not
+# used anymore
+COMPILER_VERSION = 4
+CACHE_TAG = f"dust{COMPILER_VERSION}-{sys.implementation.cache_tag}"
+INDEX = "index.json"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+class Cache:
+    """The __dustcache__ directory next to some Dust sources."""
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Open a cache directory, it is only created once something is stored.
+
+        :param directory: the cache directory
+        :param max_size: the size in bytes above which entries are evicted
+        """
+        self.directory = directory
+        self.max_size = max_size
+        # per kind of entry, the hits and misses of this process
+        self.stats: dict[str, list[int]] = {}
+        self.index: Optional[dict[str, Any]] = None
+
+    @classmethod
+    def for_source(cls, path: str) -> Cache:
+        """
+        Get the cache responsible for a source file.
+
+        :param path: the path of the source file
+        :return: the cache in the directory of the source
+        """
+        return cls(
+            os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY)
+        )
+
+    def load_index(self) -> dict[str, Any]:
+        """
+        Read the index of the cache, once.
+
+        :return: the index, mapping file names to [mtime, size, digest], plus the accumulated stats under "stats"
+        """
+        if self.index is None:
+            try:
+                with open(os.path.join(self.directory, INDEX)) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                self.index = None
+            if not isinstance(self.index, dict):
+                self.index = {"files": {}, "stats": {}}
+        return self.index
+
+    def save_index(self) -> None:
+        """
+        Write the index back, merging the stats of this process into the accumulated ones.
+
+        Call this once the cache is not needed anymore.
+
+        :return: None
+        """
+        index = self.load_index()
+        totals = index.setdefault("stats", {})
+        for kind, (hits, misses) in self.stats.items():
+            total = totals.setdefault(kind, [0, 0])
+            total[0] += hits
+            total[1] += misses
+        self.stats = {}
+        self.write(INDEX, json.dumps(index).encode())
+
+    def key(self, path: str) -> str:
+        """
+        Get the cache key of a source file.
+
+        The sha256 of the source is only computed if the mtime or size differ from the ones in the index.
+
+        :param path: the path of the source file
+        :return: the key, the digest of the source plus the cache tag
+        """
+        files = self.load_index().setdefault("files", {})
+        name = os.path.basename(path)
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            known = files.get(name)
+            if known is not None and known[:2] == [stat.st_mtime_ns, stat.st_size]:
+                return f"{known[2]}.{CACHE_TAG}"
+            if stat.st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    digest = hashlib.sha256(buffer).hexdigest()
+            else:
+                digest = hashlib.sha256(b"").hexdigest()
+        files[name] = [stat.st_mtime_ns, stat.st_size, digest]
+        return f"{digest}.{CACHE_TAG}"
+
+    def count(self, kind: str, hit: bool) -> None:
+        """
+        Record a cache hit or miss.
+
+        :param kind: the kind of entry
+        :param hit: if it was a hit
+        :return: None
+        """
+        self.stats.setdefault(kind, [0, 0])[0 if hit else 1] += 1
+
+    def load(self, key: str, kind: str, count: bool = True) -> Optional[bytes]:
+        """
+        Look up an entry and mark it as recently used.
+
+        :param key: the key of the source
+        :param kind: the kind of entry
+        :param count: if the lookup counts as a hit or miss, False if it was counted already
+        :return: the stored data, None on a miss
+        """
+        path = os.path.join(self.directory, f"{key}.{kind}")
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            if count:
+                self.count(kind, False)
+            return None
+        if count:
+            self.count(kind, True)
+        return data
+
+    def map(self, key: str, kind: str) -> Optional[mmap.mmap]:
+        """
+        Look up an entry like load, but memory-map it instead of reading it.
+
+        :param key: the key of the source
+        :param kind: the kind of entry
+        :return: the read-only mapping of the entry, None on a miss
+        """
+        path = os.path.join(self.directory, f"{key}.{kind}")
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.count(kind, False)
+            return None
+        self.count(kind, True)
+        return data
+
+    def contains(self, key: str, kind: str) -> bool:
+        """
+        Check for an entry without loading it, this counts neither as a hit nor as a miss.
+
+        :param key: the key of the source
+        :param kind: the kind of entry
+        :return: if the entry exists
+        """
+        return os.path.isfile(os.path.join(self.directory, f"{key}.{kind}"))
+
+    def discard(self, key: str, kind: str) -> None:
+        """
+        Remove an entry that turned out to be truncated or corrupt, and count its lookup as a miss instead of a hit.
+
+        :param key: the key of the source
+        :param kind: the kind of entry
+        :return: None
+        """
+        stats = self.stats.setdefault(kind, [0, 0])
+        if stats[0]:
+            stats[0] -= 1
+        stats[1] += 1
+        try:
+            os.remove(os.path.join(self.directory, f"{key}.{kind}"))
+        except OSError:
+            pass
+
+    def store(self, key: str, kind: str, data: bytes, evict: bool = True) -> None:
+        """
+        Add an entry, evicting old ones if the cache grows too big.
+
+        :param key: the key of the source
+        :param kind: the kind of entry
+        :param data: the data to store
+        :param evict: if the size cap should be enforced right away, when storing many entries at once it is cheaper
+            to call evict() once afterwards
+        :return: None
+        """
+        self.write(f"{key}.{kind}", data)
+        if evict:
+            self.evict()
+
+    def write(self, name: str, data: bytes) -> None:
+        """
+        Atomically write a file in the cache directory, an unwritable cache only costs speed.
+
+        :param name: the name of the file
+        :param data: its content
+        :return: None
+        """
+        path = os.path.join(self.directory, name)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache fits its size cap.
+
+        :return: None
+        """
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name == INDEX or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def report(self) -> str:
+        """
+        Summarize the hit rates, of this process and accumulated over all runs.
+
+        :return: one line per kind of entry
+        """
+        totals = self.load_index().get("stats", {})
+        lines = []
+        for kind in sorted(set(self.stats) | set(totals)):
+            hits, misses = self.stats.get(kind, [0, 0])
+            total_hits, total_misses = totals.get(kind, [0, 0])
+            total_hits += hits
+            total_misses += misses
+            lines.append(
+                f"{kind:8} {hits}/{hits + misses} hits, "
+                f"{total_hits}/{total_hits + total_misses} "
+                f"({total_hits / max(total_hits + total_misses, 1):.0%}) over all runs"
+            )
+        return "\n".join(lines)
+
+
+def load_module(
+    path: str, cache: Cache, key: Optional[str] = None, count: bool = True
+) -> Module:
+    """
+    Get the Module of a source file, only parsing it if it is not cached.
+
+    ASTs are stored in the binary encoding of AST.serialize, which copes with arbitrarily deeply nested trees.
+    A truncated or corrupt entry counts as a miss and is replaced.
+
+    :param path: the path of the source file
+    :param cache: the cache to use
+    :param key: the key of the source, if it is known already
+    :param count: if the lookup counts as a hit or miss, False if frontend.parse_sources counted it already
+    :return: the module
+    """
+    key = key or cache.key(path)
+    data = cache.load(key, "ast", count)
+    if data is not None:
+        try:
+            module = deserialize(data)
+        except (ValueError, EOFError, TypeError):
+            cache.discard(key, "ast")
+        else:
+            assert isinstance(module, Module)
+            return module
+    module = parse_file(path)
+    cache.store(key, "ast", serialize(module))
+    return module
+
+
+def load_lazy_module(path: str, cache: Cache) -> Module:
+    """
+    Get the Module of a source file, decoding the bodies of its statements only once they are accessed.
+
+    On a hit the cache entry is memory-mapped and only its header is read, the rest is decoded by the lazy nodes of
+    AST.LazyDecoder as they are visited.
+    On a miss the source is parsed and cached like in load_module, so is an entry that is truncated or whose header
+    is corrupt, corruption further in only shows once the nodes are decoded.
+
+    :param path: the path of the source file
+    :param cache: the cache to use
+    :return: the module
+    """
+    key = cache.key(path)
+    data = cache.map(key, "ast")
+    if data is not None:
+        try:
+            root = LazyDecoder(memoryview(data)).root_node()
+        except (ValueError, EOFError, TypeError):
+            cache.discard(key, "ast")
+        else:
+            assert isinstance(root, Module)
+            return root
+    module = parse_file(path)
+    cache.store(key, "ast", serialize(module))
+    return module
+
+
+def load_optimized(path: str, cache: Cache, key: str, optimize: bool) -> Module:
+    """
+    Get the Module of a source file for a backend, optionally optimised.
+
+    Only the parsed Module is cached, the middle end runs whenever the compiled code isn't.
+    The lookup of the Module is not counted, frontend.parse_sources counted it when it made sure it is cached.
+
+    :param path: the path of the source file
+    :param cache: the cache to use
+    :param key: the key of the source
+    :param optimize: if the module goes through the middle end
+    :return: the module
+    """
+    module = load_module(path, cache, key, count=False)
+    if optimize:
+        from optimize import optimize as optimize_module
+
+        module = optimize_module(module)
+    return module
+
+
+def load_bytecode(path: str, cache: Cache, optimize: bool = False) -> bytecode.Code:
+    """
+    Get the vm bytecode of a source file, the front end only runs if it is not cached.
+
+    A truncated or corrupt entry counts as a miss and is recompiled.
+
+    :param path: the path of the source file
+    :param cache: the cache to use
+    :param optimize: if the module goes through the middle end first, which is cached separately
+    :return: the compiled code
+    """
+    import bytecode
+
+    key = cache.key(path)
+    kind = "vm-O" if optimize else "vm"
+    data = cache.load(key, kind)
+    if data is not None:
+        try:
+            code, constants, names = marshal.loads(data)
+            instructions = array("q")
+            instructions.frombytes(code)
+        except (ValueError, EOFError, TypeError):
+            cache.discard(key, kind)
+        else:
+            return bytecode.Code(instructions, constants, names)
+    compiled = bytecode.compile_module(load_optimized(path, cache, key, optimize))
+    cache.store(
+        key,
+        kind,
+        marshal.dumps((compiled.code.tobytes(), compiled.constants, compiled.names)),
+    )
+    return compiled
+
+
+def load_python(path: str, cache: Cache, optimize: bool = False) -> CodeType:
+    """
+    Get the python code object of a source file, the front end only runs if it is not cached.
+
+    A truncated or corrupt entry counts as a miss and is recompiled.
+
+    :param path: the path of the source file
+    :param cache: the cache to use
+    :param optimize: if the module goes through the middle end first, which is cached separately
+    :return: the code object
+    """
+    import codegen
+
+    key = cache.key(path)
+    kind = "pyc-O" if optimize else "pyc"
+    data = cache.load(key, kind)
+    if data is not None:
+        try:
+            code: CodeType = marshal.loads(data)
+        except (ValueError, EOFError, TypeError):
+            cache.discard(key, kind)
+        else:
+            return code
+    code = codegen.compile_module(load_optimized(path, cache, key, optimize), path)
+    cache.store(key, kind, marshal.dumps(code))
+    return code
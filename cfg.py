@@ -0,0 +1,449 @@
+"""
+Control-flow graphs of Dust Modules.
+
+A CFG splits a Module into basic blocks: straight runs of Assign and Print statements, optionally ending in a branch
+on a condition.
+Blocks are numbered, ENTRY is where the module starts and EXIT is reached when it ends.
+Edges are kept in compressed adjacency arrays: the successors of block b are targets[offsets[b]:offsets[b + 1]],
+and the predecessors are sources[predecessor_offsets[b]:predecessor_offsets[b + 1]].
+A block ending in a branch has exactly two successors, the one taken if the condition holds comes first.
+The CFG also remembers the statements behind the control flow: the loop every loop header starts and the If whose
+condition ends a block.
+
+The CFGBuilder visits every node once and uses the JumpTable of labels.py to find the target of every jump, so
+building a CFG takes linear time.
+Statements following a break or continue in the same body can't run, they end up in blocks without predecessors.
+"""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Callable
+from typing import Any, Optional, Union
+
+from AST import (
+    AST,
+    Assign,
+    ASTVisitor,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    Expr,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+)
+from labels import JumpTable, resolve_labels
+
+__all__ = ["ENTRY", "EXIT", "CFG", "CFGBuilder", "build_cfg"]
+
+ENTRY = 0
+EXIT = 1
+
+Statement = Union[Block, If, While, Do]
+
+
+class CFG:
+    """The basic blocks of a Module and the edges between them."""
+
+    __slots__ = (
+        "statements",
+        "branches",
+        "offsets",
+        "targets",
+        "predecessor_offsets",
+        "sources",
+        "headers",
+        "ifs",
+    )
+
+    def __init__(
+        self,
+        statements: list[list[AST]],
+        branches: list[Optional[Expr]],
+        sources: array[int],
+        targets: array[int],
+        headers: dict[int, Union[While, Do]],
+        ifs: dict[int, If],
+    ):
+        """
+        Create a CFG from its blocks and a list of edges.
+
+        :param statements: the Assign and Print statements of every block
+        :param branches: the condition every block ends with, None for blocks with at most one successor
+        :param sources: the block every edge starts in
+        :param targets: the block every edge ends in, the edges of a block have to be in order
+        :param headers: the loop every loop header starts, a header being the block continue jumps to
+        :param ifs: the If statement whose condition ends a block
+        """
+        self.statements = statements
+        self.branches = branches
+        self.headers = headers
+        self.ifs = ifs
+        self.offsets, self.targets = self.compress(len(statements), sources, targets)
+        self.predecessor_offsets, self.sources = self.compress(
+            len(statements), targets, sources
+        )
+
+    @staticmethod
+    def compress(
+        count: int, keys: array[int], values: array[int]
+    ) -> tuple[array[int], array[int]]:
+        """
+        Group the edges by one of their ends with a counting sort, which keeps the order of the edges of a block.
+
+        :param count: the number of blocks
+        :param keys: the end the edges are grouped by
+        :param values: the other end
+        :return: the offsets of every group, followed by the end of the last one, and the grouped values
+        """
+        offsets = array("I", bytes(4 * (count + 1)))
+        for key in keys:
+            offsets[key + 1] += 1
+        for block in range(count):
+            offsets[block + 1] += offsets[block]
+        positions = offsets[:-1]
+        grouped = array("I", bytes(4 * len(values)))
+        for key, value in zip(keys, values):
+            grouped[positions[key]] = value
+            positions[key] += 1
+        return offsets, grouped
+
+    def __len__(self) -> int:
+        """
+        Count the blocks.
+
+        :return: the number of blocks
+        """
+        return len(self.statements)
+
+    def successors(self, block: int) -> array[int]:
+        """
+        Get the blocks control can pass to from a block.
+
+        :param block: the block
+        :return: its successors, the branch taken if its condition holds first
+        """
+        start, end = self.offsets[block], self.offsets[block + 1]
+        return self.targets[start:end]
+
+    def predecessors(self, block: int) -> array[int]:
+        """
+        Get the blocks control can come from.
+
+        :param block: the block
+        :return: its predecessors
+        """
+        offsets = self.predecessor_offsets
+        start, end = offsets[block], offsets[block + 1]
+        return self.sources[start:end]
+
+    def reverse_postorder(self) -> list[int]:
+        """
+        Order the blocks reachable from ENTRY so that every block comes before its successors, ignoring back edges.
+
+        :return: the reachable blocks in reverse postorder
+        """
+        offsets, targets = self.offsets, self.targets
+        visited = bytearray(len(self))
+        visited[ENTRY] = 1
+        order = []
+        stack = [(ENTRY, offsets[ENTRY])]
+        while stack:
+            block, edge = stack[-1]
+            if edge == offsets[block + 1]:
+                stack.pop()
+                order.append(block)
+                continue
+            stack[-1] = (block, edge + 1)
+            successor = targets[edge]
+            if not visited[successor]:
+                visited[successor] = 1
+                stack.append((successor, offsets[successor]))
+        order.reverse()
+        return order
+
+
+class Scope:
+    """A statement a break or continue can leave."""
+
+    __slots__ = ("node", "exit", "start")
+
+    def __init__(self, node: Statement, exit: int, start: Optional[int]):
+        """
+        Open a scope.
+
+        :param node: the statement
+        :param exit: the block break jumps to
+        :param start: the block continue jumps to, None for statements that aren't loops
+        """
+        self.node = node
+        self.exit = exit
+        self.start = start
+
+
+class CFGBuilder(ASTVisitor):
+    """
+    Build the CFG of a Module.
+
+    Like the bytecode Compiler, statements are handled through a stack of pending nodes and continuations instead of
+    recursion, so arbitrarily deeply nested programs are fine.
+    """
+
+    def __init__(self) -> None:
+        """Create a builder for a single Module."""
+        self.statements: list[list[AST]] = []
+        self.branches: list[Optional[Expr]] = []
+        self.sources: array[int] = array("I")
+        self.targets: array[int] = array("I")
+        self.current = ENTRY
+        self.scopes: list[Scope] = []
+        # the scope of every open statement, by id of the statement
+        self.open: dict[int, Scope] = {}
+        self.jumps = JumpTable()
+        self.headers: dict[int, Union[While, Do]] = {}
+        self.ifs: dict[int, If] = {}
+        self.tasks: list[Union[AST, Callable[[], None]]] = []
+
+    def build(self, module: Module) -> CFG:
+        """
+        Build the CFG of a whole Module.
+
+        :param module: the module
+        :return: the CFG
+        """
+        self.jumps = resolve_labels(module)
+        self.jumps.check()
+        self.start(self.block())
+        self.block()
+        tasks = self.tasks
+        tasks.append(lambda: self.jump(EXIT))
+        tasks.append(module)
+        while tasks:
+            task = tasks.pop()
+            if isinstance(task, AST):
+                self.walk(task)
+            else:
+                task()
+        return CFG(
+            self.statements,
+            self.branches,
+            self.sources,
+            self.targets,
+            self.headers,
+            self.ifs,
+        )
+
+    def block(self) -> int:
+        """
+        Add an empty block.
+
+        :return: the new block
+        """
+        self.statements.append([])
+        self.branches.append(None)
+        return len(self.statements) - 1
+
+    def start(self, block: int) -> None:
+        """
+        Continue adding statements to another block.
+
+        :param block: the block
+        :return: None
+        """
+        self.current = block
+
+    def jump(self, target: int) -> None:
+        """
+        Add an edge from the current block.
+
+        :param target: the block it leads to
+        :return: None
+        """
+        self.sources.append(self.current)
+        self.targets.append(target)
+
+    def branch(self, condition: Expr, then: int, orelse: int) -> None:
+        """
+        End the current block with a branch.
+
+        :param condition: the condition
+        :param then: the block taken if it holds
+        :param orelse: the block taken otherwise
+        :return: None
+        """
+        self.branches[self.current] = condition
+        self.jump(then)
+        self.jump(orelse)
+
+    def body(self, body: list[AST], then: Callable[[], None]) -> None:
+        """
+        Schedule a list of statements followed by a continuation.
+
+        :param body: the statements
+        :param then: what to do once they are added
+        :return: None
+        """
+        self.tasks.append(then)
+        self.tasks.extend(reversed(body))
+
+    def push(self, scope: Scope) -> None:
+        """
+        Open the scope of a statement.
+
+        :param scope: the scope
+        :return: None
+        """
+        self.scopes.append(scope)
+        self.open[id(scope.node)] = scope
+
+    def end_scope(self) -> None:
+        """
+        Close the innermost scope and continue after it.
+
+        :return: None
+        """
+        scope = self.scopes.pop()
+        self.jump(scope.exit)
+        self.start(scope.exit)
+
+    def end_loop(self) -> None:
+        """
+        Jump back to the start of the innermost loop, close it and continue after it.
+
+        :return: None
+        """
+        scope = self.scopes.pop()
+        assert scope.start is not None
+        self.jump(scope.start)
+        self.start(scope.exit)
+
+    def target(self, node: Union[Break, Continue]) -> Scope:
+        """
+        Get the scope a break or continue leaves.
+
+        :param node: the jump
+        :return: the scope
+        """
+        target = self.jumps.target(node)
+        if target is not None:
+            return self.open[id(target)]
+        # a hash-consed jump shared by statements with different targets
+        for scope in reversed(self.scopes):
+            if (
+                scope.node.label == node.label
+                if node.label is not None
+                else scope.start is not None
+            ):
+                return scope
+        raise AssertionError("resolve_labels accepted an unresolvable jump")
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Refuse nodes without control flow of their own."""
+        raise TypeError(f"can't build a CFG from {type(node).__name__}")
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Add the statements of a module."""
+        self.tasks.extend(reversed(node.body))
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Add a block, which only needs a block after it if a break leaves it."""
+        if id(node) not in self.jumps.exits:
+            self.tasks.extend(reversed(node.body))
+            return
+        self.push(Scope(node, self.block(), None))
+        self.body(node.body, self.end_scope)
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Add an if statement, both branches meet in a new block."""
+        then = self.block()
+        after = self.block()
+        orelse = self.block() if node.orelse else after
+        self.ifs[self.current] = node
+        self.branch(node.condition, then, orelse)
+        self.push(Scope(node, after, None))
+        self.start(then)
+        if not node.orelse:
+            self.body(node.body, self.end_scope)
+            return
+
+        def orelse_body() -> None:
+            self.jump(after)
+            self.start(orelse)
+            self.body(node.orelse, self.end_scope)
+
+        self.body(node.body, orelse_body)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Add a while loop, whose condition gets a block of its own that continue jumps to."""
+        header = self.block()
+        body = self.block()
+        after = self.block()
+        self.jump(header)
+        self.start(header)
+        self.headers[header] = node
+        self.branch(node.condition, body, after)
+        self.push(Scope(node, after, header))
+        self.start(body)
+        self.body(node.body, self.end_loop)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Add a do loop, which only ends through break."""
+        body = self.block()
+        after = self.block()
+        self.jump(body)
+        self.start(body)
+        self.headers[body] = node
+        self.push(Scope(node, after, body))
+        self.body(node.body, self.end_loop)
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """End the current block with a jump after the targeted statement."""
+        self.jump(self.target(node).exit)
+        self.start(self.block())
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """End the current block with a jump to the start of the targeted loop."""
+        start = self.target(node).start
+        assert start is not None
+        self.jump(start)
+        self.start(self.block())
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Add an assignment to the current block."""
+        self.statements[self.current].append(node)
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Add a print statement to the current block."""
+        self.statements[self.current].append(node)
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Refuse expressions, they are part of statements and branches."""
+        return self.visit_AST(node)
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        """Refuse expressions, they are part of statements and branches."""
+        return self.visit_AST(node)
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Refuse expressions, they are part of statements and branches."""
+        return self.visit_AST(node)
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Refuse expressions, they are part of statements and branches."""
+        return self.visit_AST(node)
+
+
+def build_cfg(module: Module) -> CFG:
+    """
+    Build the CFG of a Module.
+
+    :param module: the module
+    :return: the CFG
+    """
+    return CFGBuilder().build(module)
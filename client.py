@@ -0,0 +1,125 @@
+"""
+The thin client of the compile server started with main.py --serve.
+
+It takes the same arguments as main.py, but instead of compiling anything itself it sends them to the warm server
+together with the content of every source, and prints what the server answers.
+It deliberately imports nothing of the compiler, only the standard library and the command line and source search
+main.py shares with it, so it starts as fast as Python can.
+
+Messages in both directions are frames: a 4 byte big endian length followed by that many bytes.
+A request is a JSON frame {"argv": [...], "files": [...]} followed by one frame with the content of every file, a
+response is a single JSON frame {"status": ..., "stdout": ..., "stderr": ...}.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+from options import add_arguments, check_files
+from sources import find_sources
+
+__all__ = [
+    "DEFAULT_SOCKET",
+    "SOCKET_VARIABLE",
+    "main",
+    "receive",
+    "request",
+    "send",
+]
+
+SOCKET_VARIABLE = "DUST_SOCKET"
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get("TMPDIR", "/tmp"), f"dust-{os.getuid()}.sock"
+)
+
+
+def send(connection: socket.socket, data: bytes) -> None:
+    """
+    Send a frame.
+
+    :param connection: the connected socket
+    :param data: the content of the frame
+    :return: None
+    """
+    connection.sendall(len(data).to_bytes(4, "big") + data)
+
+
+def receive_exactly(connection: socket.socket, size: int) -> bytes:
+    """
+    Receive a fixed number of bytes.
+
+    :param connection: the connected socket
+    :param size: the number of bytes
+    :return: the bytes
+    """
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed in the middle of a frame")
+        data += chunk
+    return bytes(data)
+
+
+def receive(connection: socket.socket) -> bytes:
+    """
+    Receive a frame.
+
+    :param connection: the connected socket
+    :return: the content of the frame
+    """
+    return receive_exactly(
+        connection, int.from_bytes(receive_exactly(connection, 4), "big")
+    )
+
+
+def request(path: str, argv: list[str], sources: list[str]) -> tuple[int, str, str]:
+    """
+    Let the server handle a command line.
+
+    :param path: the path of the server socket
+    :param argv: the command line arguments
+    :param sources: the paths of all sources the command line names, with directories expanded
+    :return: the exit status, stdout and stderr of the command
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(path)
+        except OSError:
+            raise ConnectionError(f"no compile server on {path}") from None
+        send(connection, json.dumps({"argv": argv, "files": sources}).encode())
+        for source in sources:
+            with open(source, "rb") as f:
+                send(connection, f.read())
+        response = json.loads(receive(connection))
+    return response["status"], response["stdout"], response["stderr"]
+
+
+def main() -> None:
+    """
+    Forward the command line to the server and replay its answer.
+
+    The command line is checked like main.py does first, to find the sources among the arguments.
+
+    :return: None
+    """
+    args = argparse.ArgumentParser()
+    add_arguments(args)
+    arguments = args.parse_args()
+    check_files(args, arguments.FILE)
+    try:
+        status, stdout, stderr = request(
+            os.environ.get(SOCKET_VARIABLE, DEFAULT_SOCKET),
+            sys.argv[1:],
+            find_sources(arguments.FILE),
+        )
+    except ConnectionError as e:
+        sys.exit(str(e))
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
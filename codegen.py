@@ -0,0 +1,441 @@
+"""
+Translation of Dust ASTs to python code objects, so Dust programs run directly on CPython's own bytecode.
+
+A Module becomes a function whose variables are python locals.
+Python has no labelled break or continue, so a labelled Block or If that is the target of a break becomes a loop
+running exactly once, and jumps leaving more than one python loop store their destination in a local and break out
+of every loop in between, each of which checks that local right after it ends.
+"""
+from __future__ import annotations
+
+import ast
+import re
+import sys
+from types import CodeType
+from typing import Any, Optional, TextIO, Union
+
+from AST import (
+    AST,
+    Assign,
+    ASTVisitor,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    Expr,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+)
+from labels import resolve_labels
+from lexer import DustSyntaxError
+from symbols import SYMBOLS
+from vm import DustRuntimeError
+
+__all__ = ["Translator", "compile_module", "run"]
+
+OPERATORS: dict[str, ast.operator] = {
+    "+": ast.Add(),
+    "-": ast.Sub(),
+    "*": ast.Mult(),
+    "/": ast.FloorDiv(),
+    "%": ast.Mod(),
+}
+COMPARISONS: dict[str, ast.cmpop] = {
+    "==": ast.Eq(),
+    "!=": ast.NotEq(),
+    "<": ast.Lt(),
+    "<=": ast.LtE(),
+    ">": ast.Gt(),
+    ">=": ast.GtE(),
+}
+Statement = Union[Block, If, While, Do]
+
+
+class Scope:
+    """A Dust statement that break or continue can target."""
+
+    __slots__ = ("node", "python_loop", "crossing")
+
+    def __init__(self, node: Statement, python_loop: bool):
+        """
+        Open a scope.
+
+        :param node: the statement
+        :param python_loop: if it is translated to a python loop
+        """
+        self.node = node
+        self.python_loop = python_loop
+        # the jumps leaving this python loop towards a scope further out, by code as (target, is_continue)
+        self.crossing: dict[int, tuple[Scope, bool]] = {}
+
+
+def resolve(scopes: list[Scope], node: Union[Break, Continue]) -> Scope:
+    """
+    Search the scope a break or continue jumps out of, for jumps the JumpTable can't resolve on its own.
+
+    :param scopes: the enclosing scopes, innermost last
+    :param node: the jump
+    :return: the matching scope
+    """
+    label = node.label
+    if label is None:
+        for scope in reversed(scopes):
+            if isinstance(scope.node, (While, Do)):
+                return scope
+        raise DustSyntaxError("break or continue outside of a loop")
+    name = SYMBOLS.name(label)
+    for scope in reversed(scopes):
+        if scope.node.label == label:
+            if isinstance(node, Continue) and not isinstance(scope.node, (While, Do)):
+                raise DustSyntaxError(f"can't continue {name!r}, it is not a loop")
+            return scope
+    raise DustSyntaxError(f"no enclosing statement is labelled {name!r}")
+
+
+class Translator(ASTVisitor):
+    """
+    Translate a Module to a python ast.Module defining a function called main.
+
+    Statements translate to lists of python statements, expressions to python expressions.
+    main takes the function used to print values, all Dust variables are prefixed with "v_" to keep them apart
+    from the helpers and python keywords.
+    """
+
+    def __init__(self, module: Module):
+        """
+        Prepare the translation of a module.
+
+        :param module: the module
+        """
+        self.jumps = resolve_labels(module)
+        self.jumps.check()
+        self.scopes: list[Scope] = []
+        # the scope of every open statement, by id of the statement
+        self.open: dict[int, Scope] = {}
+        self.codes: dict[tuple[int, bool], int] = {}
+
+    def translate(self, module: Module) -> ast.Module:
+        """
+        Translate the module.
+
+        :param module: the module
+        :return: the python module
+        """
+        tree: ast.Module = self.walk(module)
+        return ast.fix_missing_locations(tree)
+
+    def statements(self, body: list[AST]) -> list[ast.stmt]:
+        """
+        Translate a list of statements.
+
+        :param body: the statements
+        :return: the python statements, never empty
+        """
+        result: list[ast.stmt] = []
+        for node in body:
+            result += self.walk(node)
+        return result or [ast.Pass()]
+
+    def test(self, node: Expr) -> ast.expr:
+        """
+        Translate an expression whose value only matters for its truth.
+
+        :param node: the expression
+        :return: the python expression
+        """
+        if isinstance(node, BinOp) and node.op in ("&&", "||"):
+            return ast.BoolOp(
+                op=ast.And() if node.op == "&&" else ast.Or(),
+                values=[self.test(node.left), self.test(node.right)],
+            )
+        if isinstance(node, UnaryOp) and node.op == "!":
+            return ast.UnaryOp(op=ast.Not(), operand=self.test(node.operand))
+        result: ast.expr = self.walk(node)
+        return result
+
+    def push(self, scope: Scope) -> None:
+        """
+        Open a scope.
+
+        :param scope: the scope
+        :return: None
+        """
+        self.scopes.append(scope)
+        self.open[id(scope.node)] = scope
+
+    def loop(
+        self,
+        node: Statement,
+        loop: bool,
+        test: ast.expr,
+        body: list[AST],
+        orelse: Optional[list[AST]] = None,
+    ) -> list[ast.stmt]:
+        """
+        Translate a statement to a python loop.
+
+        :param node: the statement
+        :param loop: if it is a Dust loop, otherwise the python loop runs once and the body is an if when orelse is
+            given
+        :param test: the condition of the loop or the if
+        :param body: the body of the statement
+        :param orelse: the else branch of an if
+        :return: the python statements
+        """
+        scope = Scope(node, True)
+        self.push(scope)
+        python_body = self.statements(body)
+        if orelse is not None:
+            python_body = [
+                ast.If(
+                    test=test,
+                    body=python_body,
+                    orelse=self.statements(orelse) if orelse else [],
+                )
+            ]
+        self.scopes.pop()
+        if not loop:
+            python_body.append(ast.Break())
+            test = ast.Constant(value=True)
+        result: list[ast.stmt] = [ast.While(test=test, body=python_body, orelse=[])]
+
+        # jumps that left this loop on their way further out
+        outer = next((s for s in reversed(self.scopes) if s.python_loop), None)
+        passing = False
+        for code, (target, is_continue) in scope.crossing.items():
+            if target is not outer:
+                passing = True
+                continue
+            result.append(
+                ast.If(
+                    test=ast.Compare(
+                        left=ast.Name(id="jump", ctx=ast.Load()),
+                        ops=[ast.Eq()],
+                        comparators=[ast.Constant(value=code)],
+                    ),
+                    body=[
+                        ast.Assign(
+                            targets=[ast.Name(id="jump", ctx=ast.Store())],
+                            value=ast.Constant(value=0),
+                        ),
+                        ast.Continue() if is_continue else ast.Break(),
+                    ],
+                    orelse=[],
+                )
+            )
+        if passing:
+            result.append(
+                ast.If(
+                    test=ast.Name(id="jump", ctx=ast.Load()),
+                    body=[ast.Break()],
+                    orelse=[],
+                )
+            )
+        return result
+
+    def jump(self, node: Union[Break, Continue]) -> list[ast.stmt]:
+        """
+        Translate break and continue.
+
+        :param node: the jump
+        :return: the python statements
+        """
+        is_continue = isinstance(node, Continue)
+        statement = self.jumps.target(node)
+        target = (
+            resolve(self.scopes, node)
+            if statement is None
+            else self.open[id(statement)]
+        )
+        inner = self.scopes.index(target) + 1
+        crossed = [scope for scope in self.scopes[inner:] if scope.python_loop]
+        if not crossed:
+            return [ast.Continue() if is_continue else ast.Break()]
+        code = self.codes.setdefault(
+            (id(target.node), is_continue), len(self.codes) + 1
+        )
+        for scope in crossed:
+            scope.crossing[code] = (target, is_continue)
+        return [
+            ast.Assign(
+                targets=[ast.Name(id="jump", ctx=ast.Store())],
+                value=ast.Constant(value=code),
+            ),
+            ast.Break(),
+        ]
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Refuse to translate nodes without a translation."""
+        raise TypeError(f"can't translate {type(node).__name__}")
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Translate a module to the definition of main."""
+        body: list[ast.stmt] = [
+            ast.Assign(
+                targets=[ast.Name(id="jump", ctx=ast.Store())],
+                value=ast.Constant(value=0),
+            )
+        ]
+        body += self.statements(node.body)
+        function = ast.FunctionDef(
+            name="main",
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg="emit")],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=body,
+            decorator_list=[],
+        )
+        return ast.Module(body=[function], type_ignores=[])
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Translate a block, which is only a loop if a break leaves it."""
+        if id(node) in self.jumps.exits:
+            return self.loop(node, False, ast.Constant(value=True), node.body)
+        self.push(Scope(node, False))
+        body = self.statements(node.body)
+        self.scopes.pop()
+        return body
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Translate an if statement, which is wrapped in a loop if a break leaves it."""
+        test = self.test(node.condition)
+        if id(node) in self.jumps.exits:
+            return self.loop(node, False, test, node.body, node.orelse)
+        self.push(Scope(node, False))
+        body = self.statements(node.body)
+        orelse = self.statements(node.orelse) if node.orelse else []
+        self.scopes.pop()
+        return [ast.If(test=test, body=body, orelse=orelse)]
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Translate a while loop."""
+        return self.loop(node, True, self.test(node.condition), node.body)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Translate a do loop to an endless python loop."""
+        return self.loop(node, True, ast.Constant(value=True), node.body)
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """Translate a break."""
+        return self.jump(node)
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """Translate a continue."""
+        return self.jump(node)
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Translate an assignment."""
+        return [
+            ast.Assign(
+                targets=[ast.Name(id=f"v_{node.target}", ctx=ast.Store())],
+                value=self.walk(node.value),
+            )
+        ]
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Translate a print statement to a call of emit."""
+        call = ast.Call(
+            func=ast.Name(id="emit", ctx=ast.Load()),
+            args=[self.walk(node.value)],
+            keywords=[],
+        )
+        return [ast.Expr(value=call)]
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Translate reading a variable."""
+        return ast.Name(id=f"v_{node.id}", ctx=ast.Load())
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        """Translate a constant."""
+        return ast.Constant(value=node.value)
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Translate a binary operation, comparisons and logical operators produce bools, which act as 0 and 1."""
+        if node.op in COMPARISONS:
+            return ast.Compare(
+                left=self.walk(node.left),
+                ops=[COMPARISONS[node.op]],
+                comparators=[self.walk(node.right)],
+            )
+        if node.op in OPERATORS:
+            return ast.BinOp(
+                left=self.walk(node.left),
+                op=OPERATORS[node.op],
+                right=self.walk(node.right),
+            )
+        # python's and/or return one of their operands, Dust's && and || return 0 or 1
+        return ast.UnaryOp(
+            op=ast.Not(), operand=ast.UnaryOp(op=ast.Not(), operand=self.test(node))
+        )
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Translate a unary operation."""
+        if node.op == "!":
+            return self.test(node)
+        return ast.UnaryOp(op=ast.USub(), operand=self.walk(node.operand))
+
+
+def compile_module(module: Module, filename: str = "<dust>") -> CodeType:
+    """
+    Compile a Module to a python code object.
+
+    Executing the code object defines a function main, see Translator and run.
+
+    :param module: the module
+    :param filename: the file name recorded in the code object
+    :return: the code object
+    """
+    try:
+        # the translation recurses like the python compiler does, and gives up on deep nests just the same
+        tree = Translator(module).translate(module)
+        code: CodeType = compile(tree, filename, "exec")
+    except DustSyntaxError:
+        raise
+    except SyntaxError as e:
+        # CPython refuses to nest more than 20 loops
+        raise DustSyntaxError(
+            f"can't compile to python: {e.msg}, use --interpret instead"
+        ) from None
+    except RecursionError:
+        raise DustSyntaxError(
+            "can't compile to python: too deeply nested, use --interpret instead"
+        ) from None
+    return code
+
+
+def run(code: CodeType, out: Optional[TextIO] = None) -> None:
+    """
+    Run a code object produced by compile_module.
+
+    :param code: the code object
+    :param out: where print writes to, defaults to stdout
+    :return: None
+    """
+    if out is None:
+        out = sys.stdout
+    target = out
+
+    def emit(value: int) -> None:
+        print(int(value), file=target)
+
+    namespace: dict[str, Any] = {}
+    exec(code, namespace)
+    try:
+        namespace["main"](emit)
+    except ZeroDivisionError:
+        raise DustRuntimeError("division by zero") from None
+    except NameError as e:
+        name = re.search(r"'v_(\w+)'", str(e))
+        raise DustRuntimeError(
+            f"variable {name.group(1) if name else '?'!r} is not defined"
+        ) from None
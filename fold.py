@@ -0,0 +1,207 @@
+"""
+Constant folding and dead-branch elimination on Dust ASTs, done before a Module is lowered to SSA.
+
+A ConstantFolder evaluates the parts of expressions made of constants only, keeps an If arm only if its condition
+can select it, drops While loops whose condition is constant and false and drops every statement after a break or
+continue in the same body.
+If arms that are kept, and Blocks that no break leaves, are inlined into the surrounding body.
+Inlined statements are only flattened once, into the body of the nearest statement that is kept, so folding deep
+nests of inlined Blocks stays linear.
+Operations that fail at runtime are never folded, so the folded Module fails at the same point, and labels are
+resolved before anything is dropped, so a jump that can't be resolved is reported even when it is unreachable.
+"""
+from __future__ import annotations
+
+from typing import Any, Union
+
+from AST import (
+    AST,
+    ASTTransformer,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    If,
+    Module,
+    UnaryOp,
+    While,
+)
+from labels import JumpTable, resolve_labels
+from ssa import evaluate
+
+__all__ = ["ConstantFolder", "fold_constants"]
+
+
+class Inlined:
+    """The statements replacing a dropped or inlined statement, possibly Inlined themselves."""
+
+    __slots__ = ("parts", "jumps")
+
+    def __init__(self, parts: list[Union[AST, Inlined]], jumps: bool):
+        """
+        Create the replacement.
+
+        :param parts: the statements
+        :param jumps: if they end in a break or continue, which makes the statements after them dead
+        """
+        self.parts = parts
+        self.jumps = jumps
+
+
+class ConstantFolder(ASTTransformer):
+    """
+    Fold a Module node by node, children before their parents.
+
+    Visiting an expression returns the folded expression, visiting a statement the statement or, if it is dropped
+    or inlined, the Inlined statements replacing it.
+    Assignments, print statements and jumps are rebuilt around their folded expressions by the ASTTransformer.
+    """
+
+    def __init__(self) -> None:
+        """Create a folder."""
+        self.jumps = JumpTable()
+
+    def fold(self, module: Module) -> Module:
+        """
+        Fold a whole Module.
+
+        :param module: the module
+        :return: the folded module, or module itself if nothing changed
+        """
+        self.jumps = resolve_labels(module)
+        self.jumps.check()
+        folded = self.transform(module)
+        assert isinstance(folded, Module)
+        return folded
+
+    def statements(self, old: list[AST]) -> Inlined:
+        """
+        Replace the folded statements of a body, up to the first jump, without flattening the inlined ones.
+
+        :param old: the statements
+        :return: the new statements
+        """
+        transformed = self.transformed
+        parts: list[Union[AST, Inlined]] = []
+        for statement in old:
+            new = transformed.get(id(statement), statement)
+            parts.append(new)
+            if isinstance(new, (Break, Continue)) or (
+                isinstance(new, Inlined) and new.jumps
+            ):
+                return Inlined(parts, True)
+        return Inlined(parts, False)
+
+    def body(self, old: list[AST]) -> list[AST]:
+        """
+        Replace the folded statements of a body, up to the first jump, and flatten the inlined ones.
+
+        :param old: the statements
+        :return: the new statements, or old itself if nothing changed
+        """
+        parts = self.statements(old).parts
+        if len(parts) == len(old) and all(
+            new is statement for new, statement in zip(parts, old)
+        ):
+            return old
+        new: list[AST] = []
+        stack = parts[::-1]
+        while stack:
+            part = stack.pop()
+            if isinstance(part, Inlined):
+                stack.extend(reversed(part.parts))
+            else:
+                new.append(part)
+        return new
+
+    def inline(self, node: Union[Block, If], body: list[AST]) -> Union[AST, Inlined]:
+        """
+        Replace a statement by its body, keeping it as a Block only if a labelled break leaves it.
+
+        :param node: the Block or If
+        :param body: its body, or the arm of the If that runs, whose statements are folded already
+        :return: the Block, or the statements replacing it
+        """
+        if node.label is None or id(node) not in self.jumps.exits:
+            return self.statements(body)
+        new = self.body(body)
+        if isinstance(node, Block) and new is node.body:
+            return node
+        return Block(node.label, new)
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Refuse nodes the folder doesn't know."""
+        raise TypeError(f"can't fold {type(node).__name__}")
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Fold the statements of a module."""
+        body = self.body(node.body)
+        return node if body is node.body else Module(body)
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Fold a block, inlining it unless a break leaves it."""
+        return self.inline(node, node.body)
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Fold an if statement, keeping only the arm that runs if the condition is constant."""
+        condition = self.result(node.condition)
+        if isinstance(condition, Constant):
+            return self.inline(node, node.body if condition.value else node.orelse)
+        body, orelse = self.body(node.body), self.body(node.orelse)
+        if condition is node.condition and body is node.body and orelse is node.orelse:
+            return node
+        return If(node.label, condition, body, orelse)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Fold a while loop, dropping it if it never runs."""
+        condition = self.result(node.condition)
+        if isinstance(condition, Constant) and not condition.value:
+            return Inlined([], False)
+        body = self.body(node.body)
+        if condition is node.condition and body is node.body:
+            return node
+        return While(node.label, condition, body)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Fold the body of a do loop."""
+        body = self.body(node.body)
+        return node if body is node.body else Do(node.label, body)
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Fold a binary operation, and a short-circuit whose left operand decides."""
+        left = self.result(node.left)
+        right = self.result(node.right)
+        if isinstance(left, Constant) and node.op in ("&&", "||"):
+            # the right operand is not evaluated at all if the left one decides
+            if bool(left.value) == (node.op == "||"):
+                return Constant(int(bool(left.value)))
+            if isinstance(right, Constant):
+                return Constant(int(bool(right.value)))
+        elif isinstance(left, Constant) and isinstance(right, Constant):
+            result = evaluate(node.op, left.value, right.value)
+            if result is not None:
+                return Constant(result)
+        if left is node.left and right is node.right:
+            return node
+        return BinOp(left, node.op, right)
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Fold a unary operation."""
+        operand = self.result(node.operand)
+        if isinstance(operand, Constant):
+            return Constant(
+                -operand.value if node.op == "-" else int(not operand.value)
+            )
+        return node if operand is node.operand else UnaryOp(node.op, operand)
+
+
+def fold_constants(module: Module) -> Module:
+    """
+    Fold the constant expressions of a Module and drop the statements that can never run.
+
+    :param module: the module
+    :return: the folded module, sharing its unchanged subtrees with the original
+    """
+    return ConstantFolder().fold(module)
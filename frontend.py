@@ -0,0 +1,129 @@
+"""
+The parallel front end, lexing and parsing many Dust files at once.
+
+Files are parsed by a pool of worker processes.
+Workers send their Modules back in the binary encoding of AST.serialize instead of pickling the object graph, which
+is both smaller and exactly what the __dustcache__ stores, so the parent only has to write it to the cache.
+"""
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable, Iterator
+from parser import parse_file
+from typing import Optional, Union
+
+from AST import serialize
+from cache import Cache
+from lexer import DustSyntaxError
+from sources import SOURCE_SUFFIX, find_sources
+
+__all__ = [
+    "SOURCE_SUFFIX",
+    "caches_for",
+    "describe",
+    "find_sources",
+    "parse_files",
+    "parse_serialized",
+    "parse_sources",
+]
+
+
+def caches_for(paths: Iterable[str]) -> dict[str, Cache]:
+    """
+    Get the caches responsible for some source files, sources in the same directory share one.
+
+    :param paths: the paths of the source files
+    :return: the cache of every path, in the order of the paths
+    """
+    caches: dict[str, Cache] = {}
+    result = {}
+    for path in paths:
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory not in caches:
+            caches[directory] = Cache.for_source(path)
+        result[path] = caches[directory]
+    return result
+
+
+def describe(path: str, error: DustSyntaxError) -> str:
+    """
+    Format a syntax error the way compilers usually do.
+
+    :param path: the file the error is in, for errors without a position
+    :param error: the error
+    :return: the message
+    """
+    if error.lineno is None:
+        return f"{path}: {error.msg}"
+    return f"{error.filename}:{error.lineno}:{error.offset}: {error.msg}"
+
+
+def parse_serialized(path: str) -> Union[bytes, DustSyntaxError]:
+    """
+    Parse a source file and serialize the Module, this is what the worker processes run.
+
+    :param path: the path of the source file
+    :return: the serialized Module, or the syntax error of the file
+    """
+    try:
+        return serialize(parse_file(path))
+    except DustSyntaxError as e:
+        return e
+
+
+def parse_files(
+    paths: list[str], jobs: Optional[int] = None
+) -> Iterator[tuple[str, Union[bytes, DustSyntaxError]]]:
+    """
+    Parse source files in parallel.
+
+    :param paths: the paths of the source files
+    :param jobs: the number of worker processes, defaults to the number of cpus, with 1 no process is started
+    :return: every path with its serialized Module or its syntax error, in the order of the paths
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    elif jobs < 1:
+        raise ValueError(f"the number of jobs must be at least 1, not {jobs}")
+    if jobs == 1 or len(paths) < 2:
+        for path in paths:
+            yield path, parse_serialized(path)
+        return
+    # multiprocessing is expensive to import, and not needed at all for a single file
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = min(jobs, len(paths))
+    with ProcessPoolExecutor(jobs) as pool:
+        # a few chunks per worker balance the load without sending every file on its own
+        chunks = max(1, len(paths) // (jobs * 4))
+        yield from zip(paths, pool.map(parse_serialized, paths, chunksize=chunks))
+
+
+def parse_sources(
+    caches: dict[str, Cache], jobs: Optional[int] = None
+) -> list[tuple[str, DustSyntaxError]]:
+    """
+    Make sure the ASTs of source files are cached, parsing the ones that are not in parallel.
+
+    This is where the lookups of the ASTs are counted, the backends only read the entries back afterwards.
+
+    :param caches: the source files with their caches, see caches_for
+    :param jobs: the number of worker processes, see parse_files
+    :return: the files that failed to parse with their syntax errors
+    """
+    keys = {}
+    for path, cache in caches.items():
+        key = cache.key(path)
+        cached = cache.contains(key, "ast")
+        cache.count("ast", cached)
+        if not cached:
+            keys[path] = key
+    errors = []
+    for path, result in parse_files(list(keys), jobs):
+        if isinstance(result, DustSyntaxError):
+            errors.append((path, result))
+        else:
+            caches[path].store(keys[path], "ast", result, evict=False)
+    for cache in dict.fromkeys(caches.values()):
+        cache.evict()
+    return errors
@@ -0,0 +1,106 @@
+"""
+Several ASTVisitors run over a tree in a single traversal.
+
+A FusedRunner walks the tree once, on an explicit stack, and calls the visit methods of all its visitors for every
+node, in the order the visitors were given, so N analyses cost a single walk instead of N.
+Visitors only see the nodes they are interested in: FusableVisitors list the node classes they visit, and the ones
+they want to leave once all children of the node were visited, plain ASTVisitors visit every node.
+The tables of the visit methods per node tag are built once per runner, so visiting a node is a single index and a
+call per interested visitor.
+The visitors must not depend on each other, each node is visited by all of them before the next node is.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from types import MethodType
+from typing import Any, ClassVar, Optional
+
+from AST import AST, Arena, ASTVisitor
+
+__all__ = ["FusableVisitor", "FusedRunner", "run_fused"]
+
+
+class FusableVisitor(ASTVisitor):
+    """An ASTVisitor that tells a FusedRunner which nodes it visits and which it leaves."""
+
+    # the node classes whose visit methods do anything, None for all, subclasses like Expr stand for their subclasses
+    visits: ClassVar[Optional[tuple[type[AST], ...]]] = None
+    # the node classes leave is called for, once all their children were visited
+    leaves: ClassVar[tuple[type[AST], ...]] = ()
+
+    def leave(self, node: AST) -> None:
+        """
+        Leave a node after all its children were visited.
+
+        :param node: the node, one of the classes in leaves
+        :return: None
+        """
+
+
+class FusedRunner:
+    """Run several visitors over trees in one traversal."""
+
+    __slots__ = ("visitors", "entering", "leaving")
+
+    def __init__(self, visitors: Sequence[ASTVisitor]):
+        """
+        Build the tables of the visit methods of some visitors.
+
+        :param visitors: the visitors, every node is visited by them in this order
+        """
+        self.visitors = list(visitors)
+        entering: list[list[Callable[[AST], Any]]] = [[] for _ in Arena.classes]
+        leaving: list[list[Callable[[AST], Any]]] = [[] for _ in Arena.classes]
+        for visitor in self.visitors:
+            visits: Optional[tuple[type[AST], ...]] = None
+            leaves: tuple[type[AST], ...] = ()
+            if isinstance(visitor, FusableVisitor):
+                visits, leaves = visitor.visits, visitor.leaves
+            for tag, cls in enumerate(Arena.classes):
+                assert isinstance(cls, type)
+                if visits is None or issubclass(cls, visits):
+                    entering[tag].append(
+                        MethodType(visitor.dispatch_table[tag], visitor)
+                    )
+                if issubclass(cls, leaves):
+                    assert isinstance(visitor, FusableVisitor)
+                    leaving[tag].append(visitor.leave)
+        self.entering = tuple(tuple(functions) for functions in entering)
+        self.leaving = tuple(tuple(functions) for functions in leaving)
+
+    def run(self, node: AST) -> None:
+        """
+        Visit every node of a tree with all visitors, in pre-order, leaving nodes after their children.
+
+        :param node: the root of the tree
+        :return: None
+        """
+        entering, leaving = self.entering, self.leaving
+        # every node is pushed with False to enter it, and once more with True before its children if it is left
+        stack: list[tuple[AST, bool]] = [(node, False)]
+        pop = stack.pop
+        push = stack.append
+        extend = stack.extend
+        while stack:
+            current, left = pop()
+            tag = current.tag
+            if left:
+                for function in leaving[tag]:
+                    function(current)
+                continue
+            for function in entering[tag]:
+                function(current)
+            if leaving[tag]:
+                push((current, True))
+            extend([(child, False) for child in reversed(current.children())])
+
+
+def run_fused(node: AST, visitors: Sequence[ASTVisitor]) -> None:
+    """
+    Visit every node of a tree with several visitors in one traversal.
+
+    :param node: the root of the tree
+    :param visitors: the visitors, see FusedRunner
+    :return: None
+    """
+    FusedRunner(visitors).run(node)
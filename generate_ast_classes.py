@@ -10,9 +10,47 @@ import subprocess
 
 __all__: list[str] = []
 
-from typing import Optional, cast
+from typing import Optional
 
-visitor_names = set()
+# The position of a node in this list is its tag, which indexes ASTVisitor.dispatch_table.
+visitor_names: list[str] = []
+node_names: list[str] = []
+node_fields: dict[str, list[tuple[str, str]]] = {}
+
+
+def child_shape(f_type: str) -> Optional[str]:
+    """
+    Classify a field type by how it holds child nodes.
+
+    :param f_type: the type annotation of the field
+    :return: "list", "optional" or "node" if the field holds child nodes, None for plain data
+    """
+    for prefix, shape in (("list[", "list"), ("Optional[", "optional")):
+        if f_type.startswith(prefix) and f_type.endswith("]"):
+            return shape if f_type.removeprefix(prefix)[:-1] in node_names else None
+    return "node" if f_type in node_names else None
+
+
+def children_expression(fields: list[tuple[str, str]]) -> str:
+    """
+    Build the expression returning all direct children of a node, in field order.
+
+    :param fields: the fields of the node
+    :return: the python source of the expression
+    """
+    parts = []
+    for f_name, f_type in fields:
+        shape = child_shape(f_type)
+        if shape == "list":
+            parts.append(f"*self.{f_name}")
+        elif shape == "optional":
+            parts.append(f"*(() if self.{f_name} is None else (self.{f_name},))")
+        elif shape == "node":
+            parts.append(f"self.{f_name}")
+    if len(parts) == 1 and parts[0].startswith("*self."):
+        # a single list is already the right sequence
+        return parts[0][1:]
+    return f"({', '.join(parts)}{',' if len(parts) == 1 else ''})"
 
 
 def new_node(
@@ -23,6 +61,7 @@ def new_node(
     generate_init: bool = True,
     abstract_visit: bool = False,
     generate_visit: bool = True,
+    generate_slots: bool = True,
 ) -> None:
     """
     Generate a new AST node.
@@ -34,11 +73,27 @@ def new_node(
     :param generate_init: weather we should generate a constructor for this
     :param abstract_visit: If the visitor should be an abstractmethod
     :param generate_visit: if we should generate a visitor at all
+    :param generate_slots: if the fields should be stored in __slots__ instead of an instance __dict__,
+        for nodes without fields this still generates empty slots, so subclasses don't get a __dict__ either
     :return: None
     """
     if fields is None:
         fields = []
-    body: list[ast.AnnAssign | ast.FunctionDef] = [
+    node_names.append(name)
+    node_fields[name] = fields
+    body: list[ast.stmt] = []
+    if generate_slots:
+        body.append(
+            ast.Assign(
+                targets=[ast.Name(id="__slots__", ctx=ast.Store())],
+                value=ast.Tuple(
+                    elts=[ast.Constant(value=f_name) for f_name, _ in fields],
+                    ctx=ast.Load(),
+                ),
+                lineno=0,
+            )
+        )
+    body += [
         ast.AnnAssign(
             target=ast.Name(id=f_name, ctx=ast.Store()),
             annotation=ast.Name(id=f_type, ctx=ast.Load()),
@@ -48,7 +103,19 @@ def new_node(
     ]
 
     if generate_visit:
-        visitor_names.add(name)
+        body.append(
+            ast.AnnAssign(
+                target=ast.Name(id="tag", ctx=ast.Store()),
+                annotation=ast.Subscript(
+                    value=ast.Name(id="ClassVar", ctx=ast.Load()),
+                    slice=ast.Name(id="int", ctx=ast.Load()),
+                    ctx=ast.Load(),
+                ),
+                value=ast.Constant(value=len(visitor_names)),
+                simple=1,
+            )
+        )
+        visitor_names.append(name)
 
     if generate_init:
         body.append(
@@ -86,6 +153,10 @@ def new_node(
             )
         )
 
+    body += ast.parse(
+        f"def children(self) -> Sequence[AST]:\n    return {children_expression(fields)}"
+    ).body
+
     if generate_visit:
         body.append(
             ast.FunctionDef(
@@ -140,7 +211,7 @@ def new_node(
             name=name,
             bases=[ast.Name(id=parent, ctx=ast.Load())],
             keywords=[],
-            body=body if body else [cast(ast.AnnAssign, ast.Pass())],
+            body=body if body else [ast.Pass()],
             decorator_list=[],
         )
     )
@@ -150,15 +221,31 @@ def generate_visitor(module: ast.Module) -> None:
     """
     Generate a visitor class for all already generated Nodes.
 
+    Besides accept() based double dispatch, the visitor gets a dispatch table indexed by the tag of each node,
+    which walk() uses to call the right visit method without any attribute lookup or argument packing.
+
     :param module: The ast.module to generate the visitor in
     :return: None
     """
+    dispatch = ast.parse(
+        f"""
+dispatch_table: ClassVar[tuple[Callable[..., Any], ...]] = ()
+
+def __init_subclass__(cls, **kwargs: Any) -> None:
+    super().__init_subclass__(**kwargs)
+    cls.dispatch_table = ({"".join(f"cls.visit_{cls}, " for cls in visitor_names)})
+
+def walk(self, node: AST) -> Any:
+    return self.dispatch_table[node.tag](self, node)
+"""
+    ).body
     module.body.append(
         ast.ClassDef(
             name="ASTVisitor",
             bases=[ast.Name(id="ABC", ctx=ast.Load())],
             keywords=[],
-            body=[
+            body=dispatch
+            + [
                 ast.FunctionDef(
                     name=f"visit_{cls}",
                     args=ast.arguments(
@@ -167,7 +254,7 @@ def generate_visitor(module: ast.Module) -> None:
                             ast.arg(arg="self"),
                             ast.arg(
                                 arg="node",
-                                annotation=ast.Name(id="AST", ctx=ast.Load()),
+                                annotation=ast.Name(id=cls, ctx=ast.Load()),
                             ),
                         ],
                         vararg=ast.arg(
@@ -192,6 +279,127 @@ def generate_visitor(module: ast.Module) -> None:
     )
 
 
+def generate_transformer(module: ast.Module) -> None:
+    """
+    Generate a transformer for all already generated Nodes, whose visit methods return the replacement of a node.
+
+    transform() visits every node of a tree once, children before their parents, on an explicit stack, and keeps
+    the replacements that differ from their nodes by id of the node, so trees may also be DAGs.
+    A node in a child list may be replaced by a list of nodes, which is spliced into the list, or by a tuple, like
+    the child lists of shared nodes.
+    The default visit methods rebuild a node from the replacements of its children, and return the node itself if
+    none of them changed, so only the spine from a replaced node up to the root is copied and unchanged subtrees and
+    child lists are shared with the original tree.
+    Subclasses list the tags of the nodes they never replace in skipped_tags, those are neither visited nor
+    descended into.
+
+    :param module: The ast.module to generate the transformer in
+    :return: None
+    """
+    rebuilds = []
+    for name in visitor_names:
+        fields = node_fields[name]
+        shapes = {f_name: child_shape(f_type) for f_name, f_type in fields}
+        children = [f_name for f_name, shape in shapes.items() if shape is not None]
+        if not children:
+            rebuilds.append(
+                f"""
+    def rebuild_{name}(self, node: {name}) -> {name}:
+        return node
+"""
+            )
+            continue
+        results = {
+            "list": "self.results(node.{0})",
+            "optional": "None if node.{0} is None else self.result(node.{0})",
+            "node": "self.result(node.{0})",
+        }
+        assignments = "".join(
+            f"\n        {f_name} = {results[str(shapes[f_name])].format(f_name)}"
+            for f_name in children
+        )
+        unchanged = " and ".join(f"{f_name} is node.{f_name}" for f_name in children)
+        arguments = ", ".join(
+            f_name if f_name in children else f"node.{f_name}" for f_name in shapes
+        )
+        rebuilds.append(
+            f"""
+    def rebuild_{name}(self, node: {name}) -> {name}:{assignments}
+        if {unchanged}:
+            return node
+        return {name}({arguments})
+"""
+        )
+    visits = "".join(
+        f"""
+    def visit_{name}(self, node: {name}, *args: Any, **kwargs: Any) -> Any:
+        return self.rebuild_{name}(node)
+"""
+        for name in visitor_names
+    )
+    table = "".join(f"rebuild_{name}, " for name in visitor_names)
+    module.body += ast.parse(
+        f"""
+class ASTTransformer(ASTVisitor):
+    skipped_tags: ClassVar[frozenset[int]] = frozenset()
+    transformed: dict[int, Any]
+
+    def transform(self, node: AST) -> Any:
+        self.transformed = transformed = {{}}
+        dispatch_table = self.dispatch_table
+        skipped_tags = self.skipped_tags
+        seen: set[int] = set()
+        stack: list[tuple[AST, bool]] = [(node, False)]
+        pop = stack.pop
+        while stack:
+            current, children_done = pop()
+            if not children_done:
+                if id(current) in seen:
+                    continue
+                seen.add(id(current))
+                children = [
+                    (child, False) for child in reversed(current.children()) if child.tag not in skipped_tags
+                ]
+                if children:
+                    stack.append((current, True))
+                    stack.extend(children)
+                    continue
+            result = dispatch_table[current.tag](self, current)
+            if result is not current:
+                transformed[id(current)] = result
+        return transformed.get(id(node), node)
+
+    def result(self, node: AST) -> Any:
+        result = self.transformed.get(id(node), node)
+        if isinstance(result, (list, tuple)):
+            raise TypeError(f"only nodes in child lists can be replaced by lists, not {{type(node).__name__}}")
+        return result
+
+    def results(self, nodes: list[AST]) -> list[AST]:
+        transformed = self.transformed
+        for node in nodes:
+            if id(node) in transformed:
+                break
+        else:
+            return nodes
+        new: list[AST] = []
+        for node in nodes:
+            result = transformed.get(id(node), node)
+            if isinstance(result, (list, tuple)):
+                new.extend(result)
+            else:
+                new.append(result)
+        return new
+
+    def rebuild(self, node: AST) -> AST:
+        return self.rebuild_table[node.tag](self, node)
+{"".join(rebuilds)}
+    rebuild_table: ClassVar[tuple[Callable[..., AST], ...]] = ({table})
+{visits}
+"""
+    ).body
+
+
 file_module = ast.Module(
     body=[
         ast.ImportFrom(
@@ -199,14 +407,32 @@ file_module = ast.Module(
             names=[ast.alias(name="annotations")],
             level=0,
         ),
+        ast.ImportFrom(
+            module="array",
+            names=[ast.alias(name="array")],
+            level=0,
+        ),
         ast.ImportFrom(
             module="abc",
             names=[ast.alias(name="ABC"), ast.alias(name="abstractmethod")],
             level=0,
         ),
+        ast.ImportFrom(
+            module="symbols",
+            names=[ast.alias(name="SYMBOLS"), ast.alias(name="Symbol")],
+            level=0,
+        ),
         ast.ImportFrom(
             module="typing",
-            names=[ast.alias(name="Optional"), ast.alias(name="Any")],
+            names=[
+                ast.alias(name="Optional"),
+                ast.alias(name="Any"),
+                ast.alias(name="Callable"),
+                ast.alias(name="ClassVar"),
+                ast.alias(name="Iterator"),
+                ast.alias(name="Sequence"),
+                ast.alias(name="Union"),
+            ],
             level=0,
         ),
     ],
@@ -214,27 +440,741 @@ file_module = ast.Module(
 )
 
 
-def main() -> None:
+def generate_traversal(module: ast.Module) -> None:
     """
-    Orchestrate the generating of AST.py and actually list of the ast nodes to be generated.
+    Generate iterative traversals over the children() of the generated Nodes.
 
+    They keep their state on an explicit stack, so they cope with arbitrarily deeply nested trees.
+
+    :param module: The ast.module to generate the traversals in
     :return: None
     """
-    new_node(file_module, "AST", parent="ABC", generate_init=False, abstract_visit=True)
-    # new_node(file_module, "Expr", parent="AST", generate_init=False, generate_visit=False)
-    new_node(file_module, "Module", [("body", "list[AST]")])
-    new_node(file_module, "Block", [("label", "Optional[str]"), ("body", "list[AST]")])
-    new_node(file_module, "If", [("label", "Optional[str]"), ("body", "list[AST]")])
-    new_node(file_module, "While", [("label", "Optional[str]"), ("body", "list[AST]")])
-    new_node(file_module, "Do", [("label", "Optional[str]"), ("body", "list[AST]")])
+    module.body += ast.parse(
+        """
+ENTER = 0
+EXIT = 1
+
+
+def iter_preorder(node: AST) -> Iterator[AST]:
+    stack = [node]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        node = pop()
+        yield node
+        extend(reversed(node.children()))
+
+
+def iter_postorder(node: AST) -> Iterator[AST]:
+    for event, node in iter_events(node):
+        if event == EXIT:
+            yield node
+
+
+def iter_events(node: AST) -> Iterator[tuple[int, AST]]:
+    yield ENTER, node
+    stack = [(node, iter(node.children()))]
+    while stack:
+        parent, children = stack[-1]
+        for child in children:
+            yield ENTER, child
+            stack.append((child, iter(child.children())))
+            break
+        else:
+            stack.pop()
+            yield EXIT, parent
+"""
+    ).body
+
+
+def generate_arena(module: ast.Module) -> None:
+    """
+    Generate a struct-of-arrays store for whole trees of the generated Nodes.
+
+    Nodes are stored in post-order, so every subtree is a contiguous range of indices ending in its root.
+    Per node the arena keeps its tag, the start of its subtree and the offset of its record in the data array.
+    The layout of a record follows the fields of the node: child lists take two entries (a range in the children
+    array), child nodes take one (their index, shifted by one for optional ones) and everything else is an index
+    into the interned values table.
+
+    :param module: The ast.module to generate the arena in
+    :return: None
+    """
+    layouts = [
+        tuple((f_name, child_shape(f_type)) for f_name, f_type in node_fields[name])
+        for name in visitor_names
+    ]
+    module.body += ast.parse(
+        f"""
+class Arena:
+    __slots__ = ("kinds", "starts", "records", "data", "children", "values", "interned")
+    classes: ClassVar[tuple[Callable[..., AST], ...]] = ({"".join(f"{name}, " for name in visitor_names)})
+    layouts: ClassVar[tuple[tuple[tuple[str, Optional[str]], ...], ...]] = {tuple(layouts)!r}
+
+    def __init__(self) -> None:
+        self.kinds = array("I")
+        self.starts = array("I")
+        self.records = array("I")
+        self.data = array("I")
+        self.children = array("I")
+        self.values: list[Any] = []
+        self.interned: dict[tuple[type, Any], int] = {{}}
 
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def intern(self, value: Any) -> int:
+        key = (type(value), value)
+        index = self.interned.get(key)
+        if index is None:
+            index = self.interned[key] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def add(self, node: AST) -> int:
+        kinds, starts, records, data, children = (
+            self.kinds, self.starts, self.records, self.data, self.children
+        )
+        indices: dict[int, int] = {{}}
+        index = -1
+        for current in iter_postorder(node):
+            index = len(kinds)
+            records.append(len(data))
+            for f_name, shape in self.layouts[current.tag]:
+                value = getattr(current, f_name)
+                if shape is None:
+                    data.append(self.intern(value))
+                elif shape == "list":
+                    data.append(len(children))
+                    children.extend([indices[id(child)] for child in value])
+                    data.append(len(children))
+                elif shape == "optional":
+                    data.append(0 if value is None else indices[id(value)] + 1)
+                else:
+                    data.append(indices[id(value)])
+            first = current.children()
+            starts.append(starts[indices[id(first[0])]] if first else index)
+            kinds.append(current.tag)
+            indices[id(current)] = index
+        return index
+
+    def tag(self, index: int) -> int:
+        return self.kinds[index]
+
+    def field(self, index: int, name: str) -> Any:
+        data = self.data
+        offset = self.records[index]
+        for f_name, shape in self.layouts[self.kinds[index]]:
+            if f_name == name:
+                value = data[offset]
+                if shape is None:
+                    return self.values[value]
+                if shape == "list":
+                    end = data[offset + 1]
+                    return self.children[value:end]
+                if shape == "optional":
+                    return None if value == 0 else value - 1
+                return value
+            offset += 2 if shape == "list" else 1
+        raise AttributeError(name)
+
+    def materialize(self, index: int) -> AST:
+        kinds, records, data, children, values = (
+            self.kinds, self.records, self.data, self.children, self.values
+        )
+        start = self.starts[index]
+        built: list[AST] = []
+        for current in range(start, index + 1):
+            offset = records[current]
+            args: list[Any] = []
+            for _, shape in self.layouts[kinds[current]]:
+                value = data[offset]
+                if shape is None:
+                    args.append(values[value])
+                elif shape == "list":
+                    offset += 1
+                    end = data[offset]
+                    args.append([built[child - start] for child in children[value:end]])
+                elif shape == "optional":
+                    args.append(None if value == 0 else built[value - 1 - start])
+                else:
+                    args.append(built[value - start])
+                offset += 1
+            built.append(self.classes[kinds[current]](*args))
+        return built[-1]
+"""
+    ).body
+
+
+def serial_code(f_type: str) -> str:
+    """
+    Map the type of a field to the way it is serialized.
+
+    :param f_type: the type of the field
+    :return: the name of one of the FIELD_* constants of the serialization
+    """
+    shape = child_shape(f_type)
+    if shape is not None:
+        return f"FIELD_{shape.upper()}"
+    codes = {
+        "str": "FIELD_STR",
+        "Optional[str]": "FIELD_OPTIONAL_STR",
+        "Optional[Symbol]": "FIELD_OPTIONAL_SYMBOL",
+        "int": "FIELD_INT",
+    }
+    if f_type not in codes:
+        raise ValueError(f"can't serialize fields of type {f_type}")
+    return codes[f_type]
+
+
+def generate_serialization(module: ast.Module) -> None:
+    """
+    Generate a compact, versioned binary encoding of trees of the generated Nodes.
+
+    The encoding starts with a magic number and a version, followed by the table of all strings in the tree and
+    the nodes in pre-order.
+    A node is its tag followed by its fields: strings are indices into the table, integers are zigzag encoded, a
+    missing optional node is a 0 tag and child lists are their length and the size of their encoding in bytes, so
+    readers can skip over whole bodies.
+    Symbols are only valid in the process that interned them, so they are stored by name like strings, and
+    interned again when decoded.
+    Apart from those sizes, which are fixed 4 byte little endian integers, all numbers are unsigned LEB128 varints.
+    Decoding works on a memoryview, so neither the buffer nor its strings are copied before they are used.
+
+    :param module: The ast.module to generate the serialization in
+    :return: None
+    """
+    layouts = ", ".join(
+        "("
+        + "".join(
+            f"({f_name!r}, {serial_code(f_type)}), "
+            for f_name, f_type in node_fields[name]
+        )
+        + ")"
+        for name in visitor_names
+    )
+    module.body += ast.parse(
+        f"""
+SERIAL_MAGIC = b"DAST"
+SERIAL_VERSION = 1
+(
+    FIELD_STR,
+    FIELD_OPTIONAL_STR,
+    FIELD_OPTIONAL_SYMBOL,
+    FIELD_INT,
+    FIELD_NODE,
+    FIELD_OPTIONAL_NODE,
+    FIELD_LIST,
+    FIELD_END,
+) = range(8)
+SERIAL_LAYOUTS: tuple[tuple[tuple[str, int], ...], ...] = ({layouts})
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(view: memoryview, pos: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def serialize(node: AST) -> bytes:
+    body = bytearray()
+    strings: dict[str, int] = {{}}
+    stack: list[tuple[int, Any]] = [(FIELD_NODE, node)]
+    pop = stack.pop
+    while stack:
+        code, value = pop()
+        if code == FIELD_NODE or code == FIELD_OPTIONAL_NODE:
+            if value is None:
+                body.append(0)
+                continue
+            write_varint(body, value.tag)
+            stack.extend([(f_code, getattr(value, f_name)) for f_name, f_code in reversed(SERIAL_LAYOUTS[value.tag])])
+        elif code == FIELD_LIST:
+            write_varint(body, len(value))
+            stack.append((FIELD_END, len(body)))
+            body += bytes(4)
+            stack.extend([(FIELD_NODE, child) for child in reversed(value)])
+        elif code == FIELD_END:
+            end = value + 4
+            body[value:end] = (len(body) - end).to_bytes(4, "little")
+        elif code == FIELD_INT:
+            write_varint(body, value << 1 if value >= 0 else ~value << 1 | 1)
+        elif value is None:
+            body.append(0)
+        else:
+            if code == FIELD_OPTIONAL_SYMBOL:
+                value = SYMBOLS.names[value]
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(strings)
+            write_varint(body, index if code == FIELD_STR else index + 1)
+    out = bytearray(SERIAL_MAGIC)
+    write_varint(out, SERIAL_VERSION)
+    write_varint(out, len(strings))
+    for string in strings:
+        encoded = string.encode()
+        write_varint(out, len(encoded))
+        out += encoded
+    out += body
+    return bytes(out)
+
+
+def read_strings(view: memoryview) -> tuple[list[str], int]:
+    magic = len(SERIAL_MAGIC)
+    if view[:magic] != SERIAL_MAGIC:
+        raise ValueError("not a serialized AST")
+    version, pos = read_varint(view, magic)
+    if version != SERIAL_VERSION:
+        raise ValueError(f"unsupported AST serialization version {{version}}")
+    count, pos = read_varint(view, pos)
+    strings = []
+    for _ in range(count):
+        size, pos = read_varint(view, pos)
+        end = pos + size
+        strings.append(str(view[pos:end], "utf-8"))
+        pos = end
+    return strings, pos
+
+
+def decode_node(view: memoryview, pos: int, strings: list[str]) -> tuple[AST, int]:
+    classes = Arena.classes
+    tag, pos = read_varint(view, pos)
+    # per unfinished node: its tag, its arguments so far, the field being decoded and the items of a child list
+    stack: list[list[Any]] = [[tag, [], 0, None, 0]]
+    while True:
+        frame = stack[-1]
+        tag, args, index, items, remaining = frame
+        if items is not None:
+            if remaining:
+                frame[4] = remaining - 1
+                tag = view[pos]
+                if tag < 0x80:
+                    pos += 1
+                else:
+                    tag, pos = read_varint(view, pos)
+                stack.append([tag, [], 0, None, 0])
+                continue
+            args.append(items)
+            frame[3] = None
+            index += 1
+        layout = SERIAL_LAYOUTS[tag]
+        while index < len(layout):
+            code = layout[index][1]
+            value = view[pos]
+            if value < 0x80:
+                pos += 1
+            else:
+                value, pos = read_varint(view, pos)
+            if code == FIELD_STR:
+                args.append(strings[value])
+            elif code == FIELD_OPTIONAL_STR:
+                args.append(strings[value - 1] if value else None)
+            elif code == FIELD_OPTIONAL_SYMBOL:
+                args.append(SYMBOLS.intern(strings[value - 1]) if value else None)
+            elif code == FIELD_INT:
+                args.append(~(value >> 1) if value & 1 else value >> 1)
+            elif code == FIELD_LIST:
+                pos += 4
+                if value:
+                    frame[2:] = index, [], value
+                    break
+                args.append([])
+            elif value:
+                frame[2] = index
+                stack.append([value, [], 0, None, 0])
+                break
+            else:
+                args.append(None)
+            index += 1
+        else:
+            node = classes[tag](*args)
+            stack.pop()
+            if not stack:
+                return node, pos
+            parent = stack[-1]
+            if parent[3] is not None:
+                parent[3].append(node)
+            else:
+                parent[1].append(node)
+                parent[2] += 1
+
+
+def deserialize(data: Union[bytes, bytearray, memoryview]) -> AST:
+    view = memoryview(data)
+    try:
+        strings, pos = read_strings(view)
+        node, pos = decode_node(view, pos, strings)
+    except (IndexError, UnicodeDecodeError, TypeError) as e:
+        raise ValueError("corrupt serialized AST") from e
+    if pos != len(view):
+        raise ValueError("serialized AST has the wrong length")
+    return node
+"""
+    ).body
+
+
+def generate_lazy(module: ast.Module) -> None:
+    """
+    Generate lazy variants of the Nodes with child lists, which decode those lists from a serialized tree on demand.
+
+    A LazyDecoder only reads the header of the serialization and the root node up front, a corrupt header or a
+    truncated serialization raise ValueError like deserialize does, corruption inside the child lists only shows once
+    they are decoded.
+    The nodes it returns keep the offsets of their child lists and decode them on first access, so visiting a node
+    through accept(), walk() or children() only decodes the parts of the tree that are actually reached.
+
+    :param module: The ast.module to generate the lazy nodes in
+    :return: None
+    """
+    lazy_names = [
+        name
+        for name in visitor_names
+        if any(child_shape(f_type) == "list" for _, f_type in node_fields[name])
+    ]
+    classes = []
+    for name in lazy_names:
+        fields = node_fields[name]
+        lists = [f_name for f_name, f_type in fields if child_shape(f_type) == "list"]
+        parameters = "".join(
+            f", {f_name}: {'int' if f_name in lists else f_type}"
+            for f_name, f_type in fields
+        )
+        assignments = "".join(
+            f"\n        self.lazy_{f_name}: Union[int, {f_type}] = {f_name}"
+            if f_name in lists
+            else f"\n        self.{f_name} = {f_name}"
+            for f_name, f_type in fields
+        )
+        properties = "".join(
+            f"""
+    @property
+    def {f_name}(self) -> {f_type}:
+        {f_name} = self.lazy_{f_name}
+        if isinstance({f_name}, int):
+            {f_name} = self.lazy_{f_name} = self.decoder.decode_list({f_name})
+        return {f_name}
+
+    @{f_name}.setter
+    def {f_name}(self, value: {f_type}) -> None:
+        self.lazy_{f_name} = value
+"""
+            for f_name, f_type in fields
+            if f_name in lists
+        )
+        classes.append(
+            f"""
+class Lazy{name}({name}):
+    __slots__ = ("decoder", {"".join(f'"lazy_{f_name}", ' for f_name in lists)})
+
+    def __init__(self, decoder: LazyDecoder{parameters}) -> None:
+        self.decoder = decoder{assignments}
+{properties}
+"""
+        )
+    lazy_classes = ", ".join(
+        f"Lazy{name}" if name in lazy_names else "None" for name in visitor_names
+    )
+    module.body += ast.parse(
+        f"""
+{"".join(classes)}
+
+LAZY_CLASSES: tuple[Optional[Callable[..., AST]], ...] = ({lazy_classes},)
+
+
+class LazyDecoder:
+    __slots__ = ("view", "strings", "root")
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self.view = memoryview(data)
+        try:
+            self.strings, self.root = read_strings(self.view)
+        except (IndexError, UnicodeDecodeError, TypeError) as e:
+            raise ValueError("corrupt serialized AST") from e
+
+    def decode(self, pos: int) -> tuple[AST, int]:
+        view = self.view
+        tag, start = read_varint(view, pos)
+        lazy = LAZY_CLASSES[tag]
+        if lazy is None:
+            return decode_node(view, pos, self.strings)
+        strings = self.strings
+        args: list[Any] = [self]
+        pos = start
+        for _, code in SERIAL_LAYOUTS[tag]:
+            if code == FIELD_LIST:
+                args.append(pos)
+                _, pos = read_varint(view, pos)
+                end = pos + 4
+                pos = end + int.from_bytes(view[pos:end], "little")
+            elif code == FIELD_OPTIONAL_NODE and view[pos] == 0:
+                args.append(None)
+                pos += 1
+            elif code == FIELD_NODE or code == FIELD_OPTIONAL_NODE:
+                node, pos = decode_node(view, pos, strings)
+                args.append(node)
+            else:
+                value, pos = read_varint(view, pos)
+                if code == FIELD_STR:
+                    args.append(strings[value])
+                elif code == FIELD_OPTIONAL_STR:
+                    args.append(strings[value - 1] if value else None)
+                elif code == FIELD_OPTIONAL_SYMBOL:
+                    args.append(SYMBOLS.intern(strings[value - 1]) if value else None)
+                else:
+                    args.append(~(value >> 1) if value & 1 else value >> 1)
+        return lazy(*args), pos
+
+    def decode_list(self, pos: int) -> list[AST]:
+        count, pos = read_varint(self.view, pos)
+        pos += 4
+        items = []
+        for _ in range(count):
+            item, pos = self.decode(pos)
+            items.append(item)
+        return items
+
+    def root_node(self) -> AST:
+        try:
+            node, pos = self.decode(self.root)
+        except (IndexError, UnicodeDecodeError, TypeError) as e:
+            raise ValueError("corrupt serialized AST") from e
+        if pos != len(self.view):
+            raise ValueError("serialized AST has the wrong length")
+        return node
+"""
+    ).body
+
+
+def shared_type(f_type: str) -> str:
+    """
+    Get the type a shared node accepts for a field, any sequence for child lists, which it stores as tuples.
+
+    :param f_type: the type of the field
+    :return: the type of the parameter
+    """
+    if child_shape(f_type) == "list":
+        return f_type.replace("list[", "Sequence[", 1)
+    return f_type
+
+
+def generate_sharing(module: ast.Module) -> None:
+    """
+    Generate immutable, hash-consed variants of the Nodes and the factory sharing them.
+
+    A HashConsing factory keeps a single instance of every distinct subtree, so structurally equal shared nodes
+    are identical, and a tree with many repeated subtrees is stored as a DAG.
+    The children of a shared node are shared themselves, which makes comparing two nodes shallow: their hashes
+    are computed once on creation, and child nodes are compared by identity.
+    The factory counts, per node class, how many nodes it was asked for and how many distinct ones it kept.
+    Shared nodes store their child lists as tuples, so not even the lists of a node that is shared can be changed.
+
+    :param module: The ast.module to generate the shared nodes in
+    :return: None
+    """
+    names = visitor_names[1:]
+    parameters = {
+        name: ", ".join(
+            f"{f_name}: {shared_type(f_type)}" for f_name, f_type in node_fields[name]
+        )
+        for name in names
+    }
+    classes = []
+    for name in names:
+        fields = node_fields[name]
+        assignments = "".join(
+            f"\n        object.__setattr__(self, {f_name!r}, tuple({f_name}))"
+            if child_shape(f_type) == "list"
+            else f"\n        object.__setattr__(self, {f_name!r}, {f_name})"
+            for f_name, f_type in fields
+        )
+        key = "".join(
+            f"self.{f_name}, " if child_shape(f_type) == "list" else f"{f_name}, "
+            for f_name, f_type in fields
+        )
+        # child nodes are shared, so the identity check of the tuple comparison decides for equal ones,
+        # and different ones differ in their hash
+        own = "".join(f"self.{f_name}, " for f_name, _ in fields)
+        others = "".join(f"other.{f_name}, " for f_name, _ in fields)
+        classes.append(
+            f"""
+class Shared{name}({name}):
+    __slots__ = ("hash",)
+    hash: int
+
+    def __init__(self, {parameters[name]}) -> None:{assignments}
+        object.__setattr__(self, "hash", hash(({name}.tag, {key})))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't set {{name}}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"shared nodes can't be changed, can't delete {{name}}")
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return self is other or (
+            type(other) is Shared{name} and self.hash == other.hash and ({own}) == ({others})
+        )
+"""
+        )
+    makers = "".join(
+        f"""
+    def make_{name}(self, {parameters[name]}) -> {name}:
+        node: {name} = self.intern(Shared{name}({", ".join(f_name for f_name, _ in node_fields[name])}))
+        return node
+"""
+        for name in names
+    )
+    module.body += ast.parse(
+        f"""
+{"".join(classes)}
+
+SHARED_CLASSES: tuple[Optional[Callable[..., AST]], ...] = (None, {"".join(f"Shared{name}, " for name in names)})
+
+
+class HashConsing:
+    __slots__ = ("table", "requests", "unique")
+
+    def __init__(self) -> None:
+        self.table: dict[AST, AST] = {{}}
+        self.requests = [0] * len(SHARED_CLASSES)
+        self.unique = [0] * len(SHARED_CLASSES)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def intern(self, node: AST) -> Any:
+        shared = self.table.setdefault(node, node)
+        self.requests[node.tag] += 1
+        if shared is node:
+            self.unique[node.tag] += 1
+        return shared
+{makers}
+    def share(self, node: AST) -> AST:
+        layouts = Arena.layouts
+        shared: dict[int, AST] = {{}}
+        for current in iter_postorder(node):
+            args: list[Any] = []
+            for f_name, shape in layouts[current.tag]:
+                value = getattr(current, f_name)
+                if shape is None:
+                    args.append(value)
+                elif shape == "list":
+                    args.append([shared[id(child)] for child in value])
+                elif shape == "optional" and value is None:
+                    args.append(None)
+                else:
+                    args.append(shared[id(value)])
+            cls = SHARED_CLASSES[current.tag]
+            assert cls is not None
+            shared[id(current)] = self.intern(cls(*args))
+        return shared[id(node)]
+
+    def statistics(self) -> dict[str, tuple[int, int]]:
+        return {{
+            cls.__name__.removeprefix("Shared"): (self.requests[tag], self.unique[tag])
+            for tag, cls in enumerate(SHARED_CLASSES)
+            if cls is not None
+        }}
+"""
+    ).body
+
+
+def generate_nodes(module: ast.Module, generate_slots: bool = True) -> None:
+    """
+    List all the ast nodes to be generated.
+
+    :param module: The ast.module to generate the nodes in
+    :param generate_slots: if the nodes should use __slots__, see new_node
+    :return: None
+    """
+    new_node(
+        module,
+        "AST",
+        parent="ABC",
+        generate_init=False,
+        abstract_visit=True,
+        generate_slots=generate_slots,
+    )
+    new_node(
+        module,
+        "Expr",
+        generate_init=False,
+        generate_visit=False,
+        generate_slots=generate_slots,
+    )
+    for name, fields in [
+        ("Module", [("body", "list[AST]")]),
+        ("Block", [("label", "Optional[Symbol]"), ("body", "list[AST]")]),
+        (
+            "If",
+            [
+                ("label", "Optional[Symbol]"),
+                ("condition", "Expr"),
+                ("body", "list[AST]"),
+                ("orelse", "list[AST]"),
+            ],
+        ),
+        (
+            "While",
+            [
+                ("label", "Optional[Symbol]"),
+                ("condition", "Expr"),
+                ("body", "list[AST]"),
+            ],
+        ),
+        ("Do", [("label", "Optional[Symbol]"), ("body", "list[AST]")]),
+        ("Break", [("label", "Optional[Symbol]")]),
+        ("Continue", [("label", "Optional[Symbol]")]),
+        ("Assign", [("target", "str"), ("value", "Expr")]),
+        ("Print", [("value", "Expr")]),
+    ]:
+        new_node(module, name, fields, generate_slots=generate_slots)
+    for name, fields in [
+        ("Name", [("id", "str")]),
+        ("Constant", [("value", "int")]),
+        ("BinOp", [("left", "Expr"), ("op", "str"), ("right", "Expr")]),
+        ("UnaryOp", [("op", "str"), ("operand", "Expr")]),
+    ]:
+        new_node(module, name, fields, parent="Expr", generate_slots=generate_slots)
+
+
+def main() -> None:
+    """
+    Orchestrate the generating of AST.py.
+
+    :return: None
+    """
+    generate_nodes(file_module)
     generate_visitor(file_module)
+    generate_transformer(file_module)
+    generate_traversal(file_module)
+    generate_arena(file_module)
+    generate_serialization(file_module)
+    generate_lazy(file_module)
+    generate_sharing(file_module)
 
     with open("AST.py", "w") as f:
         f.write("# noqa: D1\n")
         f.write(ast.unparse(file_module))
 
     subprocess.call(["black", "AST.py"])
+    subprocess.call(["isort", "--profile", "black", "AST.py"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""
+Incremental reparsing of edited sources.
+
+An IncrementalParser keeps a Module in sync with its source.
+For every edit only the smallest labelled statement enclosing it is parsed again and swapped into the tree, all
+other subtrees are reused as they are.
+Labelled statements are the unit of reparsing because their source is self-contained: it starts with the label and
+ends with the closing brace, so the lexer state at both ends is the same before and after an edit inside.
+If the edit is not inside a labelled statement, or the reparsed text is not a single statement anymore, the whole
+source is parsed again.
+"""
+from __future__ import annotations
+
+from parser import Parser, Span
+from typing import Optional
+
+from AST import AST, Module, iter_preorder
+from lexer import DustSyntaxError, tokenize
+
+__all__ = ["IncrementalParser"]
+
+
+class IncrementalParser:
+    """A parsed source that can be edited."""
+
+    def __init__(self, source: bytes, filename: str = "<unknown>"):
+        """
+        Parse a source.
+
+        :param source: the source code
+        :param filename: the name used in error messages
+        """
+        self.source = source
+        self.filename = filename
+        self.spans: dict[AST, Span] = {}
+        self.module: Optional[Module] = None
+        # how often the whole source and how often only a statement was parsed
+        self.full_parses = 0
+        self.partial_parses = 0
+        self.parse()
+
+    def parse(self) -> Module:
+        """
+        Parse the whole source.
+
+        :return: the new Module
+        """
+        self.module = None
+        self.spans = {}
+        self.full_parses += 1
+        self.module = Parser(
+            tokenize(self.source, self.filename), self.filename, self.spans
+        ).parse()
+        return self.module
+
+    def enclosing(self, start: int, end: int) -> Optional[AST]:
+        """
+        Find the smallest labelled statement containing a range of the source.
+
+        :param start: the start offset of the range
+        :param end: the end offset of the range
+        :return: the statement, None if there is none
+        """
+        best = None
+        size = len(self.source) + 1
+        for node, span in self.spans.items():
+            if span.start <= start and end <= span.end and span.end - span.start < size:
+                best = node
+                size = span.end - span.start
+        return best
+
+    def edit(self, start: int, end: int, text: bytes) -> Module:
+        """
+        Replace a range of the source and update the Module.
+
+        The Module is changed in place, the replaced statement is the only node that is not reused.
+        If the edit leaves the source malformed the syntax error is raised, and the next edit parses the whole source.
+
+        :param start: the start offset of the replaced range in the current source
+        :param end: the end offset of the replaced range
+        :param text: the new text of the range
+        :return: the updated Module
+        """
+        old = self.source
+        self.source = old[:start] + text + old[end:]
+        if self.module is None:
+            return self.parse()
+        node = self.enclosing(start, end)
+        if node is None:
+            return self.parse()
+        spans = self.spans
+        region = spans[node]
+        delta = len(text) - (end - start)
+        begin = region.start
+        stop = region.end + delta
+        local: dict[AST, Span] = {}
+        try:
+            module = Parser(
+                tokenize(memoryview(self.source)[begin:stop]),
+                self.filename,
+                local,
+            ).parse()
+        except DustSyntaxError:
+            # the full parse reports the error with its proper position
+            return self.parse()
+        if len(module.body) != 1:
+            return self.parse()
+        self.partial_parses += 1
+
+        for stale in iter_preorder(node):
+            spans.pop(stale, None)
+        # only statements behind the edit move, besides the ends of the ones enclosing it
+        for span in spans.values():
+            if span.end > start:
+                span.end += delta
+                if span.start > start:
+                    span.start += delta
+        replacement = module.body[0]
+        for new, span in local.items():
+            if new is replacement:
+                span.body = region.body
+                span.index = region.index
+            span.start += region.start
+            span.end += region.start
+            spans[new] = span
+        region.body[region.index] = replacement
+        return self.module
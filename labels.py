@@ -0,0 +1,212 @@
+"""
+Resolution of break and continue, done once per Module before either backend runs.
+
+A LabelResolver walks the tree a single time and looks every jump up in stacks of the open loops and of the open
+statements per label, so resolving a jump takes constant time no matter how deeply it is nested.
+The resulting JumpTable maps every jump to the statement it leaves, keyed by the id of the jump, and lists the
+jumps that can't be resolved, so the backends neither search the enclosing statements nor check the labels.
+"""
+from __future__ import annotations
+
+from typing import Any, Optional, Union
+
+from AST import (
+    AST,
+    Assign,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+)
+from fused import FusableVisitor, run_fused
+from lexer import DustSyntaxError
+from symbols import SYMBOLS, Symbol
+
+__all__ = ["JumpTable", "LabelResolver", "resolve_labels"]
+
+Statement = Union[Block, If, While, Do]
+
+
+class JumpTable:
+    """The targets of all jumps in a Module."""
+
+    __slots__ = ("targets", "exits", "errors")
+
+    def __init__(self) -> None:
+        """Create an empty table."""
+        # the statement every jump leaves, by id of the jump, None for a hash-consed jump shared by statements
+        # with different targets, which the backends have to resolve where they meet it
+        self.targets: dict[int, Optional[Statement]] = {}
+        # the ids of the Blocks and Ifs left by a labelled break, the loops are left by jumps anyway
+        self.exits: set[int] = set()
+        self.errors: list[DustSyntaxError] = []
+
+    def target(self, node: Union[Break, Continue]) -> Optional[Statement]:
+        """
+        Look up the statement a jump leaves.
+
+        :param node: the jump
+        :return: the statement, None if it depends on where the jump is
+        """
+        return self.targets[id(node)]
+
+    def check(self) -> None:
+        """
+        Report the first jump that can't be resolved.
+
+        :return: None
+        """
+        if self.errors:
+            raise self.errors[0]
+
+
+class LabelResolver(FusableVisitor):
+    """Fill a JumpTable by visiting the statements of a Module in order, it can run fused with other visitors."""
+
+    visits = (Block, If, While, Do, Break, Continue)
+    leaves = (Block, If, While, Do)
+
+    def __init__(self) -> None:
+        """Create a resolver."""
+        self.table = JumpTable()
+        self.loops: list[Statement] = []
+        self.labelled: dict[Symbol, list[Statement]] = {}
+
+    def resolve(self, module: Module) -> JumpTable:
+        """
+        Resolve all jumps of a module.
+
+        :param module: the module
+        :return: the table of all jumps
+        """
+        run_fused(module, [self])
+        return self.table
+
+    def leave(self, node: AST) -> None:
+        """
+        Leave a statement jumps can leave.
+
+        :param node: the statement
+        :return: None
+        """
+        assert isinstance(node, (Block, If, While, Do))
+        if isinstance(node, (While, Do)):
+            self.loops.pop()
+        if node.label is not None:
+            self.labelled[node.label].pop()
+
+    def open(self, node: Statement) -> None:
+        """
+        Enter a statement jumps can leave.
+
+        :param node: the statement
+        :return: None
+        """
+        if isinstance(node, (While, Do)):
+            self.loops.append(node)
+        if node.label is not None:
+            self.labelled.setdefault(node.label, []).append(node)
+
+    def jump(self, node: Union[Break, Continue]) -> None:
+        """
+        Resolve a jump to the innermost loop or the innermost statement with its label.
+
+        :param node: the jump
+        :return: None
+        """
+        target: Optional[Statement] = None
+        if node.label is None:
+            if self.loops:
+                target = self.loops[-1]
+            else:
+                self.table.errors.append(
+                    DustSyntaxError("break or continue outside of a loop")
+                )
+        else:
+            name = SYMBOLS.name(node.label)
+            statements = self.labelled.get(node.label)
+            if statements:
+                target = statements[-1]
+                if isinstance(node, Continue) and not isinstance(target, (While, Do)):
+                    self.table.errors.append(
+                        DustSyntaxError(f"can't continue {name!r}, it is not a loop")
+                    )
+                elif isinstance(target, (Block, If)):
+                    self.table.exits.add(id(target))
+            else:
+                self.table.errors.append(
+                    DustSyntaxError(f"no enclosing statement is labelled {name!r}")
+                )
+        targets = self.table.targets
+        key = id(node)
+        if key in targets and targets[key] is not target:
+            targets[key] = None
+        else:
+            targets[key] = target
+
+    def visit_AST(self, node: AST, *args: Any, **kwargs: Any) -> Any:
+        """Refuse nodes the resolver doesn't know."""
+        raise TypeError(f"can't resolve labels in {type(node).__name__}")
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Skip a module, its statements are visited on their own."""
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Enter a block."""
+        self.open(node)
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Enter an if statement."""
+        self.open(node)
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Enter a while loop."""
+        self.open(node)
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Enter a do loop."""
+        self.open(node)
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """Resolve a break."""
+        self.jump(node)
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """Resolve a continue."""
+        self.jump(node)
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Skip an assignment, it holds no jumps."""
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Skip a print statement, it holds no jumps."""
+
+    def visit_Name(self, node: Name, *args: Any, **kwargs: Any) -> Any:
+        """Skip an expression, it holds no jumps."""
+
+    def visit_Constant(self, node: Constant, *args: Any, **kwargs: Any) -> Any:
+        """Skip an expression, it holds no jumps."""
+
+    def visit_BinOp(self, node: BinOp, *args: Any, **kwargs: Any) -> Any:
+        """Skip an expression, it holds no jumps."""
+
+    def visit_UnaryOp(self, node: UnaryOp, *args: Any, **kwargs: Any) -> Any:
+        """Skip an expression, it holds no jumps."""
+
+
+def resolve_labels(module: Module) -> JumpTable:
+    """
+    Resolve all jumps of a module.
+
+    :param module: the module
+    :return: the table of all jumps, with the errors of those that can't be resolved
+    """
+    return LabelResolver().resolve(module)
@@ -0,0 +1,116 @@
+"""
+The lexer for Dustlang.
+
+Sources are memory-mapped and tokenized lazily, so even huge generated files are lexed in constant memory.
+"""
+from __future__ import annotations
+
+import mmap
+import re
+from collections.abc import Iterator
+from typing import NamedTuple, Union
+
+__all__ = [
+    "KEYWORDS",
+    "PUNCTUATION",
+    "DustSyntaxError",
+    "Token",
+    "tokenize",
+    "tokenize_file",
+]
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+KEYWORDS = frozenset({"if", "else", "while", "do", "break", "continue", "print"})
+PUNCTUATION = frozenset(
+    {"{", "}", "(", ")", ":", ";", "=", "!", "+", "-", "*", "/", "%"}
+    | {"==", "!=", "<", "<=", ">", ">=", "&&", "||"}
+)
+
+_TOKEN_RE = re.compile(
+    rb"""
+      (?P<SKIP>[ \t\r]+|//[^\n]*)
+    | (?P<NEWLINE>\n)
+    | (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<INT>[0-9]+)
+    | (?P<PUNCT>[=!<>]=|&&|\|\||[-{}():;=!<>+*/%])
+    """,
+    re.VERBOSE,
+)
+
+
+class DustSyntaxError(SyntaxError):
+    """Raised for any malformed Dust source, both by the lexer and the parser."""
+
+
+class Token(NamedTuple):
+    """
+    A single token.
+
+    For keywords and punctuation the kind is the text itself, everything else is either "IDENT", "INT" or "EOF".
+    """
+
+    kind: str
+    text: str
+    offset: int
+    line: int
+    column: int
+
+
+def tokenize(buffer: Buffer, filename: str = "<unknown>") -> Iterator[Token]:
+    """
+    Lazily split a buffer into tokens.
+
+    The buffer is never copied as a whole, only the text of each individual token is.
+
+    :param buffer: anything supporting the buffer protocol, usually an mmap
+    :param filename: the name used in error messages
+    :return: an iterator of tokens, always ending in an "EOF" token
+    """
+    match = _TOKEN_RE.match
+    size = len(buffer)
+    pos = 0
+    line = 1
+    line_start = 0
+    while pos < size:
+        m = match(buffer, pos)
+        if m is None:
+            column = pos - line_start + 1
+            raise DustSyntaxError(
+                f"unexpected character {bytes(buffer[pos:pos + 1])!r}",
+                (filename, line, column, None),
+            )
+        group = m.lastgroup
+        end = m.end()
+        if group == "NEWLINE":
+            line += 1
+            line_start = end
+        elif group != "SKIP":
+            text = m.group().decode("ascii")
+            if group == "NAME":
+                kind = text if text in KEYWORDS else "IDENT"
+            elif group == "INT":
+                kind = "INT"
+            else:
+                kind = text
+            yield Token(kind, text, pos, line, pos - line_start + 1)
+        pos = end
+    yield Token("EOF", "", pos, line, pos - line_start + 1)
+
+
+def tokenize_file(path: str) -> Iterator[Token]:
+    """
+    Memory-map a file and lazily tokenize it.
+
+    The mapping is released once the iterator is exhausted or closed.
+
+    :param path: the path of the Dust source
+    :return: an iterator of tokens, always ending in an "EOF" token
+    """
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            # mmap refuses to map empty files
+            yield from tokenize(b"", path)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from tokenize(buffer, path)
@@ -0,0 +1,102 @@
+"""
+Loop nests of Dust Modules, found in their CFGs.
+
+A back edge is an edge to a block dominating its source, the block it leads to is the header of a natural loop made
+of the blocks that reach the back edge without passing the header.
+Dust has no goto, so every loop of the CFG comes from a While or Do statement and its header is the block continue
+jumps to, entered from outside the loop through a single preheader: the block holding the statements before the loop.
+"""
+from __future__ import annotations
+
+from typing import Optional, Union
+
+from AST import Do, While
+from cfg import CFG
+from ssa import Dominators
+
+__all__ = ["Loop", "find_loops"]
+
+
+class Loop:
+    """A natural loop and its place in the loop nest."""
+
+    __slots__ = (
+        "header",
+        "statement",
+        "blocks",
+        "preheader",
+        "parent",
+        "children",
+        "depth",
+    )
+
+    def __init__(
+        self, header: int, statement: Union[While, Do], blocks: set[int], preheader: int
+    ):
+        """
+        Create a loop.
+
+        :param header: the block the back edges lead to
+        :param statement: the While or Do statement
+        :param blocks: the blocks of the loop, including the header and those of inner loops
+        :param preheader: the only block outside the loop jumping to its header
+        """
+        self.header = header
+        self.statement = statement
+        self.blocks = blocks
+        self.preheader = preheader
+        self.parent: Optional[Loop] = None
+        self.children: list[Loop] = []
+        self.depth = 1
+
+    def __repr__(self) -> str:
+        """
+        Describe the loop for debugging.
+
+        :return: its statement, header and size
+        """
+        return f"<{type(self.statement).__name__} loop at {self.header}, {len(self.blocks)} blocks>"
+
+
+def find_loops(
+    cfg: CFG, dominators: Dominators, predecessors: list[list[int]]
+) -> list[Loop]:
+    """
+    Find the loop nest of a CFG.
+
+    :param cfg: the CFG
+    :param dominators: its dominators
+    :param predecessors: the reachable predecessors of every block
+    :return: all loops with reachable headers, every loop after the loops nested in it
+    """
+    loops: list[Loop] = []
+    # the innermost loop holding every block, found innermost first as headers come after the headers around them
+    innermost: dict[int, Loop] = {}
+    headers = [block for block in dominators.order if block in cfg.headers]
+    for header in reversed(headers):
+        latches = [p for p in predecessors[header] if dominators.dominates(header, p)]
+        if not latches:
+            # every iteration leaves through a jump
+            continue
+        blocks = {header}
+        stack = latches
+        while stack:
+            block = stack.pop()
+            if block not in blocks:
+                blocks.add(block)
+                stack.extend(predecessors[block])
+        entries = [p for p in predecessors[header] if p not in blocks]
+        assert len(entries) == 1, "loops are only entered through their preheader"
+        loop = Loop(header, cfg.headers[header], blocks, entries[0])
+        for block in blocks:
+            inner = innermost.get(block)
+            if inner is None:
+                innermost[block] = loop
+            elif inner.parent is None and inner is not loop:
+                inner.parent = loop
+                loop.children.append(inner)
+        loops.append(loop)
+    for loop in reversed(loops):
+        if loop.parent is not None:
+            loop.depth = loop.parent.depth + 1
+    return loops
@@ -2,8 +2,107 @@
 Main Module of the interpreter/compiler.
 
 This orchestrates the entire project.
+Only the modules of the requested phases are imported: checking files never loads a backend, and each backend only
+loads itself, which keeps the fixed cost of every invocation low.
 """
+from __future__ import annotations
+
 import argparse
+import sys
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Optional
+
+from frontend import caches_for, describe, find_sources, parse_sources
+from lexer import DustSyntaxError
+from options import add_arguments, check_files
+
+if TYPE_CHECKING:
+    from AST import Module
+    from cache import Cache
+    from watch import WatchedFile
+
+
+def compiler(
+    arguments: argparse.Namespace,
+) -> Optional[tuple[Callable[[Module, str], Any], Callable[[Any], object]]]:
+    """
+    Load the compiler and the runtime of the backend that was asked for, for watch mode.
+
+    :param arguments: the parsed command line
+    :return: a function compiling a module of a source and one running what it returns, None if only checking
+    """
+    if arguments.compile:
+        import codegen
+
+        return codegen.compile_module, codegen.run
+    if arguments.interpret:
+        import bytecode
+        import vm
+
+        return lambda module, path: bytecode.compile_module(module), vm.run
+    return None
+
+
+def rebuild(arguments: argparse.Namespace, file: WatchedFile) -> None:
+    """
+    Recompile and rerun a watched file after its content changed.
+
+    :param arguments: the parsed command line
+    :param file: the changed file
+    :return: None
+    """
+    import time
+
+    selected = compiler(arguments)
+    start = time.perf_counter()
+    try:
+        module = file.module()
+        if arguments.optimize:
+            from optimize import optimize
+
+            module = optimize(module)
+        if selected is not None:
+            file.artefact = selected[0](module, file.path)
+    except DustSyntaxError as e:
+        print(describe(file.path, e), file=sys.stderr)
+        return
+    print(
+        f"{file.path}: rebuilt in {(time.perf_counter() - start) * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    if selected is None:
+        return
+    # both backends raise the runtime errors of the vm, so it is loaded already
+    from vm import DustRuntimeError
+
+    try:
+        selected[1](file.artefact)
+    except DustRuntimeError as e:
+        print(f"{file.path}: {e}", file=sys.stderr)
+
+
+def backend(arguments: argparse.Namespace) -> Optional[Callable[[str, Cache], object]]:
+    """
+    Load the backend that was asked for.
+
+    :param arguments: the parsed command line
+    :return: a function compiling and running a source with the help of its cache, None if only checking the sources
+    """
+    if arguments.compile:
+        import codegen
+        from cache import load_python
+
+        return lambda path, cache: codegen.run(
+            load_python(path, cache, arguments.optimize)
+        )
+    if arguments.interpret:
+        import vm
+        from cache import load_bytecode
+
+        return lambda path, cache: vm.run(
+            load_bytecode(path, cache, arguments.optimize)
+        )
+    return None
 
 
 def main() -> None:
@@ -12,11 +111,55 @@ def main() -> None:
 
     :return:
     """
-    args = argparse.ArgumentParser("--compile")
-    args.add_argument("--interpret")
-    args.add_argument("FILE", type=argparse.FileType("r"))
+    args = argparse.ArgumentParser()
+    add_arguments(args)
     arguments = args.parse_args()
-    print(arguments)
+    if arguments.serve is not None:
+        from client import DEFAULT_SOCKET
+        from server import CompileServer
+
+        try:
+            CompileServer(
+                arguments.serve or DEFAULT_SOCKET, arguments.jobs, add_arguments
+            ).serve_forever()
+        except KeyboardInterrupt:
+            return
+        except OSError as e:
+            sys.exit(f"can't start the compile server: {e}")
+    check_files(args, arguments.FILE)
+
+    paths = find_sources(arguments.FILE)
+    if not paths:
+        sys.exit("no Dust sources found")
+    if arguments.watch:
+        from watch import watch
+
+        try:
+            watch(paths, lambda file: rebuild(arguments, file))
+        except KeyboardInterrupt:
+            return
+    caches = caches_for(paths)
+    try:
+        errors = parse_sources(caches, arguments.jobs)
+        if errors:
+            sys.exit("\n".join(describe(path, error) for path, error in errors))
+        run = backend(arguments)
+        if run is None:
+            return
+        from vm import DustRuntimeError
+
+        for path, cache in caches.items():
+            try:
+                run(path, cache)
+            except DustSyntaxError as e:
+                sys.exit(describe(path, e))
+            except DustRuntimeError as e:
+                sys.exit(f"{path}: {e}")
+    finally:
+        for cache in dict.fromkeys(caches.values()):
+            if arguments.stats:
+                print(f"{cache.directory}:\n{cache.report()}", file=sys.stderr)
+            cache.save_index()
 
 
 if __name__ == "__main__":
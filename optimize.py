@@ -0,0 +1,790 @@
+"""
+The middle end, optimising Modules between the parser and the backends.
+
+A Module is lowered to the SSA form of ssa.py, a PassManager runs the passes on it until none of them changes
+anything, and the result is turned back into a Module, so both backends work on optimised trees without knowing
+about SSA.
+Constant expressions and the statements that can never run are removed from the Module before it is lowered, see
+fold.py, so building the SSA form and every pass only deal with code that may run.
+
+Passes ask the PassManager for the analyses they need, which are computed once and cached until a pass changes
+the function and doesn't declare them preserved.
+Phis stay where build_ssa put them even once nothing uses them: they tell which version a variable holds after a
+join point, which copy propagation relies on.
+
+The SSA form holds a phi at every loop header for every variable assigned in the loop, so its size, and the time
+every pass takes, grows with the product of how deeply loops are nested and how many variables they assign: a nest
+of 1,000 While loops with a counter each makes a million phis.
+Modules nesting loops deeper than LOOP_DEPTH_LIMIT are therefore only folded.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, ClassVar, Generic, Optional, TypeVar, Union
+
+from AST import AST, Assign, BinOp, Constant, Do, Expr, Module, Name, UnaryOp, While
+from fold import fold_constants
+from loops import Loop, find_loops
+from ssa import (
+    ASSIGN,
+    BRANCH,
+    CONSTANT,
+    PHI,
+    PRINT,
+    UNDEFINED,
+    SSAFunction,
+    Value,
+    build_ssa,
+    evaluate,
+    rewrite,
+)
+
+__all__ = [
+    "LOOP_DEPTH_LIMIT",
+    "PIPELINE",
+    "SCALAR_PIPELINE",
+    "UNSWITCH_LIMIT",
+    "Analysis",
+    "ConstantPropagation",
+    "CopyPropagation",
+    "DeadCodeElimination",
+    "DefUse",
+    "LivePhis",
+    "LoopInvariantCodeMotion",
+    "LoopNest",
+    "LoopUnswitching",
+    "MaybeUndefined",
+    "Pass",
+    "PassManager",
+    "loop_depth",
+    "may_fail",
+    "optimize",
+]
+
+T = TypeVar("T")
+
+
+class Analysis(ABC, Generic[T]):
+    """A fact about an SSAFunction, computed on demand and cached by the PassManager."""
+
+    @abstractmethod
+    def compute(self, function: SSAFunction, manager: PassManager) -> T:
+        """
+        Analyse a function.
+
+        :param function: the function
+        :param manager: the pass manager, to get other analyses from
+        :return: the result
+        """
+
+
+class Pass(ABC):
+    """A transformation of an SSAFunction."""
+
+    # the analyses that stay valid when the pass changes the function
+    preserves: ClassVar[frozenset[type[Analysis[Any]]]] = frozenset()
+
+    @abstractmethod
+    def run(self, function: SSAFunction, manager: PassManager) -> bool:
+        """
+        Transform a function in place.
+
+        :param function: the function
+        :param manager: the pass manager, to get analyses from
+        :return: if the function changed
+        """
+
+
+class PassManager:
+    """Run passes on an SSAFunction until they reach a fixed point, caching the analyses they use."""
+
+    def __init__(self, passes: list[Pass], max_rounds: int = 10):
+        """
+        Create a pass manager.
+
+        :param passes: the passes, run in order
+        :param max_rounds: how many times the passes are run at most
+        """
+        self.passes = passes
+        self.max_rounds = max_rounds
+        self.function: Optional[SSAFunction] = None
+        self.results: dict[type[Analysis[Any]], Any] = {}
+        # per analysis how often it was computed, per pass how often it ran and changed the function
+        self.computed: dict[str, int] = {}
+        self.changed: dict[str, list[int]] = {}
+
+    def get(self, analysis: type[Analysis[T]]) -> T:
+        """
+        Get the result of an analysis of the current function, computing it if it is not cached.
+
+        :param analysis: the analysis
+        :return: its result
+        """
+        if analysis in self.results:
+            result: T = self.results[analysis]
+            return result
+        assert self.function is not None
+        result = analysis().compute(self.function, self)
+        self.results[analysis] = result
+        name = analysis.__name__
+        self.computed[name] = self.computed.get(name, 0) + 1
+        return result
+
+    def invalidate(
+        self, preserved: frozenset[type[Analysis[Any]]] = frozenset()
+    ) -> None:
+        """
+        Drop cached analyses after the function changed.
+
+        :param preserved: the analyses that are still valid
+        :return: None
+        """
+        self.results = {
+            analysis: result
+            for analysis, result in self.results.items()
+            if analysis in preserved
+        }
+
+    def run(self, function: SSAFunction) -> bool:
+        """
+        Run the passes on a function until none of them changes it.
+
+        :param function: the function
+        :return: if any pass changed it
+        """
+        self.function = function
+        self.invalidate()
+        changed = False
+        for _ in range(self.max_rounds):
+            round_changed = False
+            for transformation in self.passes:
+                name = type(transformation).__name__
+                counts = self.changed.setdefault(name, [0, 0])
+                counts[0] += 1
+                if transformation.run(function, self):
+                    counts[1] += 1
+                    self.invalidate(transformation.preserves)
+                    round_changed = True
+            if not round_changed:
+                break
+            changed = True
+        self.function = None
+        self.invalidate()
+        return changed
+
+    def report(self) -> str:
+        """
+        Describe what the passes did.
+
+        :return: one line per pass and analysis
+        """
+        lines = [
+            f"{name:24} ran {runs} times, changed the function {changes} times"
+            for name, (runs, changes) in self.changed.items()
+        ]
+        lines.extend(
+            f"{name:24} computed {count} times" for name, count in self.computed.items()
+        )
+        return "\n".join(lines)
+
+
+class DefUse(Analysis[dict[Value, list[Value]]]):
+    """The users of every Value: the Values having it as an operand, once per use."""
+
+    def compute(
+        self, function: SSAFunction, manager: PassManager
+    ) -> dict[Value, list[Value]]:
+        """
+        Collect the users of all Values.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: the users of every Value that has some
+        """
+        users: dict[Value, list[Value]] = {}
+        for value in function.values():
+            for operand in value.operands:
+                users.setdefault(operand, []).append(value)
+        return users
+
+
+class MaybeUndefined(Analysis[set[Value]]):
+    """The Values that may stand for a variable that was never assigned, reading which fails at runtime."""
+
+    def compute(self, function: SSAFunction, manager: PassManager) -> set[Value]:
+        """
+        Find the UNDEFINED Values and the phis they flow into.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: the Values that may be undefined
+        """
+        users = manager.get(DefUse)
+        undefined: set[Value] = set()
+        work = list(function.undefined.values())
+        while work:
+            value = work.pop()
+            if value not in undefined:
+                undefined.add(value)
+                work.extend(u for u in users.get(value, ()) if u.kind == PHI)
+        return undefined
+
+
+class LivePhis(Analysis[set[Value]]):
+    """The phis whose value is read, directly or through other phis, by an instruction or a branch."""
+
+    def compute(self, function: SSAFunction, manager: PassManager) -> set[Value]:
+        """
+        Mark the phis from their users.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: the live phis
+        """
+        live: set[Value] = set()
+        work = [
+            operand
+            for value in function.values()
+            if value.kind != PHI
+            for operand in value.operands
+            if operand.kind == PHI
+        ]
+        while work:
+            phi = work.pop()
+            if phi not in live:
+                live.add(phi)
+                work.extend(o for o in phi.operands if o.kind == PHI)
+        return live
+
+
+class LoopNest(Analysis[list[Loop]]):
+    """The loops of the CFG, which no pass changes, every loop after the loops nested in it."""
+
+    def compute(self, function: SSAFunction, manager: PassManager) -> list[Loop]:
+        """
+        Find the natural loops.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: the loops
+        """
+        return find_loops(function.cfg, function.dominators, function.predecessors)
+
+
+def may_fail(value: Value, undefined: set[Value]) -> bool:
+    """
+    Check if evaluating the expression of an assignment or a branch may fail at runtime.
+
+    :param value: the ASSIGN or BRANCH Value
+    :param undefined: the Values that may be undefined
+    :return: if it may divide by zero or read an undefined variable
+    """
+    if value.constant is not None:
+        return False
+    if any(operand in undefined for operand in value.operands):
+        return True
+    expr = value.node.value if isinstance(value.node, Assign) else value.node
+    assert isinstance(expr, Expr)
+    stack = [rewrite(expr, iter(value.operands))]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinOp):
+            if node.op in ("/", "%") and not (
+                isinstance(node.right, Constant) and node.right.value
+            ):
+                return True
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+    return False
+
+
+# the lattice of constant propagation: TOP until anything is known, an int, or BOTTOM if not a constant
+TOP = "top"
+BOTTOM = "bottom"
+Lattice = Union[int, str]
+
+
+def fold(expr: Expr, operands: list[Lattice], position: int) -> tuple[Lattice, int]:
+    """
+    Evaluate an expression in the lattice of constant propagation.
+
+    :param expr: the expression
+    :param operands: the lattice values of the operands of its Value
+    :param position: the index of the operand of the first Name in expr
+    :return: its lattice value and the index of the operand after its Names
+    """
+    if isinstance(expr, Name):
+        return operands[position], position + 1
+    if isinstance(expr, Constant):
+        return expr.value, position
+    if isinstance(expr, UnaryOp):
+        value, position = fold(expr.operand, operands, position)
+        if isinstance(value, int):
+            value = -value if expr.op == "-" else int(not value)
+        return value, position
+    assert isinstance(expr, BinOp)
+    left, position = fold(expr.left, operands, position)
+    right, position = fold(expr.right, operands, position)
+    if expr.op in ("&&", "||"):
+        if isinstance(left, int):
+            if bool(left) == (expr.op == "||"):
+                return int(bool(left)), position
+            return (int(bool(right)) if isinstance(right, int) else right), position
+        return left, position
+    if left == BOTTOM or right == BOTTOM:
+        return BOTTOM, position
+    if left == TOP or right == TOP:
+        return TOP, position
+    assert isinstance(left, int) and isinstance(right, int)
+    result = evaluate(expr.op, left, right)
+    # an operation failing at runtime has no value
+    return (BOTTOM if result is None else result), position
+
+
+class ConstantPropagation(Pass):
+    """
+    Find the Values that are constant and replace their uses by CONSTANT Values.
+
+    Phis are evaluated optimistically, so loop variables that never change are found too.
+    """
+
+    preserves = frozenset({MaybeUndefined, LoopNest})
+
+    def run(self, function: SSAFunction, manager: PassManager) -> bool:
+        """
+        Propagate constants with a worklist over the users of every Value.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: if any use was replaced
+        """
+        users = manager.get(DefUse)
+        lattice: dict[Value, Lattice] = {}
+
+        def get(value: Value) -> Lattice:
+            if value.kind == CONSTANT:
+                assert value.constant is not None
+                return value.constant
+            if value.kind == UNDEFINED:
+                return BOTTOM
+            return lattice.get(value, TOP)
+
+        # popped in reverse postorder first, so most operands are known before their users
+        work = [v for v in function.values() if v.kind in (PHI, ASSIGN)]
+        work.reverse()
+        queued = set(work)
+        while work:
+            value = work.pop()
+            queued.discard(value)
+            if value.kind == PHI:
+                result: Lattice = TOP
+                for operand in value.operands:
+                    known = get(operand)
+                    if known == TOP:
+                        continue
+                    if result == TOP:
+                        result = known
+                    elif result != known:
+                        result = BOTTOM
+                        break
+            elif value.constant is not None:
+                result = value.constant
+            else:
+                assert isinstance(value.node, Assign)
+                operands = [get(operand) for operand in value.operands]
+                result, _ = fold(value.node.value, operands, 0)
+            if result != get(value):
+                lattice[value] = result
+                for user in users.get(value, ()):
+                    if user.kind in (PHI, ASSIGN) and user not in queued:
+                        queued.add(user)
+                        work.append(user)
+
+        constants: dict[int, Value] = {}
+        changed = False
+        for value in function.values():
+            if value.kind == PHI:
+                # phis merge versions of one variable, which the Module doesn't spell out
+                continue
+            known = get(value) if value.kind == ASSIGN else TOP
+            if isinstance(known, int) and value.constant is None:
+                value.constant = known
+                # the assignment doesn't read anything anymore
+                value.operands = []
+                changed = True
+                continue
+            for index, operand in enumerate(value.operands):
+                known = get(operand)
+                if isinstance(known, int) and operand.kind != CONSTANT:
+                    constant = constants.get(known)
+                    if constant is None:
+                        constant = constants[known] = Value(
+                            CONSTANT, None, -1, None, [], known
+                        )
+                    value.operands[index] = constant
+                    changed = True
+        return changed
+
+
+class CopyPropagation(Pass):
+    """
+    Replace the uses of copies by the Values they copy.
+
+    A copy is an assignment of a variable to another one, or a phi whose operands other than itself are all the same
+    Value.
+    Uses can only be replaced by a Value of another variable where that variable still holds it, which is checked
+    while walking the dominator tree with the current version of every variable.
+    """
+
+    preserves = frozenset({MaybeUndefined, LoopNest})
+
+    def run(self, function: SSAFunction, manager: PassManager) -> bool:
+        """
+        Propagate copies in a single walk over the dominator tree.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: if any use was replaced
+        """
+        canonical: dict[Value, Value] = {}
+
+        def resolve(value: Value) -> Value:
+            # the Value a trivial phi always holds, following chains of them
+            seen = []
+            while value.kind == PHI and value not in canonical:
+                seen.append(value)
+                sources = {
+                    o for o in value.operands if o is not value and o not in seen
+                }
+                if len(sources) != 1:
+                    break
+                value = sources.pop()
+            result = canonical.get(value, value)
+            for phi in seen:
+                canonical[phi] = result
+            return result
+
+        def copied(value: Value) -> Optional[Value]:
+            if value.kind == ASSIGN and value.constant is None:
+                assert isinstance(value.node, Assign)
+                if isinstance(value.node.value, Name):
+                    operand = value.operands[0]
+                    return None if operand.kind == CONSTANT else operand
+            if value.kind == PHI:
+                source = resolve(value)
+                return None if source is value else source
+            return None
+
+        versions: dict[str, list[Value]] = {}
+        pushed: list[list[str]] = [[] for _ in range(len(function.cfg))]
+        changed = False
+
+        def propagate(value: Value) -> None:
+            nonlocal changed
+            for index, operand in enumerate(value.operands):
+                best = operand
+                candidate = copied(operand)
+                while candidate is not None:
+                    assert candidate.variable is not None
+                    current = function.version(candidate.variable, versions)
+                    if resolve(current) is resolve(candidate):
+                        best = candidate
+                    candidate = copied(candidate)
+                if best is not operand:
+                    value.operands[index] = best
+                    changed = True
+
+        def define(value: Value) -> None:
+            assert value.variable is not None
+            versions.setdefault(value.variable, []).append(value)
+            pushed[value.block].append(value.variable)
+
+        for entering, block in function.dominators.preorder():
+            if not entering:
+                for variable in pushed[block]:
+                    versions[variable].pop()
+                continue
+            for phi in function.phis[block]:
+                define(phi)
+            for value in function.instructions[block]:
+                propagate(value)
+                if value.kind == ASSIGN:
+                    define(value)
+            branch = function.branches[block]
+            if branch is not None:
+                propagate(branch)
+        return changed
+
+
+class DeadCodeElimination(Pass):
+    """
+    Remove the assignments nothing reads.
+
+    Printing and branching are live, and so are assignments that may fail at runtime: those dividing by anything
+    but a nonzero constant and those reading a variable that may be undefined.
+    """
+
+    preserves = frozenset({MaybeUndefined, LoopNest})
+
+    def run(self, function: SSAFunction, manager: PassManager) -> bool:
+        """
+        Mark the live Values from the roots and sweep the others.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: if any assignment was removed
+        """
+        undefined = manager.get(MaybeUndefined)
+        live: set[Value] = set()
+        work = [
+            value
+            for value in function.values()
+            if value.kind in (PRINT, BRANCH)
+            or (value.kind == ASSIGN and may_fail(value, undefined))
+        ]
+        live.update(work)
+        while work:
+            for operand in work.pop().operands:
+                if operand not in live:
+                    live.add(operand)
+                    work.append(operand)
+        changed = False
+        for block in function.order:
+            instructions = function.instructions[block]
+            kept = [v for v in instructions if v in live or v.kind != ASSIGN]
+            if len(kept) != len(instructions):
+                function.instructions[block] = kept
+                changed = True
+        return changed
+
+
+class LoopInvariantCodeMotion(Pass):
+    """
+    Hoist assignments computing the same value in every iteration out of While and Do loops.
+
+    An assignment moves to the preheader of a loop if its operands are defined outside the loop, it can't fail, it
+    is the only assignment to its variable in the loop, and all reads of the variable from the header on read either
+    its value or assignments after the loop.
+    Then assigning the variable before the loop changes nothing, even if the loop never gets to the assignment.
+    Inner loops go first, so an assignment can leave several loops at once.
+    """
+
+    preserves = frozenset({LoopNest})
+
+    def run(self, function: SSAFunction, manager: PassManager) -> bool:
+        """
+        Hoist the invariant assignments of every loop.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: if any assignment moved
+        """
+        undefined = manager.get(MaybeUndefined)
+        phis = manager.get(LivePhis)
+        # the versions every variable is read as, with the blocks they are read in
+        reads: dict[str, list[tuple[int, Value]]] = {}
+        for block in function.order:
+            uses = [o for v in function.instructions[block] for o in v.operands]
+            branch = function.branches[block]
+            if branch is not None:
+                uses.extend(branch.operands)
+            # the operands of phis are read at the end of the predecessors
+            for successor in function.cfg.successors(block):
+                index = function.predecessors[successor].index(block)
+                uses.extend(
+                    phi.operands[index]
+                    for phi in function.phis[successor]
+                    if phi in phis
+                )
+            for operand in uses:
+                if operand.variable is not None:
+                    reads.setdefault(operand.variable, []).append((block, operand))
+        changed = False
+        for loop in manager.get(LoopNest):
+            if self.hoist(function, loop, undefined, reads):
+                changed = True
+        return changed
+
+    @staticmethod
+    def hoist(
+        function: SSAFunction,
+        loop: Loop,
+        undefined: set[Value],
+        reads: dict[str, list[tuple[int, Value]]],
+    ) -> bool:
+        """
+        Hoist the invariant assignments of a loop.
+
+        :param function: the function
+        :param loop: the loop
+        :param undefined: the Values that may be undefined
+        :param reads: the versions every variable is read as, with the blocks they are read in
+        :return: if any assignment moved
+        """
+        blocks = loop.blocks
+        dominates = function.dominators.dominates
+        header = loop.header
+        assigned: dict[str, int] = {}
+        order = sorted(blocks, key=function.dominators.number.__getitem__)
+        for block in order:
+            for value in function.instructions[block]:
+                if value.kind == ASSIGN:
+                    assert value.variable is not None
+                    assigned[value.variable] = assigned.get(value.variable, 0) + 1
+
+        moved = False
+        entry = function.predecessors[loop.header].index(loop.preheader)
+        for block in order:
+            for value in list(function.instructions[block]):
+                variable = value.variable
+                if (
+                    variable is None
+                    or assigned[variable] != 1
+                    or any(
+                        o.kind != CONSTANT and o.block in blocks for o in value.operands
+                    )
+                    or may_fail(value, undefined)
+                    or any(
+                        read is not value
+                        and dominates(header, where)
+                        and (
+                            read.kind != ASSIGN
+                            or read.block in blocks
+                            or not dominates(header, read.block)
+                        )
+                        for where, read in reads.get(variable, ())
+                    )
+                ):
+                    continue
+                function.instructions[block].remove(value)
+                function.instructions[loop.preheader].append(value)
+                value.block = loop.preheader
+                function.hoisted[value] = loop.statement
+                for phi in function.phis[loop.header]:
+                    if phi.variable == variable:
+                        # the loop is entered with the hoisted value now
+                        phi.operands[entry] = value
+                moved = True
+        return moved
+
+
+class LoopUnswitching(Pass):
+    """
+    Take If statements whose condition is loop-invariant out of loops, choosing between two copies of the loop.
+
+    Each copy only holds one branch of the If, so the condition is evaluated once before the loop instead of in every
+    iteration.
+    The condition must not fail, as it is now evaluated even if the loop never reaches the If.
+    Unswitching doubles the loop, so only loops of at most UNSWITCH_LIMIT instructions are unswitched, on one If
+    each, and each If in the outermost loop it is invariant in.
+    The copies are only made by SSAFunction.to_module, optimize unswitches them further in another round.
+    """
+
+    preserves = frozenset({DefUse, MaybeUndefined, LivePhis, LoopNest})
+
+    def run(self, function: SSAFunction, manager: PassManager) -> bool:
+        """
+        Pick the If every loop is unswitched on.
+
+        :param function: the function
+        :param manager: the pass manager
+        :return: if any loop is unswitched
+        """
+        undefined = manager.get(MaybeUndefined)
+        unswitched = {id(statement) for statement, _ in function.unswitched.values()}
+        changed = False
+        loops = manager.get(LoopNest)
+        for loop in reversed(loops):
+            if id(loop.statement) in function.unswitched:
+                continue
+            size = sum(len(function.instructions[block]) + 1 for block in loop.blocks)
+            if size > UNSWITCH_LIMIT:
+                continue
+            for block in sorted(
+                loop.blocks, key=function.dominators.number.__getitem__
+            ):
+                statement = function.cfg.ifs.get(block)
+                branch = function.branches[block]
+                if (
+                    statement is None
+                    or branch is None
+                    or id(statement) in unswitched
+                    or all(o.kind == CONSTANT for o in branch.operands)
+                    or any(
+                        o.kind != CONSTANT and o.block in loop.blocks
+                        for o in branch.operands
+                    )
+                    or may_fail(branch, undefined)
+                ):
+                    continue
+                function.unswitched[id(loop.statement)] = (statement, branch)
+                unswitched.add(id(statement))
+                changed = True
+                break
+        return changed
+
+
+UNSWITCH_LIMIT = 64
+# Modules nesting loops deeper than this are only folded, building and optimising their SSA form takes quadratic time
+LOOP_DEPTH_LIMIT = 64
+# unswitched loops are copied and optimised again at most this often
+UNSWITCH_ROUNDS = 4
+
+SCALAR_PIPELINE: list[type[Pass]] = [
+    ConstantPropagation,
+    CopyPropagation,
+    DeadCodeElimination,
+]
+PIPELINE: list[type[Pass]] = [
+    *SCALAR_PIPELINE,
+    LoopInvariantCodeMotion,
+    LoopUnswitching,
+]
+
+
+def loop_depth(module: Module) -> int:
+    """
+    Find how deeply loops are nested in a Module, visiting the subtrees a hash-consed Module shares only once.
+
+    :param module: the module
+    :return: the largest number of loops around a statement
+    """
+    depths: dict[int, int] = {}
+    stack: list[tuple[AST, bool]] = [(module, False)]
+    while stack:
+        node, done = stack.pop()
+        if id(node) in depths:
+            continue
+        statements = [c for c in node.children() if not isinstance(c, Expr)]
+        if not done:
+            stack.append((node, True))
+            stack.extend((statement, False) for statement in statements)
+            continue
+        inner = max((depths[id(statement)] for statement in statements), default=0)
+        depths[id(node)] = inner + isinstance(node, (While, Do))
+    return depths[id(module)]
+
+
+def optimize(module: Module, pipeline: Optional[list[type[Pass]]] = None) -> Module:
+    """
+    Optimise a Module.
+
+    Modules nesting loops deeper than LOOP_DEPTH_LIMIT are only folded, their SSA form would grow quadratically.
+
+    :param module: the module
+    :param pipeline: the passes to run, the PIPELINE by default
+    :return: the optimised module, sharing its unchanged subtrees with the original
+    """
+    module = fold_constants(module)
+    if loop_depth(module) > LOOP_DEPTH_LIMIT:
+        return module
+    for _ in range(UNSWITCH_ROUNDS):
+        function = build_ssa(module)
+        if not PassManager([p() for p in pipeline or PIPELINE]).run(function):
+            break
+        module = function.to_module()
+        if not function.unswitched:
+            break
+    return module
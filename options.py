@@ -0,0 +1,97 @@
+"""
+The command line of main.py, shared with the compile server and its client.
+
+This only needs the standard library, so the client can parse a command line like main.py without importing the
+compiler.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+
+__all__ = ["add_arguments", "check_files", "positive"]
+
+
+def positive(value: str) -> int:
+    """
+    Parse a count on the command line that must be at least 1.
+
+    :param value: the argument
+    :return: the count
+    """
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {count}")
+    return count
+
+
+def add_arguments(args: argparse.ArgumentParser) -> None:
+    """
+    Add the command line arguments, shared with the compile server.
+
+    :param args: the parser to add them to
+    :return: None
+    """
+    backend = args.add_mutually_exclusive_group()
+    backend.add_argument(
+        "--compile",
+        action="store_true",
+        help="compile every FILE to a python code object and run it",
+    )
+    backend.add_argument(
+        "--interpret",
+        action="store_true",
+        help="compile every FILE to bytecode and run it on the vm",
+    )
+    args.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="optimise every FILE in the SSA middle end before compiling it",
+    )
+    args.add_argument(
+        "--stats",
+        action="store_true",
+        help="report the hit rates of the __dustcache__ compilation cache",
+    )
+    args.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running, recompiling and rerunning every FILE whenever it changes",
+    )
+    args.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        nargs="?",
+        const="",
+        help="run a compile server for client.py on a unix socket, client.DEFAULT_SOCKET by default",
+    )
+    args.add_argument(
+        "-j",
+        "--jobs",
+        type=positive,
+        help="the number of processes parsing files in parallel, or of requests the server handles at once, "
+        "defaults to the number of cpus",
+    )
+    # Only the paths are taken here, the lexer memory-maps the files itself.
+    args.add_argument(
+        "FILE", nargs="*", help="a source file, or a directory to search for them"
+    )
+
+
+def check_files(args: argparse.ArgumentParser, paths: list[str]) -> None:
+    """
+    Report a missing or nonexistent FILE argument as a usage error.
+
+    :param args: the parser that parsed the command line
+    :param paths: the FILE arguments
+    :return: None
+    """
+    if not paths:
+        args.error("the following arguments are required: FILE")
+    for path in paths:
+        if not os.path.exists(path):
+            args.error(f"argument FILE: can't open {path!r}: no such file or directory")
@@ -1,5 +1,409 @@
 """
-This will eventually become the parser for Dustlang.
+The parser for Dustlang.
 
-Right now it is very empty...
+It is a table-driven predictive parser: every production is picked from the FIRST sets below by looking at the
+current token only (plus one more after an identifier), and nesting is tracked on an explicit stack instead of the
+Python call stack.
+This keeps parsing linear in the size of the source, no matter how deeply the blocks are nested.
+
+The grammar::
+
+    module   := stmt* EOF
+    stmt     := [IDENT ":"] compound
+              | IDENT "=" expr ";"
+              | ("break" | "continue") [IDENT] ";"
+              | "print" expr ";"
+    compound := "{" stmt* "}"
+              | "if" expr "{" stmt* "}" ["else" ("{" stmt* "}" | if)]
+              | "while" expr "{" stmt* "}"
+              | "do" "{" stmt* "}"
+
+Expressions are parsed by operator precedence, see BINARY_PRECEDENCE.
 """
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Iterator
+from typing import NoReturn, Optional, Union, cast
+
+from AST import (
+    AST,
+    Assign,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    Expr,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+)
+from lexer import DustSyntaxError, Token, tokenize, tokenize_file
+from symbols import SYMBOLS, Symbol
+
+__all__ = [
+    "BINARY_PRECEDENCE",
+    "FIRST_COMPOUND",
+    "FIRST_EXPR",
+    "FIRST_STMT",
+    "Parser",
+    "Span",
+    "parse",
+    "parse_file",
+]
+
+FIRST_COMPOUND = frozenset({"{", "if", "while", "do"})
+CONDITIONAL = frozenset({"if", "while"})
+JUMPS: dict[str, Callable[[Optional[Symbol]], AST]] = {
+    "break": Break,
+    "continue": Continue,
+}
+FIRST_STMT = FIRST_COMPOUND | JUMPS.keys() | {"print", "IDENT"}
+
+BINARY_PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "==": 3,
+    "!=": 3,
+    "<": 4,
+    "<=": 4,
+    ">": 4,
+    ">=": 4,
+    "+": 5,
+    "-": 5,
+    "*": 6,
+    "/": 6,
+    "%": 6,
+}
+UNARY_OPERATORS = frozenset({"-", "!"})
+UNARY_PRECEDENCE = 7
+FIRST_EXPR = frozenset({"IDENT", "INT", "("}) | UNARY_OPERATORS
+
+
+class Frame:
+    """A compound statement whose closing brace has not been reached yet."""
+
+    __slots__ = ("kind", "label", "condition", "body", "orelse", "token", "chained")
+
+    def __init__(
+        self,
+        kind: str,
+        label: Optional[Symbol],
+        condition: Optional[Expr],
+        token: Token,
+        chained: bool = False,
+    ):
+        """
+        Open a compound statement.
+
+        :param kind: the token that started it, see FIRST_COMPOUND
+        :param label: the symbol of its label, if any
+        :param condition: the condition of if and while statements
+        :param token: the first token of the statement, for error messages
+        :param chained: if this is the if of an "else if", which closes its parent as well
+        """
+        self.kind = kind
+        self.label = label
+        self.condition = condition
+        self.body: list[AST] = []
+        self.orelse: Optional[list[AST]] = None
+        self.token = token
+        self.chained = chained
+
+    def target(self) -> list[AST]:
+        """
+        Get the list nested statements are currently added to.
+
+        :return: the else branch once it started, the body otherwise
+        """
+        return self.body if self.orelse is None else self.orelse
+
+    def build(self) -> AST:
+        """
+        Create the node for the finished statement.
+
+        :return: the node
+        """
+        return BUILDERS[self.kind](self)
+
+
+class Span:
+    """Where a statement is in the source and in the tree."""
+
+    __slots__ = ("start", "end", "body", "index")
+
+    def __init__(self, start: int, end: int, body: list[AST], index: int):
+        """
+        Record the position of a statement.
+
+        :param start: the offset of its first token
+        :param end: the offset right after its last token
+        :param body: the list of statements holding it
+        :param index: its index in that list
+        """
+        self.start = start
+        self.end = end
+        self.body = body
+        self.index = index
+
+
+BUILDERS: dict[str, Callable[[Frame], AST]] = {
+    "{": lambda frame: Block(frame.label, frame.body),
+    "if": lambda frame: If(
+        frame.label, cast(Expr, frame.condition), frame.body, frame.orelse or []
+    ),
+    "while": lambda frame: While(frame.label, cast(Expr, frame.condition), frame.body),
+    "do": lambda frame: Do(frame.label, frame.body),
+}
+
+
+class Parser:
+    """Turn a stream of tokens into a Module in a single forward pass."""
+
+    def __init__(
+        self,
+        tokens: Iterable[Token],
+        filename: str = "<unknown>",
+        spans: Optional[dict[AST, Span]] = None,
+    ):
+        """
+        Create a parser.
+
+        :param tokens: the tokens to parse, including the final "EOF" token
+        :param filename: the name used in error messages
+        :param spans: if given, the Span of every labelled statement is recorded in here
+        """
+        self.tokens: Iterator[Token] = iter(tokens)
+        self.filename = filename
+        self.spans = spans
+        self.token = next(self.tokens)
+
+    def error(self, token: Token, message: str) -> NoReturn:
+        """
+        Raise a syntax error pointing at a token.
+
+        :param token: the offending token
+        :param message: what went wrong
+        :return: never
+        """
+        raise DustSyntaxError(message, (self.filename, token.line, token.column, None))
+
+    def unexpected(self, expected: Iterable[str]) -> NoReturn:
+        """
+        Raise a syntax error for the current token.
+
+        :param expected: the token kinds that would have been valid
+        :return: never
+        """
+        token = self.token
+        self.error(
+            token,
+            f"expected {' or '.join(map(repr, sorted(expected)))}, got {token.text or token.kind!r}",
+        )
+
+    def advance(self) -> Token:
+        """
+        Move on to the next token.
+
+        :return: the token that was current until now
+        """
+        token = self.token
+        self.token = next(self.tokens)
+        return token
+
+    def expect(self, kind: str) -> Token:
+        """
+        Consume the current token, which has to be of the given kind.
+
+        :param kind: the expected token kind
+        :return: the consumed token
+        """
+        if self.token.kind != kind:
+            self.unexpected((kind,))
+        return self.advance()
+
+    def parse(self) -> Module:
+        """
+        Parse the whole token stream.
+
+        :return: the parsed Module
+        """
+        root: list[AST] = []
+        stack: list[Frame] = []
+        body = root
+        while True:
+            token = self.token
+            kind = token.kind
+            if kind == "}":
+                if not stack:
+                    self.error(token, "unmatched '}'")
+                self.advance()
+                body = self.close(stack, root, token.offset + 1)
+                continue
+            if kind == "EOF":
+                if stack:
+                    self.error(stack[-1].token, "'{' was never closed")
+                break
+
+            label = None
+            if kind == "IDENT":
+                self.advance()
+                if self.token.kind == "=":
+                    self.advance()
+                    body.append(Assign(token.text, self.expression()))
+                    self.expect(";")
+                    continue
+                if self.token.kind != ":":
+                    self.unexpected((":", "="))
+                self.advance()
+                label = SYMBOLS.intern(token.text)
+                kind = self.token.kind
+                if kind not in FIRST_COMPOUND:
+                    self.unexpected(FIRST_COMPOUND)
+            elif kind in JUMPS:
+                self.advance()
+                target = (
+                    SYMBOLS.intern(self.advance().text)
+                    if self.token.kind == "IDENT"
+                    else None
+                )
+                body.append(JUMPS[kind](target))
+                self.expect(";")
+                continue
+            elif kind == "print":
+                self.advance()
+                body.append(Print(self.expression()))
+                self.expect(";")
+                continue
+            elif kind not in FIRST_COMPOUND:
+                self.unexpected(FIRST_STMT)
+
+            self.advance()
+            condition = self.expression() if kind in CONDITIONAL else None
+            if kind != "{":
+                self.expect("{")
+            stack.append(Frame(kind, label, condition, token))
+            body = stack[-1].body
+        return Module(root)
+
+    def close(self, stack: list[Frame], root: list[AST], end: int) -> list[AST]:
+        """
+        Handle the closing brace of the innermost compound statement.
+
+        An if statement followed by else stays open for its else branch, anything else is finished and added to its
+        parent.
+
+        :param stack: the open compound statements
+        :param root: the body of the module
+        :param end: the offset right after the closing brace
+        :return: the list following statements are added to
+        """
+        frame = stack[-1]
+        if frame.kind == "if" and frame.orelse is None and self.token.kind == "else":
+            self.advance()
+            frame.orelse = []
+            if self.token.kind == "if":
+                token = self.advance()
+                condition = self.expression()
+                self.expect("{")
+                stack.append(Frame("if", None, condition, token, chained=True))
+                return stack[-1].body
+            self.expect("{")
+            return frame.orelse
+
+        while True:
+            frame = stack.pop()
+            body = stack[-1].target() if stack else root
+            node = frame.build()
+            if self.spans is not None and frame.label is not None:
+                self.spans[node] = Span(frame.token.offset, end, body, len(body))
+            body.append(node)
+            # the if of an "else if" has no closing brace of its own, so it ends the outer if as well
+            if not frame.chained:
+                return body
+
+    def expression(self) -> Expr:
+        """
+        Parse an expression with the shunting-yard algorithm, which needs no recursion for nested expressions.
+
+        :return: the parsed expression
+        """
+        operands: list[Expr] = []
+        # pending operators as (precedence, operator), an open parenthesis has precedence 0
+        operators: list[tuple[int, str]] = []
+        depth = 0
+
+        def reduce() -> None:
+            precedence, operator = operators.pop()
+            if precedence == UNARY_PRECEDENCE:
+                operands.append(UnaryOp(operator, operands.pop()))
+            else:
+                right = operands.pop()
+                operands.append(BinOp(operands.pop(), operator, right))
+
+        while True:
+            token = self.token
+            kind = token.kind
+            if kind == "INT":
+                operands.append(Constant(int(token.text)))
+            elif kind == "IDENT":
+                operands.append(Name(token.text))
+            elif kind == "(":
+                operators.append((0, "("))
+                depth += 1
+                self.advance()
+                continue
+            elif kind in UNARY_OPERATORS:
+                operators.append((UNARY_PRECEDENCE, kind))
+                self.advance()
+                continue
+            else:
+                self.unexpected(FIRST_EXPR)
+            self.advance()
+
+            while depth and self.token.kind == ")":
+                while operators[-1][0]:
+                    reduce()
+                operators.pop()
+                depth -= 1
+                self.advance()
+
+            precedence = BINARY_PRECEDENCE.get(self.token.kind)
+            if precedence is None:
+                break
+            while operators and operators[-1][0] >= precedence:
+                reduce()
+            operators.append((precedence, self.advance().kind))
+
+        if depth:
+            self.unexpected((")",))
+        while operators:
+            reduce()
+        return operands[0]
+
+
+def parse(source: Union[str, bytes], filename: str = "<unknown>") -> Module:
+    """
+    Parse Dust source code held in memory.
+
+    :param source: the source code
+    :param filename: the name used in error messages
+    :return: the parsed Module
+    """
+    if isinstance(source, str):
+        source = source.encode()
+    return Parser(tokenize(source, filename), filename).parse()
+
+
+def parse_file(path: str) -> Module:
+    """
+    Parse a Dust source file, streaming it through the memory-mapped lexer.
+
+    :param path: the path of the source file
+    :return: the parsed Module
+    """
+    return Parser(tokenize_file(path), path).parse()
@@ -0,0 +1,326 @@
+"""
+The compile server, a warm process running Dust programs for client.py.
+
+Starting Python and importing the compiler costs far more than compiling a short script, so the server pays for it
+once and then handles requests on a Unix domain socket.
+Parsed Modules and compiled code are kept in memory, keyed by the sha256 of the source, so running the same script
+again only costs running it.
+Requests are handled by a bounded pool of threads.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import socket
+import stat
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from parser import parse
+from types import CodeType
+from typing import IO, Any, NoReturn, Optional
+
+import bytecode
+import codegen
+import vm
+from AST import Module
+from client import receive, send
+from frontend import describe
+from lexer import DustSyntaxError
+from optimize import optimize
+from vm import DustRuntimeError
+
+__all__ = ["MEMO_SIZE", "CompileServer", "Memo", "RequestExit", "RequestParser"]
+
+MEMO_SIZE = 1024
+
+
+class RequestExit(Exception):
+    """Raised instead of exiting the server when the command line of a request is invalid or asks for help."""
+
+    def __init__(self, status: int):
+        """
+        Create the exception.
+
+        :param status: the exit status for the client
+        """
+        super().__init__(status)
+        self.status = status
+
+
+class RequestParser(argparse.ArgumentParser):
+    """An argument parser writing to buffers and raising RequestExit instead of touching the process."""
+
+    def __init__(self, stdout: IO[str], stderr: IO[str], **kwargs: Any):
+        """
+        Create the parser.
+
+        :param stdout: where help goes
+        :param stderr: where usage and errors go
+        :param kwargs: passed on to ArgumentParser
+        """
+        super().__init__(**kwargs)
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def print_usage(self, file: Any = None) -> None:
+        """
+        Write the usage, to the request's stdout unless told otherwise.
+
+        :param file: where to write to
+        :return: None
+        """
+        (file or self.stdout).write(self.format_usage())
+
+    def print_help(self, file: Any = None) -> None:
+        """
+        Write the help, to the request's stdout unless told otherwise.
+
+        :param file: where to write to
+        :return: None
+        """
+        (file or self.stdout).write(self.format_help())
+
+    def error(self, message: str) -> NoReturn:
+        """
+        Report a bad command line.
+
+        :param message: what is wrong
+        :return: never
+        """
+        self.stderr.write(f"{self.format_usage()}{self.prog}: error: {message}\n")
+        raise RequestExit(2)
+
+    def exit(self, status: int = 0, message: Optional[str] = None) -> NoReturn:
+        """
+        End the request, for instance after printing the help.
+
+        :param status: the exit status
+        :param message: written to the request's stderr
+        :return: never
+        """
+        if message:
+            self.stderr.write(message)
+        raise RequestExit(status)
+
+
+def failure(path: str, error: Exception) -> str:
+    """
+    Describe an unexpected error of the compiler, which must reach the client instead of dropping the request.
+
+    :param path: the source that was being handled
+    :param error: the error
+    :return: the line for the request's stderr
+    """
+    return f"{path}: internal error: {type(error).__name__}: {error}\n"
+
+
+class Memo:
+    """A thread-safe mapping remembering a bounded number of recently used values."""
+
+    def __init__(self, size: int = MEMO_SIZE):
+        """
+        Create an empty memo.
+
+        :param size: the number of values to keep
+        """
+        self.size = size
+        self.values: OrderedDict[Any, Any] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """
+        Look up a value, computing and remembering it if it is not known.
+
+        The factory runs without holding the lock, two threads asking for the same new key may both compute it.
+
+        :param key: the key
+        :param factory: computes the value
+        :return: the value
+        """
+        with self.lock:
+            if key in self.values:
+                self.values.move_to_end(key)
+                return self.values[key]
+        value = factory()
+        with self.lock:
+            self.values[key] = value
+            if len(self.values) > self.size:
+                self.values.popitem(last=False)
+        return value
+
+
+class CompileServer:
+    """Run command lines sent by clients."""
+
+    def __init__(
+        self,
+        path: str,
+        workers: Optional[int],
+        add_arguments: Callable[[argparse.ArgumentParser], None],
+    ):
+        """
+        Create a server.
+
+        :param path: the path of the socket to listen on
+        :param workers: the number of requests handled at once, defaults to the number of cpus
+        :param add_arguments: adds the command line arguments of main.py to a parser
+        """
+        self.path = path
+        if workers is None:
+            workers = os.cpu_count() or 1
+        elif workers < 1:
+            raise ValueError(f"the number of workers must be at least 1, not {workers}")
+        self.workers = workers
+        self.add_arguments = add_arguments
+        self.modules = Memo()
+        self.code = Memo()
+
+    def serve_forever(self) -> NoReturn:
+        """
+        Listen on the socket and handle requests until the process is killed.
+
+        The socket is only accessible to the user running the server from the moment it is created.
+
+        :return: never
+        """
+        self.remove_stale_socket()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            umask = os.umask(0o077)
+            try:
+                listener.bind(self.path)
+            finally:
+                os.umask(umask)
+            listener.listen()
+            with ThreadPoolExecutor(self.workers) as pool:
+                while True:
+                    connection, _ = listener.accept()
+                    pool.submit(self.handle, connection)
+
+    def remove_stale_socket(self) -> None:
+        """
+        Remove the socket a server that is gone left behind, refusing to take over from one that still answers.
+
+        :return: None
+        """
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{self.path} exists and is not a socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.path)
+            except ConnectionRefusedError:
+                os.unlink(self.path)
+                return
+        raise FileExistsError(f"a compile server already runs on {self.path}")
+
+    def handle(self, connection: socket.socket) -> None:
+        """
+        Handle a single request.
+
+        :param connection: the connection to the client
+        :return: None
+        """
+        with connection:
+            try:
+                header = json.loads(receive(connection))
+                argv = header["argv"]
+                files = {path: receive(connection) for path in header["files"]}
+            except (OSError, ValueError, KeyError, TypeError):
+                # the client went away or sent garbage, neither should take the server down
+                return
+            status, stdout, stderr = self.execute(argv, files)
+            try:
+                send(
+                    connection,
+                    json.dumps(
+                        {"status": status, "stdout": stdout, "stderr": stderr}
+                    ).encode(),
+                )
+            except OSError:
+                # the client went away
+                pass
+
+    def module(self, path: str, source: bytes) -> tuple[bytes, Module]:
+        """
+        Get the Module of a source, parsing it only if it is not known yet.
+
+        :param path: the path of the source, for error messages
+        :param source: its content
+        :return: the digest of the source and its module
+        """
+        digest = hashlib.sha256(source).digest()
+        module: Module = self.modules.get(digest, lambda: parse(source, path))
+        return digest, module
+
+    def execute(self, argv: list[str], files: dict[str, bytes]) -> tuple[int, str, str]:
+        """
+        Run a command line like main.py would.
+
+        Any other error of the compiler fails the request like a syntax error does, with its message on stderr.
+
+        :param argv: the command line arguments
+        :param files: the content of every source, the client already expanded directories
+        :return: the exit status, stdout and stderr
+        """
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        args = RequestParser(stdout, stderr, prog="main.py")
+        self.add_arguments(args)
+        try:
+            arguments = args.parse_args(argv)
+            if arguments.watch or arguments.serve:
+                args.error("--watch and --serve can't be used through the server")
+            if not arguments.FILE:
+                args.error("the following arguments are required: FILE")
+            if not files:
+                args.error("no Dust sources found")
+        except RequestExit as e:
+            return e.status, stdout.getvalue(), stderr.getvalue()
+
+        modules = {}
+        errors = []
+        for path, source in files.items():
+            try:
+                modules[path] = self.module(path, source)
+            except DustSyntaxError as e:
+                errors.append(describe(path, e) + "\n")
+            except Exception as e:
+                errors.append(failure(path, e))
+        if errors:
+            stderr.writelines(errors)
+            return 1, stdout.getvalue(), stderr.getvalue()
+
+        for path, (digest, module) in modules.items():
+            try:
+                if arguments.optimize:
+                    module = self.modules.get(("O", digest), lambda: optimize(module))
+                if arguments.compile:
+                    code: CodeType = self.code.get(
+                        ("py", arguments.optimize, digest, path),
+                        lambda: codegen.compile_module(module, path),
+                    )
+                    codegen.run(code, stdout)
+                elif arguments.interpret:
+                    compiled: bytecode.Code = self.code.get(
+                        ("vm", arguments.optimize, digest),
+                        lambda: bytecode.compile_module(module),
+                    )
+                    vm.run(compiled, stdout)
+            except DustSyntaxError as e:
+                stderr.write(describe(path, e) + "\n")
+                return 1, stdout.getvalue(), stderr.getvalue()
+            except DustRuntimeError as e:
+                stderr.write(f"{path}: {e}\n")
+                return 1, stdout.getvalue(), stderr.getvalue()
+            except Exception as e:
+                stderr.write(failure(path, e))
+                return 1, stdout.getvalue(), stderr.getvalue()
+        return 0, stdout.getvalue(), stderr.getvalue()
@@ -0,0 +1,40 @@
+"""
+Where Dust sources and their caches are on disk.
+
+This only needs the standard library, so the client of the compile server can search sources like main.py without
+importing the compiler.
+"""
+from __future__ import annotations
+
+import os
+from collections.abc import Iterable
+
+__all__ = ["CACHE_DIRECTORY", "SOURCE_SUFFIX", "find_sources"]
+
+SOURCE_SUFFIX = ".dust"
+# every directory holding Dust sources gets one, see cache.py
+CACHE_DIRECTORY = "__dustcache__"
+
+
+def find_sources(paths: Iterable[str]) -> list[str]:
+    """
+    Expand directories to the Dust sources below them.
+
+    :param paths: files and directories, files are taken as they are
+    :return: the files, those found in a directory in sorted order
+    """
+    sources = []
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append(path)
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories[:] = sorted(
+                name for name in subdirectories if name != CACHE_DIRECTORY
+            )
+            sources += [
+                os.path.join(directory, name)
+                for name in sorted(files)
+                if name.endswith(SOURCE_SUFFIX)
+            ]
+    return sources
@@ -0,0 +1,675 @@
+"""
+Static single assignment form of Dust Modules, the intermediate representation of the middle end.
+
+build_ssa lowers the CFG of a Module: every Assign becomes a Value defining a new version of its variable, variables
+merging at join points get PHI Values, and the operands of every Value are the versions its expression reads.
+Expressions themselves are not split up, the operands of a Value are the versions read by the Names of its
+expression, in the order iter_names yields them.
+Reading a variable before it is assigned is an error at runtime, so every variable starts out as an UNDEFINED
+Value.
+
+The middle end never changes the CFG, so the dominator tree is computed once along with the SSA form.
+SSAFunction.to_module turns the optimised Values back into a Module for the backends: every operand has to be a
+constant or the version its variable holds at that point, which the passes make sure of.
+Passes moving instructions between blocks only move them to the preheader of a loop, in front of its statement.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any, Optional, Union
+
+from AST import (
+    AST,
+    Assign,
+    ASTTransformer,
+    BinOp,
+    Block,
+    Break,
+    Constant,
+    Continue,
+    Do,
+    Expr,
+    If,
+    Module,
+    Name,
+    Print,
+    UnaryOp,
+    While,
+    deserialize,
+    serialize,
+)
+from cfg import CFG, ENTRY, build_cfg
+
+__all__ = [
+    "ASSIGN",
+    "BRANCH",
+    "CONSTANT",
+    "PHI",
+    "PRINT",
+    "UNDEFINED",
+    "Dominators",
+    "SSAFunction",
+    "Value",
+    "build_ssa",
+    "evaluate",
+    "iter_names",
+    "rewrite",
+    "Splicer",
+    "Unswitcher",
+]
+
+UNDEFINED, PHI, ASSIGN, CONSTANT, PRINT, BRANCH = range(6)
+KIND_NAMES = ["undefined", "phi", "assign", "constant", "print", "branch"]
+
+
+class Value:
+    """
+    An instruction of the SSA form, most of which define a value.
+
+    PRINT and BRANCH are only there for their operands, CONSTANT Values replace operands whose value is known and
+    belong to no block.
+    """
+
+    __slots__ = ("kind", "variable", "block", "node", "operands", "constant")
+
+    def __init__(
+        self,
+        kind: int,
+        variable: Optional[str],
+        block: int,
+        node: Optional[AST],
+        operands: list[Value],
+        constant: Optional[int] = None,
+    ):
+        """
+        Create a value.
+
+        :param kind: one of the kinds above
+        :param variable: the variable a version of which is defined, None for PRINT, BRANCH and CONSTANT
+        :param block: the block holding the value, -1 for UNDEFINED and CONSTANT values
+        :param node: the Assign or Print statement, or the condition of a branch
+        :param operands: the versions read, for a PHI one per predecessor of its block
+        :param constant: the value of a CONSTANT, or of an ASSIGN once it is known
+        """
+        self.kind = kind
+        self.variable = variable
+        self.block = block
+        self.node = node
+        self.operands = operands
+        self.constant = constant
+
+    def __repr__(self) -> str:
+        """
+        Describe the value for debugging.
+
+        :return: its kind, variable and block
+        """
+        if self.kind == CONSTANT:
+            return f"<constant {self.constant}>"
+        return f"<{KIND_NAMES[self.kind]} {self.variable or ''} in {self.block}>"
+
+
+def iter_names(expr: Expr) -> Iterator[Name]:
+    """
+    Find the variables an expression reads.
+
+    :param expr: the expression
+    :return: its Names in pre-order
+    """
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Name):
+            yield node
+        else:
+            stack.extend(
+                [
+                    child
+                    for child in reversed(node.children())
+                    if isinstance(child, Expr)
+                ]
+            )
+
+
+def evaluate(op: str, left: int, right: int) -> Optional[int]:
+    """
+    Compute a binary operation like the vm does.
+
+    :param op: the operator, not && or ||, which short-circuit
+    :param left: the left operand
+    :param right: the right operand
+    :return: the result, None if the operation fails at runtime
+    """
+    if op in ("/", "%"):
+        if not right:
+            return None
+        return left // right if op == "/" else left % right
+    if op == "+":
+        return left + right
+    if op == "-":
+        return left - right
+    if op == "*":
+        return left * right
+    return int(
+        {
+            "==": left == right,
+            "!=": left != right,
+            "<": left < right,
+            "<=": left <= right,
+            ">": left > right,
+            ">=": left >= right,
+        }[op]
+    )
+
+
+def rewrite(expr: Expr, operands: Iterator[Value]) -> Expr:
+    """
+    Replace the Names of an expression by its operands and fold the parts whose values are known.
+
+    Parts that don't change are reused, folding never removes an operation that would fail at runtime.
+
+    :param expr: the expression
+    :param operands: the operands of its Value, one for every Name in pre-order
+    :return: the new expression, or expr itself if nothing changed
+    """
+    if isinstance(expr, Name):
+        operand = next(operands)
+        if operand.kind == CONSTANT:
+            assert operand.constant is not None
+            return Constant(operand.constant)
+        return expr if operand.variable == expr.id else Name(str(operand.variable))
+    if isinstance(expr, UnaryOp):
+        operand_expr = rewrite(expr.operand, operands)
+        if isinstance(operand_expr, Constant):
+            value = operand_expr.value
+            return Constant(-value if expr.op == "-" else int(not value))
+        return expr if operand_expr is expr.operand else UnaryOp(expr.op, operand_expr)
+    if isinstance(expr, BinOp):
+        left = rewrite(expr.left, operands)
+        right = rewrite(expr.right, operands)
+        if isinstance(left, Constant) and expr.op in ("&&", "||"):
+            # the right operand is not evaluated at all if the left one decides
+            if bool(left.value) == (expr.op == "||"):
+                return Constant(int(bool(left.value)))
+            if isinstance(right, Constant):
+                return Constant(int(bool(right.value)))
+        elif isinstance(left, Constant) and isinstance(right, Constant):
+            result = evaluate(expr.op, left.value, right.value)
+            if result is not None:
+                return Constant(result)
+        if left is expr.left and right is expr.right:
+            return expr
+        return BinOp(left, expr.op, right)
+    return expr
+
+
+class Dominators:
+    """The dominator tree and dominance frontiers of the reachable blocks of a CFG."""
+
+    __slots__ = ("order", "number", "idom", "children", "frontiers", "entered", "left")
+
+    def __init__(self, cfg: CFG, order: list[int], predecessors: list[list[int]]):
+        """
+        Compute the dominators with the iterative algorithm of Cooper, Harvey and Kennedy.
+
+        :param cfg: the CFG
+        :param order: its reachable blocks in reverse postorder
+        :param predecessors: the reachable predecessors of every block
+        """
+        self.order = order
+        # the index of every block in reverse postorder, -1 for unreachable blocks
+        self.number = number = [-1] * len(cfg)
+        for index, block in enumerate(order):
+            number[block] = index
+        idom = [-1] * len(cfg)
+        idom[ENTRY] = ENTRY
+        changed = True
+        while changed:
+            changed = False
+            for block in order[1:]:
+                new = -1
+                for predecessor in predecessors[block]:
+                    if idom[predecessor] == -1:
+                        continue
+                    if new == -1:
+                        new = predecessor
+                        continue
+                    # walk both up the tree until they meet
+                    other = predecessor
+                    while new != other:
+                        while number[new] > number[other]:
+                            new = idom[new]
+                        while number[other] > number[new]:
+                            other = idom[other]
+                if idom[block] != new:
+                    idom[block] = new
+                    changed = True
+        self.idom = idom
+        self.children: list[list[int]] = [[] for _ in range(len(cfg))]
+        for block in order[1:]:
+            self.children[idom[block]].append(block)
+        self.frontiers: list[list[int]] = [[] for _ in range(len(cfg))]
+        for block in order:
+            if len(predecessors[block]) < 2:
+                continue
+            for predecessor in predecessors[block]:
+                runner = predecessor
+                while runner != idom[block]:
+                    if (
+                        not self.frontiers[runner]
+                        or self.frontiers[runner][-1] != block
+                    ):
+                        self.frontiers[runner].append(block)
+                    runner = idom[runner]
+        # when the walk over the dominator tree enters and leaves every block, a dominates b if the walk is inside a
+        # when it enters b
+        self.entered = [-1] * len(cfg)
+        self.left = [-1] * len(cfg)
+        for step, (entering, block) in enumerate(self.preorder()):
+            if entering:
+                self.entered[block] = step
+            else:
+                self.left[block] = step
+
+    def dominates(self, a: int, b: int) -> bool:
+        """
+        Check if every path from ENTRY to a block passes through another one.
+
+        :param a: the dominating block
+        :param b: the dominated block
+        :return: if a dominates b, every reachable block dominates itself
+        """
+        return self.entered[a] <= self.entered[b] and self.left[b] <= self.left[a]
+
+    def preorder(self) -> Iterator[tuple[bool, int]]:
+        """
+        Walk the dominator tree.
+
+        :return: (True, block) when entering a block and (False, block) when leaving it, children in between
+        """
+        stack = [(True, ENTRY)]
+        while stack:
+            entering, block = stack.pop()
+            yield entering, block
+            if entering:
+                stack.append((False, block))
+                stack.extend((True, child) for child in reversed(self.children[block]))
+
+
+class SSAFunction:
+    """A Module in SSA form."""
+
+    __slots__ = (
+        "module",
+        "cfg",
+        "order",
+        "predecessors",
+        "dominators",
+        "phis",
+        "instructions",
+        "branches",
+        "undefined",
+        "hoisted",
+        "unswitched",
+    )
+
+    def __init__(self, module: Module, cfg: CFG):
+        """
+        Prepare an empty SSA form, see build_ssa.
+
+        :param module: the module
+        :param cfg: its CFG
+        """
+        self.module = module
+        self.cfg = cfg
+        self.order = cfg.reverse_postorder()
+        reachable = bytearray(len(cfg))
+        for block in self.order:
+            reachable[block] = 1
+        self.predecessors = [
+            [p for p in cfg.predecessors(block) if reachable[p]]
+            if reachable[block]
+            else []
+            for block in range(len(cfg))
+        ]
+        self.dominators = Dominators(cfg, self.order, self.predecessors)
+        self.phis: list[list[Value]] = [[] for _ in range(len(cfg))]
+        self.instructions: list[list[Value]] = [[] for _ in range(len(cfg))]
+        self.branches: list[Optional[Value]] = [None] * len(cfg)
+        self.undefined: dict[str, Value] = {}
+        # the instructions moved to the preheader of a loop, with the loop they are placed in front of
+        self.hoisted: dict[Value, Union[While, Do]] = {}
+        # the If and its branch every loop is unswitched on, by id of the loop
+        self.unswitched: dict[int, tuple[If, Value]] = {}
+
+    def values_in(self, block: int) -> Iterator[Value]:
+        """
+        Iterate over the Values of a block.
+
+        :param block: the block
+        :return: its phis, instructions and branch
+        """
+        yield from self.phis[block]
+        yield from self.instructions[block]
+        branch = self.branches[block]
+        if branch is not None:
+            yield branch
+
+    def values(self) -> Iterator[Value]:
+        """
+        Iterate over all Values of the reachable blocks, in reverse postorder of their blocks.
+
+        :return: the phis, instructions and branch of every block
+        """
+        for block in self.order:
+            yield from self.values_in(block)
+
+    def version(self, variable: str, versions: dict[str, list[Value]]) -> Value:
+        """
+        Get the current version of a variable.
+
+        :param variable: the name of the variable
+        :param versions: the stack of versions of every variable
+        :return: the innermost version, the UNDEFINED Value of the variable if there is none
+        """
+        stack = versions.get(variable)
+        if stack:
+            return stack[-1]
+        undefined = self.undefined.get(variable)
+        if undefined is None:
+            undefined = self.undefined[variable] = Value(
+                UNDEFINED, variable, -1, None, []
+            )
+        return undefined
+
+    def to_module(self) -> Module:
+        """
+        Turn the SSA form back into a Module.
+
+        Assignments whose Value was removed are dropped, the expressions of the others are rewritten from their
+        operands, and so are the conditions of branches.
+        Hoisted statements are moved in front of their loop, and unswitched loops become an If choosing between two
+        copies of the loop without the unswitched If.
+
+        :return: the new module, which shares all unchanged subtrees with the old one
+        """
+        statements: dict[int, list[AST]] = {}
+        conditions: dict[int, Expr] = {}
+        for block in self.order:
+            for statement in self.cfg.statements[block]:
+                statements[id(statement)] = []
+            for value in self.instructions[block]:
+                assert isinstance(value.node, (Assign, Print))
+                loop = self.hoisted.get(value)
+                if loop is None:
+                    statements[id(value.node)] = [self.statement(value)]
+                else:
+                    statements.setdefault(id(loop), [loop]).insert(
+                        -1, self.statement(value)
+                    )
+            branch = self.branches[block]
+            if branch is not None:
+                assert isinstance(branch.node, Expr)
+                conditions[id(branch.node)] = rewrite(
+                    branch.node, iter(branch.operands)
+                )
+
+        module = Unswitcher(self.unswitched, statements, conditions).transform(
+            self.module
+        )
+        assert isinstance(module, Module)
+        return module
+
+    def statement(self, value: Value) -> AST:
+        """
+        Turn an instruction back into a statement.
+
+        :param value: the ASSIGN or PRINT Value
+        :return: the statement
+        """
+        node = value.node
+        if isinstance(node, Print):
+            expr = rewrite(node.value, iter(value.operands))
+            return node if expr is node.value else Print(expr)
+        assert isinstance(node, Assign)
+        if value.constant is not None:
+            if isinstance(node.value, Constant) and node.value.value == value.constant:
+                return node
+            return Assign(node.target, Constant(value.constant))
+        expr = rewrite(node.value, iter(value.operands))
+        return node if expr is node.value else Assign(node.target, expr)
+
+
+class Splicer(ASTTransformer):
+    """
+    Replace statements of a tree by lists of statements, copying only the compound statements that change.
+
+    The tree may be a DAG, every statement is replaced once however often it occurs.
+    """
+
+    # expressions are replaced as a whole, as conditions
+    skipped_tags = frozenset(cls.tag for cls in (Name, Constant, BinOp, UnaryOp))
+
+    def __init__(
+        self,
+        statements: dict[int, list[AST]],
+        conditions: Optional[dict[int, Expr]] = None,
+    ):
+        """
+        Create a splicer.
+
+        :param statements: the statements replacing a statement, by id of the statement, which may be among them
+        :param conditions: the new conditions of If and While statements, by id of the old condition
+        """
+        self.statements = statements
+        self.conditions = conditions or {}
+
+    def finish(self, node: AST, new: AST) -> AST:
+        """
+        Finish rebuilding a compound statement, before it is replaced by its statements.
+
+        :param node: the statement, or the Module
+        :param new: what it was rebuilt to, node itself if nothing in it changed
+        :return: what replaces it
+        """
+        return new
+
+    def replace(self, node: AST, new: AST) -> Union[AST, list[AST]]:
+        """
+        Look up the statements replacing a statement.
+
+        :param node: the statement
+        :param new: what it was rebuilt to
+        :return: the statements replacing it, with new in its place, or new if it isn't replaced
+        """
+        replacement = self.statements.get(id(node))
+        if replacement is None:
+            return new
+        return [new if statement is node else statement for statement in replacement]
+
+    def visit_Module(self, node: Module, *args: Any, **kwargs: Any) -> Any:
+        """Rebuild a module around its new statements."""
+        return self.finish(node, self.rebuild_Module(node))
+
+    def visit_Block(self, node: Block, *args: Any, **kwargs: Any) -> Any:
+        """Rebuild a block around its new statements."""
+        return self.replace(node, self.finish(node, self.rebuild_Block(node)))
+
+    def visit_If(self, node: If, *args: Any, **kwargs: Any) -> Any:
+        """Rebuild an if statement around its new condition and statements."""
+        condition = self.conditions.get(id(node.condition), node.condition)
+        body, orelse = self.results(node.body), self.results(node.orelse)
+        new = (
+            node
+            if condition is node.condition
+            and body is node.body
+            and orelse is node.orelse
+            else If(node.label, condition, body, orelse)
+        )
+        return self.replace(node, self.finish(node, new))
+
+    def visit_While(self, node: While, *args: Any, **kwargs: Any) -> Any:
+        """Rebuild a while loop around its new condition and statements."""
+        condition = self.conditions.get(id(node.condition), node.condition)
+        body = self.results(node.body)
+        new = (
+            node
+            if condition is node.condition and body is node.body
+            else While(node.label, condition, body)
+        )
+        return self.replace(node, self.finish(node, new))
+
+    def visit_Do(self, node: Do, *args: Any, **kwargs: Any) -> Any:
+        """Rebuild a do loop around its new statements."""
+        return self.replace(node, self.finish(node, self.rebuild_Do(node)))
+
+    def visit_Break(self, node: Break, *args: Any, **kwargs: Any) -> Any:
+        """Replace a break."""
+        return self.replace(node, node)
+
+    def visit_Continue(self, node: Continue, *args: Any, **kwargs: Any) -> Any:
+        """Replace a continue."""
+        return self.replace(node, node)
+
+    def visit_Assign(self, node: Assign, *args: Any, **kwargs: Any) -> Any:
+        """Replace an assignment."""
+        return self.replace(node, node)
+
+    def visit_Print(self, node: Print, *args: Any, **kwargs: Any) -> Any:
+        """Replace a print statement."""
+        return self.replace(node, node)
+
+
+class Unswitcher(Splicer):
+    """Splice the statements of an SSAFunction into its Module, and turn its unswitched loops into an If."""
+
+    def __init__(
+        self,
+        unswitched: dict[int, tuple[If, Value]],
+        statements: dict[int, list[AST]],
+        conditions: dict[int, Expr],
+    ):
+        """
+        Create an unswitcher.
+
+        :param unswitched: the If and its branch every loop is unswitched on, by id of the loop
+        :param statements: the statements replacing a statement, see Splicer
+        :param conditions: the new conditions of If and While statements, see Splicer
+        """
+        super().__init__(statements, conditions)
+        self.unswitched = unswitched
+
+    def finish(self, node: AST, new: AST) -> AST:
+        """
+        Turn an unswitched loop into an If choosing between two copies of it, each with one arm of the old If.
+
+        :param node: the statement
+        :param new: what it was rebuilt to
+        :return: what replaces it
+        """
+        if id(node) not in self.unswitched:
+            return new
+        old, branch = self.unswitched[id(node)]
+        statement = self.result(old)
+        assert isinstance(statement, If) and isinstance(branch.node, Expr)
+        condition = rewrite(branch.node, iter(branch.operands))
+        copies = []
+        for body in (statement.body, statement.orelse):
+            # breaks may leave a labelled If, which becomes a Block
+            replacement: list[AST] = (
+                body if statement.label is None else [Block(statement.label, body)]
+            )
+            copies.append([Splicer({id(statement): replacement}).transform(new)])
+        return If(None, condition, *copies)
+
+
+def build_ssa(module: Module) -> SSAFunction:
+    """
+    Lower a Module to SSA form.
+
+    Hash-consed Modules are copied into trees first, the optimised Module may change every statement on its own.
+    Phis are placed on the iterated dominance frontiers of the blocks assigning a variable, then the variables are
+    renamed in a single walk over the dominator tree.
+
+    :param module: the module
+    :return: its SSA form
+    """
+    cfg = build_cfg(module)
+    function = SSAFunction(module, cfg)
+    dominators = function.dominators
+
+    seen: set[int] = set()
+    assigned: dict[str, list[int]] = {}
+    for block in function.order:
+        nodes = [*cfg.statements[block], cfg.branches[block]]
+        for statement in cfg.statements[block]:
+            if isinstance(statement, Assign):
+                blocks = assigned.setdefault(statement.target, [])
+                if not blocks or blocks[-1] != block:
+                    blocks.append(block)
+        for node in nodes:
+            if node is not None:
+                if id(node) in seen:
+                    # a hash-consed tree, whose shared statements can't be changed in one place only
+                    copy = deserialize(serialize(module))
+                    assert isinstance(copy, Module)
+                    return build_ssa(copy)
+                seen.add(id(node))
+
+    for variable, blocks in assigned.items():
+        placed: set[int] = set()
+        work = list(blocks)
+        while work:
+            for frontier in dominators.frontiers[work.pop()]:
+                if frontier not in placed:
+                    placed.add(frontier)
+                    operands: list[Value] = []
+                    function.phis[frontier].append(
+                        Value(PHI, variable, frontier, None, operands)
+                    )
+                    work.append(frontier)
+
+    versions: dict[str, list[Value]] = {}
+    pushed: list[list[str]] = [[] for _ in range(len(cfg))]
+    for entering, block in dominators.preorder():
+        if not entering:
+            for variable in pushed[block]:
+                versions[variable].pop()
+            continue
+        for phi in function.phis[block]:
+            assert phi.variable is not None
+            versions.setdefault(phi.variable, []).append(phi)
+            pushed[block].append(phi.variable)
+        for statement in cfg.statements[block]:
+            if isinstance(statement, Assign):
+                operands = [
+                    function.version(name.id, versions)
+                    for name in iter_names(statement.value)
+                ]
+                value = Value(ASSIGN, statement.target, block, statement, operands)
+                versions.setdefault(statement.target, []).append(value)
+                pushed[block].append(statement.target)
+            else:
+                assert isinstance(statement, Print)
+                operands = [
+                    function.version(name.id, versions)
+                    for name in iter_names(statement.value)
+                ]
+                value = Value(PRINT, None, block, statement, operands)
+            function.instructions[block].append(value)
+        condition = cfg.branches[block]
+        if condition is not None:
+            operands = [
+                function.version(name.id, versions) for name in iter_names(condition)
+            ]
+            function.branches[block] = Value(BRANCH, None, block, condition, operands)
+        for successor in cfg.successors(block):
+            predecessors = function.predecessors[successor]
+            for phi in function.phis[successor]:
+                assert phi.variable is not None
+                if not phi.operands:
+                    phi.operands.extend([phi] * len(predecessors))
+                phi.operands[predecessors.index(block)] = function.version(
+                    phi.variable, versions
+                )
+    return function
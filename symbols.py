@@ -0,0 +1,65 @@
+"""
+The symbol table, mapping names in Dust programs to small integers.
+
+Labels are interned by the parser and stored in the AST as Symbols, so every node with the same label shares a
+single int object, and resolving a break or continue compares ints instead of strings.
+Symbols are only valid in the process that interned them, the serialization of ASTs stores the names instead.
+"""
+from __future__ import annotations
+
+import threading
+
+__all__ = ["SYMBOLS", "Symbol", "SymbolTable"]
+
+Symbol = int
+
+
+class SymbolTable:
+    """Intern names as consecutive integers, starting at 0."""
+
+    __slots__ = ("names", "symbols", "lock")
+
+    def __init__(self) -> None:
+        """Create an empty table."""
+        self.names: list[str] = []
+        self.symbols: dict[str, Symbol] = {}
+        # interning a new name takes two steps, which threads of the compile server must not interleave
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Count the interned names.
+
+        :return: the number of names
+        """
+        return len(self.names)
+
+    def intern(self, name: str) -> Symbol:
+        """
+        Get the symbol of a name, adding it to the table if it is new.
+
+        :param name: the name
+        :return: its symbol
+        """
+        symbol = self.symbols.get(name)
+        if symbol is None:
+            with self.lock:
+                symbol = self.symbols.get(name)
+                if symbol is None:
+                    # readers don't take the lock, so the name must be there before the symbol is published
+                    symbol = len(self.names)
+                    self.names.append(name)
+                    self.symbols[name] = symbol
+        return symbol
+
+    def name(self, symbol: Symbol) -> str:
+        """
+        Get the name of a symbol.
+
+        :param symbol: the symbol
+        :return: the name it was interned from
+        """
+        return self.names[symbol]
+
+
+SYMBOLS = SymbolTable()
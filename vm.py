@@ -0,0 +1,131 @@
+"""
+The stack based virtual machine running compiled Dust code.
+
+See bytecode.py for the instruction set.
+"""
+from __future__ import annotations
+
+import sys
+from typing import Optional, TextIO
+
+from bytecode import (
+    ADD,
+    BOOL,
+    DIV,
+    EQ,
+    GE,
+    GT,
+    JUMP,
+    JUMP_IF_FALSE,
+    JUMP_IF_TRUE,
+    LE,
+    LOAD_CONST,
+    LOAD_VAR,
+    LT,
+    MOD,
+    MUL,
+    NE,
+    NEG,
+    NOT,
+    PRINT,
+    STORE_VAR,
+    SUB,
+    Code,
+)
+
+__all__ = ["DustRuntimeError", "run"]
+
+
+class DustRuntimeError(Exception):
+    """Raised when a Dust program fails while running."""
+
+
+def run(code: Code, out: Optional[TextIO] = None) -> list[Optional[int]]:
+    """
+    Execute compiled code.
+
+    Integers are arbitrary precision, division and modulo round towards negative infinity like in Python.
+    Comparisons and logical operators produce 0 or 1, and any non-zero value is true.
+
+    :param code: the code to run
+    :param out: where print writes to, defaults to stdout
+    :return: the final values of all variables, indexed like code.names
+    """
+    if out is None:
+        out = sys.stdout
+    instructions = code.code.tolist()
+    constants = code.constants
+    variables: list[Optional[int]] = [None] * len(code.names)
+    stack: list[int] = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    end = len(instructions)
+    # The branches are ordered roughly by how often they run in loop heavy code.
+    while pc < end:
+        op = instructions[pc]
+        arg = instructions[pc + 1]
+        pc += 2
+        if op == LOAD_VAR:
+            value = variables[arg]
+            if value is None:
+                raise DustRuntimeError(f"variable {code.names[arg]!r} is not defined")
+            push(value)
+        elif op == LOAD_CONST:
+            push(constants[arg])
+        elif op == STORE_VAR:
+            variables[arg] = pop()
+        elif op == JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+        elif op == JUMP:
+            pc = arg
+        elif op == ADD:
+            right = pop()
+            stack[-1] += right
+        elif op == SUB:
+            right = pop()
+            stack[-1] -= right
+        elif op == LT:
+            right = pop()
+            stack[-1] = 1 if stack[-1] < right else 0
+        elif op == EQ:
+            right = pop()
+            stack[-1] = 1 if stack[-1] == right else 0
+        elif op == MOD or op == DIV:
+            right = pop()
+            if not right:
+                raise DustRuntimeError("division by zero")
+            if op == MOD:
+                stack[-1] %= right
+            else:
+                stack[-1] //= right
+        elif op == MUL:
+            right = pop()
+            stack[-1] *= right
+        elif op == NE:
+            right = pop()
+            stack[-1] = 1 if stack[-1] != right else 0
+        elif op == LE:
+            right = pop()
+            stack[-1] = 1 if stack[-1] <= right else 0
+        elif op == GT:
+            right = pop()
+            stack[-1] = 1 if stack[-1] > right else 0
+        elif op == GE:
+            right = pop()
+            stack[-1] = 1 if stack[-1] >= right else 0
+        elif op == JUMP_IF_TRUE:
+            if pop():
+                pc = arg
+        elif op == NOT:
+            stack[-1] = 0 if stack[-1] else 1
+        elif op == BOOL:
+            stack[-1] = 1 if stack[-1] else 0
+        elif op == NEG:
+            stack[-1] = -stack[-1]
+        elif op == PRINT:
+            print(pop(), file=out)
+        else:
+            raise DustRuntimeError(f"bad opcode {op} at {pc - 2}")
+    return variables
@@ -0,0 +1,139 @@
+"""
+Watching source files for changes.
+
+Files are polled with os.stat, which needs nothing beyond the standard library and works on every platform.
+Polling is cheap: a file is only read when its mtime or size changed, and only reparsed when the sha256 of its
+content changed.
+Reparsing is incremental, the difference between the old and the new content is turned into a single edit for an
+IncrementalParser, so the Module stays resident and only the changed statements are parsed again.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections.abc import Callable
+from typing import Any, NoReturn, Optional
+
+from AST import Module
+from incremental import IncrementalParser
+
+__all__ = ["POLL_INTERVAL", "WatchedFile", "common_prefix", "diff", "watch"]
+
+POLL_INTERVAL = 0.05
+CHUNK = 4096
+
+
+def common_prefix(a: bytes, b: bytes) -> int:
+    """
+    Get the length of the common prefix of two byte strings.
+
+    Whole chunks are compared first, so most of the work happens in C.
+
+    :param a: the first byte string
+    :param b: the second byte string
+    :return: the number of leading bytes they share
+    """
+    size = min(len(a), len(b))
+    start = 0
+    while start < size:
+        end = min(start + CHUNK, size)
+        if a[start:end] != b[start:end]:
+            break
+        start = end
+    while start < size and a[start] == b[start]:
+        start += 1
+    return start
+
+
+def diff(old: bytes, new: bytes) -> tuple[int, int, bytes]:
+    """
+    Describe the change between two versions of a source as a single edit.
+
+    :param old: the old content
+    :param new: the new content
+    :return: the start and end of the replaced range in old, and the text replacing it
+    """
+    prefix = common_prefix(old, new)
+    # the suffix must not overlap the prefix, think of inserting a character into a run of the same character
+    suffix = min(common_prefix(old[::-1], new[::-1]), min(len(old), len(new)) - prefix)
+    end = len(new) - suffix
+    return prefix, len(old) - suffix, new[prefix:end]
+
+
+class WatchedFile:
+    """A source file whose Module and compiled code are kept in memory."""
+
+    def __init__(self, path: str):
+        """
+        Start watching a file, it is read on the first poll.
+
+        :param path: the path of the source file
+        """
+        self.path = path
+        self.stat: Optional[tuple[int, int]] = None
+        self.digest: Optional[bytes] = None
+        self.source: Optional[bytes] = None
+        self.parser: Optional[IncrementalParser] = None
+        # whatever the backend compiled the Module to, reset whenever the content changes
+        self.artefact: Any = None
+
+    def poll(self) -> bool:
+        """
+        Check if the content of the file changed.
+
+        :return: if it changed since the last poll
+        """
+        try:
+            stat = os.stat(self.path)
+            if (stat.st_mtime_ns, stat.st_size) == self.stat:
+                return False
+            with open(self.path, "rb") as f:
+                source = f.read()
+        except OSError:
+            return False
+        self.stat = (stat.st_mtime_ns, stat.st_size)
+        digest = hashlib.sha256(source).digest()
+        if digest == self.digest:
+            return False
+        self.digest = digest
+        self.source = source
+        self.artefact = None
+        return True
+
+    def module(self) -> Module:
+        """
+        Get the Module of the current content, reparsing only what changed since the last call.
+
+        :return: the module
+        """
+        assert self.source is not None
+        if self.parser is None:
+            self.parser = IncrementalParser(self.source, self.path)
+        elif self.parser.source != self.source:
+            return self.parser.edit(*diff(self.parser.source, self.source))
+        elif self.parser.module is None:
+            return self.parser.parse()
+        assert self.parser.module is not None
+        return self.parser.module
+
+
+def watch(
+    paths: list[str],
+    on_change: Callable[[WatchedFile], None],
+    interval: float = POLL_INTERVAL,
+) -> NoReturn:
+    """
+    Poll files forever and handle every change.
+
+    :param paths: the files to watch
+    :param on_change: called with every file whose content changed, and once for every file at the start
+    :param interval: the seconds to sleep between polls
+    :return: never
+    """
+    files = [WatchedFile(path) for path in paths]
+    while True:
+        for file in files:
+            if file.poll():
+                on_change(file)
+        time.sleep(interval)